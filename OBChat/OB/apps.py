@@ -3,6 +3,8 @@ Defines the apps within the OBChat project.
 """
 
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 class OBConfig(AppConfig):
     """
@@ -13,6 +15,10 @@ class OBConfig(AppConfig):
 
     def ready(self):
         """
+        Configure new SQLite connections (see OB.utilities.sqlite).
+        Invalidate cached privileges when Admins, Bans, or Rooms change (see
+        OB.utilities.privilege), and the cached system user when it changes (see
+        OB.utilities.database).
         Clean up occupants and anon OBUsers in the database. The OBConsumer normally handles this,
         but cannot if the server is stopped abruptly.
         This method runs one time when the Django app starts.
@@ -21,13 +27,21 @@ class OBConfig(AppConfig):
         # pylint: disable=import-outside-toplevel
         # Justification: The Django documentation recommends importing here because you cannot
         #   import models at the module-level.
-        from OB.models import OBUser, Room
+        from OB.models import Admin, Ban, OBUser, Room
+        from OB.utilities.database import forget_system_user
+        from OB.utilities.presence import reconcile
+        from OB.utilities.privilege import invalidate_on_change
+        from OB.utilities.sqlite import apply_pragmas
         # pylint: enable=import-outside-toplevel
 
-        # Remove all occupants from all rooms
-        for room in Room.objects.all():
-            room.occupants.clear()
+        connection_created.connect(apply_pragmas)
 
-        # Remove all stray anon users
-        for anon_user in OBUser.objects.filter(is_anon=True):
-            anon_user.delete()
+        for model in [Admin, Ban, Room]:
+            post_save.connect(invalidate_on_change, sender=model)
+            post_delete.connect(invalidate_on_change, sender=model)
+
+        post_save.connect(forget_system_user, sender=OBUser)
+        post_delete.connect(forget_system_user, sender=OBUser)
+
+        # Remove all occupants and stray anon users (see OB.utilities.presence)
+        reconcile()
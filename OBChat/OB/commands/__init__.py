@@ -4,7 +4,7 @@ Commands are issued by users when using the command syntax (see
 OB.utilities.command.is_command_format()).
 """
 
-from OB.commands.command_handler import handle_command
+from OB.commands.command_handler import async_flush_commands, handle_command, queue_command
 from OB.commands.admin_level import BanCommand
 from OB.commands.admin_level import ElevateCommand
 from OB.commands.admin_level import KickCommand
@@ -4,11 +4,12 @@ BanCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Ban, OBUser
+from OB.models import Ban
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege
-from OB.utilities.database import async_save, async_try_get
-from OB.utilities.event import send_room_event
+from OB.utilities.anonymous import is_ephemeral
+from OB.utilities.database import async_bulk_save
+from OB.utilities.event import send_invalidate_privileges, send_kick
+from OB.utilities.privilege import async_resolve_targets
 
 class BanCommand(BaseCommand):
     """
@@ -38,12 +39,10 @@ class BanCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        for username in self.args:
-            arg_user = await async_try_get(OBUser, username=username)
-
-            if arg_user:
-                arg_privilege = await async_get_privilege(arg_user, self.room)
-                arg_ban = await async_try_get(Ban, user=arg_user, room=self.room, is_lifted=False)
+        # Look up the targets, their privileges, and their bans in one database hop
+        for target in await async_resolve_targets(self.args, self.room, include_anon=True):
+            username, arg_user, arg_privilege = target.username, target.user, target.privilege
+            arg_ban = target.ban
 
             # Target user does not exist
             if not arg_user:
@@ -61,7 +60,7 @@ class BanCommand(BaseCommand):
             elif arg_privilege >= self.sender_privilege:
                 job_title = StringId.Admin
 
-                if arg_privilege == await async_get_privilege(self.sender, self.room):
+                if arg_privilege == self.sender_privilege:
                     job_title += StringId.JustLikeYou
 
                 if arg_privilege == Privilege.UnlimitedAdmin:
@@ -83,22 +82,21 @@ class BanCommand(BaseCommand):
 
         ban_message_body = []
 
-        for banned_user in self.valid_targets:
-            # Save the ban to the database
-            await async_save(
-                Ban,
-                user=banned_user,
-                room=self.room,
-                issuer=self.sender
-            )
-
-            # Kick the user
-            kick_event = {
-                "type": "kick",
-                "target_id": banned_user.id
-            }
-            await send_room_event(self.room.id, kick_event)
+        # Save the bans to the database with one query (ephemeral anonymous users are only kicked,
+        # since their identity does not outlive their connection)
+        await async_bulk_save(Ban, [
+            {"user": banned_user, "room": self.room, "issuer": self.sender}
+            for banned_user in self.valid_targets if not is_ephemeral(banned_user)
+        ])
+
+        # Bulk inserts do not send signals, so invalidate the room's privileges here, before the
+        # banned users can reconnect
+        await send_invalidate_privileges(self.room.id)
 
+        # Kick the users with one event
+        await send_kick(self.room.id, self.valid_targets)
+
+        for banned_user in self.valid_targets:
             # Add the user's name to the sender receipt and occupants notification
             ban_message_body += [f"   {banned_user}"]
 
@@ -6,10 +6,12 @@ from enum import IntEnum
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Admin, OBUser
+from OB.models import Admin
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege, is_valid_command
-from OB.utilities.database import async_filter, async_model_list, async_try_get
+from OB.utilities.command import is_valid_command
+from OB.utilities.database import async_filter
+from OB.utilities.presence import async_get_present_ids
+from OB.utilities.privilege import async_resolve_targets
 
 class ElevateCommand(BaseCommand):
     """
@@ -125,14 +127,18 @@ class ElevateCommand(BaseCommand):
                 self.valid_elevations += unlimited_admins
             self.valid_elevations += [self.room.owner]
         else:
-            # Check for per-argument errors
-            for username in self.valid_targets:
-                arg_user = await async_try_get(OBUser, username=username)
-
-                if arg_user:
-                    arg_privilege = await async_get_privilege(arg_user, self.room)
-
-                if not arg_user or arg_user not in await async_model_list(self.room.occupants):
+            # Check for per-argument errors, looking up the targets and their privileges in one
+            # database hop, and which of them are present through any process in at most one more
+            targets = await async_resolve_targets(self.valid_targets, self.room)
+            present_ids = await async_get_present_ids(
+                self.room.id,
+                [target.user for target in targets if target.user]
+            )
+
+            for target in targets:
+                username, arg_user, arg_privilege = target.username, target.user, target.privilege
+
+                if not arg_user or arg_user.id not in present_ids:
                     self.sender_receipt += [StringId.UserNotPresent.format(username)]
                 elif arg_user == self.sender:
                     self.sender_receipt += [StringId.ElevateSelf]
@@ -4,11 +4,10 @@ KickCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import OBUser
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege
-from OB.utilities.database import async_model_list, async_try_get
-from OB.utilities.event import send_room_event
+from OB.utilities.event import send_kick
+from OB.utilities.presence import async_get_present_ids
+from OB.utilities.privilege import async_resolve_targets
 
 class KickCommand(BaseCommand):
     """
@@ -40,14 +39,19 @@ class KickCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        for username in self.args:
-            arg_user = await async_try_get(OBUser, username=username)
+        # Look up the targets and their privileges in one database hop, and which of them are
+        # present through any process in at most one more
+        targets = await async_resolve_targets(self.args, self.room, include_anon=True)
+        present_ids = await async_get_present_ids(
+            self.room.id,
+            [target.user for target in targets if target.user]
+        )
 
-            if arg_user:
-                arg_privilege = await async_get_privilege(arg_user, self.room)
+        for target in targets:
+            username, arg_user, arg_privilege = target.username, target.user, target.privilege
 
             # Target user is not present in the room
-            if not arg_user or arg_user not in await async_model_list(self.room.occupants):
+            if not arg_user or arg_user.id not in present_ids:
                 self.sender_receipt += [StringId.UserNotPresent.format(username)]
             # Target user is the sender
             elif arg_user == self.sender:
@@ -81,14 +85,10 @@ class KickCommand(BaseCommand):
 
         kick_message_body = []
 
-        for kicked_user in self.valid_targets:
-            # Kick the user
-            kick_event = {
-                "type": "kick",
-                "target_id": kicked_user.id
-            }
-            await send_room_event(self.room.id, kick_event)
+        # Kick the users with one event
+        await send_kick(self.room.id, self.valid_targets)
 
+        for kicked_user in self.valid_targets:
             # Notify others that a user was kicked
             kick_message_body += [f"   {kicked_user}"]
 
@@ -4,10 +4,10 @@ LiftCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Ban, OBUser
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege
-from OB.utilities.database import async_save, async_try_get
+from OB.utilities.database import async_bulk_update
+from OB.utilities.event import send_invalidate_privileges
+from OB.utilities.privilege import async_resolve_targets
 
 class LiftCommand(BaseCommand):
     """
@@ -38,22 +38,19 @@ class LiftCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        for username in self.args:
-            arg_user = await async_try_get(OBUser, username=username)
+        # Look up the targets, their bans, and the bans' issuers in one database hop
+        for target in await async_resolve_targets(self.args, self.room):
+            username, arg_user, arg_ban = target.username, target.user, target.ban
 
-            if arg_user:
-                arg_ban = await async_try_get(Ban, user=arg_user, room=self.room, is_lifted=False)
-                issuer = await async_try_get(OBUser, ban_issued=arg_ban)
-                issuer_privilege = await async_get_privilege(issuer, self.room)
-                sender_privilege = await async_get_privilege(self.sender, self.room)
-            else:
-                arg_ban = None
+            if arg_ban:
+                issuer = arg_ban.issuer
+                issuer_privilege = self.privileges.get(issuer)
 
             # Target user is not present or does not have an active ban
             if not arg_user or not arg_ban:
                 self.sender_receipt += [StringId.LiftInvalidTarget.format(username)]
             # Target user was banned by someone with higher privilege
-            elif issuer_privilege >= sender_privilege and issuer != self.sender:
+            elif issuer_privilege >= self.sender_privilege and issuer != self.sender:
                 self.sender_receipt += [
                     StringId.LiftInsufficientPermission.format(arg_user, issuer)
                 ]
@@ -76,10 +73,15 @@ class LiftCommand(BaseCommand):
         for lifted_ban, lifted_user in self.valid_targets:
             # Mark the ban as lifted
             lifted_ban.is_lifted = True
-            await async_save(lifted_ban)
 
             lift_message_body += [f"   {lifted_user}"]
 
+        # Save the lifted bans with one query
+        await async_bulk_update([lifted_ban for lifted_ban, _ in self.valid_targets], ["is_lifted"])
+
+        # Bulk updates do not send signals, so invalidate the room's privileges here
+        await send_invalidate_privileges(self.room.id)
+
         self.sender_receipt += (
             # Add an extra newline to separate argument error messages from lift receipt
             [("\n" if self.sender_receipt else "") + StringId.LiftSenderReceiptPreface] +
@@ -6,7 +6,7 @@ from OB.commands.base import BaseCommand
 from OB.constants import Privilege
 from OB.models import Admin, OBUser
 from OB.strings import StringId
-from OB.utilities.database import async_filter, async_get, async_get_owner
+from OB.utilities.database import async_filter, async_get
 
 class ApplyCommand(BaseCommand):
     """
@@ -62,7 +62,8 @@ class ApplyCommand(BaseCommand):
             for adminship in unlimited_admins:
                 self.valid_targets += [await async_get(OBUser, adminship=adminship)]
 
-        self.valid_targets += [await async_get_owner(self.room)]
+        # The owner is loaded with the room (see OB.utilities.context.load_context())
+        self.valid_targets += [self.room.owner]
 
         # Construct strings
         user_suffix = StringId.AdminSuffix if self.sender_privilege == Privilege.Admin else ""
@@ -3,8 +3,8 @@ The BaseCommand class container module.
 """
 
 from OB.constants import Privilege
-from OB.utilities.command import async_get_privilege
-from OB.utilities.event import send_system_room_message
+from OB.utilities.event import send_system_room_messages
+from OB.utilities.privilege import async_get_privilege_table
 
 # pylint: disable=too-few-public-methods
 # Justification: The only method that needs to be publicly visible is execute()
@@ -33,6 +33,10 @@ class BaseCommand:
 
         self.sender_privilege = Privilege.Invalid
 
+        # The privilege table of the room, so that privilege checks are dictionary lookups (see
+        # OB.utilities.privilege)
+        self.privileges = None
+
         # Responses to send after processing the command
         self.sender_receipt = []
         self.occupants_notification = []
@@ -46,13 +50,18 @@ class BaseCommand:
     async def execute(self):
         """
         This is the driver code behind the command.
+        The sender's privilege is read from the room's privilege table when the command executes,
+        not when it was sent, so that earlier commands in the room are taken into account.
         """
 
         if self.remove_duplicates:
             self.args = list(dict.fromkeys(self.args))
 
+        # Get the room's privileges, without a database hop if they are cached
+        self.privileges = await async_get_privilege_table(self.room)
+
         # Get the sender's privilege
-        self.sender_privilege = await async_get_privilege(self.sender, self.room)
+        self.sender_privilege = self.privileges.get(self.sender)
 
         # Check for initial errors
         if not await self.check_initial_errors():
@@ -96,22 +105,11 @@ class BaseCommand:
         Sends the sender a receipt of errors and successes.
         Sends other occupants of the room a notification of a command's execution.
         Joins the sender receipt and occupants notification lists by \n.
+        All three are saved in one batch and sent in one pass (see send_system_room_messages()).
         """
 
-        await send_system_room_message(
-            "\n".join(self.sender_receipt),
-            self.room,
-            [self.sender]
-        )
-
-        await send_system_room_message(
-            "\n".join(self.occupants_notification),
-            self.room,
-            exclusions=[self.sender] + self.valid_targets
-        )
-
-        await send_system_room_message(
-            "\n".join(self.targets_notification),
-            self.room,
-            self.valid_targets
-        )
+        await send_system_room_messages([
+            ("\n".join(self.sender_receipt), [self.sender], None),
+            ("\n".join(self.occupants_notification), None, [self.sender] + self.valid_targets),
+            ("\n".join(self.targets_notification), self.valid_targets, None)
+        ], self.room)
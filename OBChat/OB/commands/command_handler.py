@@ -1,10 +1,36 @@
 """
 Handles when a command is issued from a user and redirects to the appropriate command function.
+
+Commands are queued and executed by a background task for each room (see queue_command()), so an
+expensive command does not hold up the OBConsumer that received it. The commands of a room are
+executed one at a time in the order this process received them. Commands of different rooms run
+concurrently. Responses are sent through the usual "room_message" events.
+
+The sender's privilege is not captured when a command is queued. Each command reads it from the
+room's PrivilegeTable when it executes (see BaseCommand.execute()), so a /fire or /ban queued ahead
+of it in the same room takes effect first.
 """
 
+import asyncio
+import logging
+
+from collections import deque
+
 import OB.commands
 
+from OB.routers import CURRENT_USER_ID, set_current_user
+from OB.strings import StringId
 from OB.utilities.event import send_system_room_message
+from OB.utilities.persistence import async_flush_messages
+
+LOGGER = logging.getLogger(__name__)
+
+# The commands waiting to be executed in each room, by room id. Removed when the queue drains.
+COMMAND_QUEUES = {}
+
+# The task executing each room's commands and its event loop, by room id. Removed when the task
+# finishes.
+COMMAND_TASKS = {}
 
 # TODO: Rework this to be held inside each command module
 VALID_COMMANDS = "\n".join([
@@ -40,8 +66,109 @@ async def handle_command(command, sender, room):
     command_name = separated[0]
     arguments = separated[1:]
 
-    try:
-        await OB.commands.COMMANDS[command_name](arguments, sender, room).execute()
-    except KeyError:
+    command_class = OB.commands.COMMANDS.get(command_name)
+
+    if not command_class:
         # Invalid command, send the list of valid commands
         await send_system_room_message(VALID_COMMANDS, room, [sender])
+        return
+
+    await command_class(arguments, sender, room).execute()
+
+def queue_command(command, sender, room):
+    """
+    Queues a command to be executed after the commands already queued in its room, and starts the
+    room's task if it is not running.
+
+    Arguments:
+        command (string): A space-separated string of a command with arguments.
+        sender (OBUser): The OBUser who issued the command.
+        room (Room): The Room the command was sent from.
+    """
+
+    COMMAND_QUEUES.setdefault(room.id, deque()).append((command, sender, room))
+
+    loop = asyncio.get_event_loop()
+    task_loop, task = COMMAND_TASKS.get(room.id, (None, None))
+
+    if task_loop is not loop or task.done():
+        COMMAND_TASKS[room.id] = (loop, asyncio.ensure_future(run_commands(room.id)))
+
+async def run_commands(room_id):
+    """
+    Executes the queued commands of a room one at a time until there are none left, then removes
+    the room's queue and task.
+    A command that fails is logged, its sender is told, and the commands after it still run.
+
+    Arguments:
+        room_id (int): The id of the room.
+    """
+
+    queue = COMMAND_QUEUES.get(room_id)
+
+    while queue:
+        command, sender, room = queue.popleft()
+
+        # Route the command's database reads as its sender's (see OB.routers)
+        token = set_current_user(sender)
+
+        try:
+            # Commands may read or delete messages, so save any queued messages first
+            await async_flush_messages()
+
+            await handle_command(command, sender, room)
+        # pylint: disable=broad-except
+        # Justification: One failed command must not stop the room's other commands.
+        except Exception:
+            LOGGER.exception("Command %r failed in room %s.", command, room_id)
+            await send_failure_receipt(command, sender, room)
+        # pylint: enable=broad-except
+        finally:
+            CURRENT_USER_ID.reset(token)
+
+    # No await since the queue was empty, so nothing was queued for this task in the meantime
+    if COMMAND_QUEUES.get(room_id) is queue:
+        del COMMAND_QUEUES[room_id]
+
+    if COMMAND_TASKS.get(room_id, (None, None))[1] is asyncio.current_task():
+        del COMMAND_TASKS[room_id]
+
+async def send_failure_receipt(command, sender, room):
+    """
+    Tells the sender of a failed command that it failed.
+    A receipt that cannot be sent is logged, since the command already failed.
+
+    Arguments:
+        command (string): The command that failed.
+        sender (OBUser): The OBUser who issued the command.
+        room (Room): The Room the command was sent from.
+    """
+
+    try:
+        await send_system_room_message(
+            StringId.CommandFailed.format(command.split()[0]),
+            room,
+            [sender]
+        )
+    # pylint: disable=broad-except
+    # Justification: The room's other commands must still run.
+    except Exception:
+        LOGGER.exception("Could not tell %s that their command failed.", sender.username)
+    # pylint: enable=broad-except
+
+async def async_flush_commands():
+    """
+    Waits until every command queued in this event loop has been executed, including commands
+    queued while waiting.
+    """
+
+    loop = asyncio.get_event_loop()
+
+    while True:
+        tasks = [task for task_loop, task in COMMAND_TASKS.values()
+                 if task_loop is loop and not task.done()]
+
+        if not tasks:
+            return
+
+        await asyncio.gather(*tasks)
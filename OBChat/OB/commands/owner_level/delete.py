@@ -2,12 +2,30 @@
 DeleteCommand class container module.
 """
 
+import asyncio
+import logging
+import time
+
+from django.db import connection, DatabaseError
+from django.utils import timezone
+
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Admin, Ban, Message
+from OB.models import Admin, Ban, Message, Room
 from OB.strings import StringId
-from OB.utilities.database import async_delete, async_model_list, async_filter, async_get_owner
-from OB.utilities.event import send_room_event
+from OB.utilities.database import async_delete, async_delete_chunk, async_len_all, async_save, \
+    delete_chunk
+from OB.utilities.encoding import encode_message
+from OB.utilities.event import send_invalidate_context, send_kick, send_room_message
+from OB.utilities.persistence import async_flush_messages
+
+# The least time between progress reports to the owner, in seconds
+PROGRESS_INTERVAL = 1.0
+
+# The deletions running in the background, so that they are not garbage collected
+DELETION_TASKS = set()
+
+LOGGER = logging.getLogger(__name__)
 
 class DeleteCommand(BaseCommand):
     """
@@ -31,11 +49,11 @@ class DeleteCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        # Missing or invalid target arguments
+        # Missing or invalid target arguments, where only the owner gets this far
         if (
             len(self.args) != 2 or
             self.args[0] != self.room.name or
-            self.args[1] != (await async_get_owner(self.room)).username
+            self.args[1] != self.sender.username
         ):
             self.sender_receipt = [StringId.DeleteSyntax]
 
@@ -43,28 +61,160 @@ class DeleteCommand(BaseCommand):
 
     async def execute_implementation(self):
         """
-        Kicks users, deletes Admins, deletes Bans, deletes Messages, and finally deletes the Room.
+        Suspends the Room so that no one can join or send messages, and kicks everyone but the
+        owner. The rest of the deletion runs in the background after the responses are sent (see
+        send_responses()).
+        """
+
+        # Refuse new connections and messages right away
+        self.room.is_suspended = True
+        await async_save(self.room)
+
+        # Kick all other users, including those served by other processes, with one event
+        await send_kick(self.room.id, exclusions=[self.sender])
+
+        # The owner's context must see the suspension
+        await send_invalidate_context(self.room.id, [self.sender])
+
+        self.sender_receipt = [StringId.DeleteStarted.format(self.room)]
+
+    async def send_responses(self):
+        """
+        See BaseCommand.send_responses().
+        Starts deleting the Room in the background once the owner has been told.
         """
 
-        # Kick all users
-        for user in await async_model_list(self.room.occupants):
-            kick_event = {
-                "type": "kick",
-                "target_id": user.id
-            }
-            await send_room_event(self.room.id, kick_event)
+        await super().send_responses()
+
+        if self.room.is_suspended:
+            task = asyncio.ensure_future(delete_room(self.room, self.sender))
+            DELETION_TASKS.add(task)
+            task.add_done_callback(DELETION_TASKS.discard)
+
+def get_room_query_sets(room_id):
+    """
+    Gets the QuerySets of the database objects that must be deleted before a Room.
+
+    Arguments:
+        room_id (int): The id of the room.
+
+    Return values:
+        list[QuerySet]: The Admins, Bans, and Messages of the room.
+    """
+
+    return [model.objects.filter(room_id=room_id) for model in [Admin, Ban, Message]]
+
+def finish_deletions():
+    """
+    Deletes the Rooms that are still suspended because the server stopped while deleting them (see
+    delete_room()). Their owners had confirmed the deletion and some of their Admins, Bans, and
+    Messages may already be deleted, so the deletion is finished instead of undone. Does nothing if
+    the tables do not exist yet, like before the first migration.
+    Called once when the ASGI application starts (see OBChat.routing), not when the Django app
+    starts, so that management commands do not delete Rooms.
+    """
+
+    if Room._meta.db_table not in connection.introspection.table_names():
+        return
+
+    try:
+        for room in Room.objects.filter(is_suspended=True):
+            for query_set in get_room_query_sets(room.id):
+                while delete_chunk(query_set):
+                    pass
+
+            room.delete()
+    except DatabaseError:
+        LOGGER.exception("Interrupted room deletions could not be finished")
+
+async def send_progress(message_text, room_id, owner):
+    """
+    Sends a message from the server to only the owner of a room being deleted, without saving it,
+    because the room's Messages are being deleted.
+
+    Arguments:
+        message_text (string): The message to send from the server.
+        room_id (int): The id of the room being deleted.
+        owner (OBUser): The owner of the room.
+    """
+
+    envelope = encode_message(
+        message_text,
+        StringId.SystemUsername,
+        timezone.now(),
+        has_recipients=True
+    )
+
+    await send_room_message(envelope, room_id, [owner])
+
+async def delete_room(room, owner):
+    """
+    Deletes the Admins, Bans, and Messages of a suspended Room a chunk at a time with queryset-level
+    deletes, so that large rooms are deleted in constant memory without blocking the database for
+    long, then deletes the Room and kicks the owner.
+    Reports progress to the owner at most every PROGRESS_INTERVAL seconds. If the deletion fails
+    for any reason, the Room is no longer suspended so that it may be used and deleted again. If
+    the server stops before then, the deletion is finished when it starts again (see
+    finish_deletions()).
+
+    Arguments:
+        room (Room): The database object of the suspended room.
+        owner (OBUser): The owner of the room, who sent the command.
+    """
+
+    room_id = room.id
+    query_sets = get_room_query_sets(room_id)
+
+    # pylint: disable=broad-except
+    # Justification: The Room must not stay suspended, and unusable, whatever the failure was.
+    try:
+        # Messages sent before the suspension may still be queued
+        await async_flush_messages()
+
+        total = 0
+
+        for query_set in query_sets:
+            total += await async_len_all(query_set)
+
+        deleted = 0
+        last_progress = time.monotonic()
+
+        for query_set in query_sets:
+            while True:
+                chunk_length = await async_delete_chunk(query_set)
+
+                if not chunk_length:
+                    break
+
+                deleted += chunk_length
+
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await send_progress(
+                        StringId.DeleteProgress.format(room, deleted, total),
+                        room_id,
+                        owner
+                    )
+
+        await async_delete(room)
+    except Exception:
+        LOGGER.exception("Deleting room %d failed", room_id)
+
+        try:
+            room.is_suspended = False
+            await async_save(room)
+            await send_invalidate_context(room_id, [owner])
+            await send_progress(StringId.DeleteFailed.format(room), room_id, owner)
+        except Exception:
+            LOGGER.exception("Room %d could not be unsuspended after its deletion failed", room_id)
 
-        # Delete all Admins
-        for admin in await async_filter(Admin, room=self.room):
-            await async_delete(admin)
+        return
+    # pylint: enable=broad-except
 
-        # Delete all Bans
-        for ban in await async_filter(Ban, room=self.room):
-            await async_delete(ban)
+    await send_progress(StringId.DeleteDone.format(room), room_id, owner)
 
-        # Delete all Messages
-        for message in await async_filter(Message, room=self.room):
-            await async_delete(message)
+    # Kick the owner last so that they could see the progress
+    await send_kick(room_id, [owner])
 
-        # Delete the room
-        await async_delete(self.room)
+    # Invalidate every context of the room
+    await send_invalidate_context(room_id)
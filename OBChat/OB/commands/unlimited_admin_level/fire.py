@@ -4,10 +4,10 @@ FireCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Admin, OBUser
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege
-from OB.utilities.database import async_delete, async_save, async_try_get
+from OB.utilities.database import UnitOfWork
+from OB.utilities.event import send_invalidate_privileges
+from OB.utilities.privilege import async_resolve_targets
 
 class FireCommand(BaseCommand):
     """
@@ -35,12 +35,14 @@ class FireCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        for username in self.args:
-            arg_user = await async_try_get(OBUser, username=username)
-
-            if arg_user:
-                arg_privilege = await async_get_privilege(arg_user, self.room)
-                arg_admin = await async_try_get(Admin, user=arg_user, room=self.room)
+        # Look up the targets, their privileges, and their adminships in one database hop
+        for target in await async_resolve_targets(self.args, self.room):
+            username, arg_user, arg_privilege, arg_admin = (
+                target.username,
+                target.user,
+                target.privilege,
+                target.admin
+            )
 
             # Target user does not exist
             if not arg_user:
@@ -61,7 +63,7 @@ class FireCommand(BaseCommand):
             else:
                 self.valid_targets += [{"user": arg_user, "adminship": arg_admin}]
 
-            return bool(self.valid_targets)
+        return bool(self.valid_targets)
 
     async def execute_implementation(self):
         """
@@ -72,16 +74,28 @@ class FireCommand(BaseCommand):
 
         fire_message_body = []
 
+        removed_adminships = []
+        limited_adminships = []
+
         for fired_user in self.valid_targets:
             # Remove the adminship if they were a normal Admin
             if fired_user["adminship"].is_limited:
-                await async_delete(fired_user["adminship"])
+                removed_adminships += [fired_user["adminship"]]
             # Limit the adminship if they were an Unlimited Admin
             else:
                 fired_user["adminship"].is_limited = True
-                await async_save(fired_user["adminship"])
+                limited_adminships += [fired_user["adminship"]]
+
+            fire_message_body += [f"    {fired_user['user']}"]
+
+        # Save the adminships with one query each for deletes and updates, in one database hop
+        work = UnitOfWork(atomic=True)
+        work.bulk_delete(removed_adminships)
+        work.bulk_update(limited_adminships, ["is_limited"])
+        await work.async_run()
 
-            fire_message_body += [f"    {fired_user}"]
+        # Bulk updates do not send signals, so invalidate the room's privileges here
+        await send_invalidate_privileges(self.room.id)
 
         self.sender_receipt += (
             # Add an extra newline to separate argument error messages from fire receipt
@@ -101,3 +115,11 @@ class FireCommand(BaseCommand):
             fire_message_body +
             [StringId.FireTargetsNotificationNote]
         )
+
+    async def send_responses(self):
+        """
+        Change the valid_targets list to be a list of OBUsers instead of a list of dicts.
+        """
+
+        self.valid_targets = [fired_user["user"] for fired_user in self.valid_targets]
+        await super().send_responses()
@@ -4,10 +4,11 @@ HireCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import Privilege
-from OB.models import Admin, OBUser
+from OB.models import Admin
 from OB.strings import StringId
-from OB.utilities.command import async_get_privilege
-from OB.utilities.database import async_save, async_try_get
+from OB.utilities.database import UnitOfWork
+from OB.utilities.event import send_invalidate_privileges
+from OB.utilities.privilege import async_resolve_targets
 
 class HireCommand(BaseCommand):
     """
@@ -35,12 +36,15 @@ class HireCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
-        for username in self.args:
-            arg_user = await async_try_get(OBUser, username=username)
-
-            if arg_user:
-                arg_privilege = await async_get_privilege(arg_user, self.room)
-                arg_admin = await async_try_get(Admin, user=arg_user, room=self.room)
+        # Look up the targets, their privileges, and their adminships in one database hop, including
+        # ephemeral anonymous users so that they get the HireAnon error
+        for target in await async_resolve_targets(self.args, self.room, include_anon=True):
+            username, arg_user, arg_privilege, arg_admin = (
+                target.username,
+                target.user,
+                target.privilege,
+                target.admin
+            )
 
             # Target user does not exist
             if not arg_user:
@@ -76,22 +80,29 @@ class HireCommand(BaseCommand):
 
         hire_message_body = []
 
+        unlimited_adminships = []
+        new_adminships = []
+
         for hired_user, target_adminship in self.valid_targets:
             if target_adminship and self.sender_privilege == Privilege.Owner:
                 # Make the Admin unlimited
                 target_adminship.is_limited = False
-                await async_save(target_adminship)
+                unlimited_adminships += [target_adminship]
             else:
                 # Make an adminship for the user
-                await async_save(
-                    Admin,
-                    user=hired_user,
-                    room=self.room,
-                    issuer=self.sender
-                )
+                new_adminships += [{"user": hired_user, "room": self.room, "issuer": self.sender}]
 
             hire_message_body += [f"    {hired_user}"]
 
+        # Save the adminships with one query each for updates and inserts, in one database hop
+        work = UnitOfWork(atomic=True)
+        work.bulk_update(unlimited_adminships, ["is_limited"])
+        work.bulk_save(Admin, new_adminships)
+        await work.async_run()
+
+        # Bulk queries do not send signals, so invalidate the room's privileges here
+        await send_invalidate_privileges(self.room.id)
+
         self.sender_receipt += (
             # Add an extra newline to separate argument error messages from fire receipt
             [("\n" if self.sender_receipt else "") + StringId.HireSenderReceiptPreface] +
@@ -4,9 +4,12 @@ WhoCommand class container module.
 
 from OB.commands.base import BaseCommand
 from OB.constants import GroupTypes
-from OB.models import Admin, Room
+from OB.models import Room
 from OB.strings import StringId
-from OB.utilities.database import async_get_owner, async_model_list, async_try_get
+from OB.utilities.anonymous import is_ephemeral
+from OB.utilities.database import async_filter
+from OB.utilities.presence import async_get_occupants
+from OB.utilities.privilege import async_get_privilege_tables
 
 class WhoCommand(BaseCommand):
     """
@@ -36,8 +39,14 @@ class WhoCommand(BaseCommand):
         See BaseCommand.check_arguments().
         """
 
+        # Look up every room argument with one query
+        arg_rooms = {
+            arg_room.name: arg_room
+            for arg_room in await async_filter(Room, group_type=GroupTypes.Room, name__in=self.args)
+        }
+
         for room_name in self.args:
-            arg_room = await async_try_get(Room, group_type=GroupTypes.Room, name=room_name)
+            arg_room = arg_rooms.get(room_name)
 
             if not arg_room:
                 self.sender_receipt += [StringId.WhoInvalidTarget.format(room_name)]
@@ -50,22 +59,41 @@ class WhoCommand(BaseCommand):
         """
         Construct a string of occupants in the room and send it back to the sender.
         The sender receipt includes per-argument error messages.
+        The occupants come from presence, including the Occupancy table if it is enabled, and their
+        suffixes from the rooms' privilege tables, which are loaded in one database hop if they are
+        not cached.
         """
 
+        room_occupants = await async_get_occupants([room.id for room in self.valid_targets])
+        privilege_tables = await async_get_privilege_tables(
+            [room for room in self.valid_targets if room_occupants[room.id]]
+        )
+
         for room in self.valid_targets:
-            occupants = await async_model_list(room.occupants)
+            # Saved users in the order they were created, then ephemeral users in the order they
+            # joined
+            occupants = room_occupants[room.id]
+            occupants = (
+                sorted(
+                    [user for user in occupants if not is_ephemeral(user)],
+                    key=lambda user: user.id
+                ) +
+                [user for user in occupants if is_ephemeral(user)]
+            )
 
             if not occupants:
                 who_string = StringId.WhoEmpty.format(room)
             else:
                 who_string = StringId.WhoPreface.format(room) + "\n"
 
+                privileges = privilege_tables[room.id]
+
                 for user in occupants:
                     user_suffix = ""
 
-                    if user == await async_get_owner(room):
+                    if user.id == privileges.owner_id:
                         user_suffix += StringId.OwnerSuffix
-                    if await async_try_get(Admin, user=user, room=room):
+                    if user.id in privileges.admins:
                         user_suffix += StringId.AdminSuffix
                     if user == self.sender:
                         user_suffix += StringId.YouSuffix
@@ -11,8 +11,9 @@ from channels.testing import WebsocketCommunicator
 
 from django.conf.urls import url
 
-from OB.constants import GroupTypes
+from OB.constants import FrameTypes, GroupTypes
 from OB.consumers import OBConsumer
+from OB.utilities.encoding import BINARY_SUBPROTOCOL, encode_binary, msgpack
 
 class OBCommunicator(WebsocketCommunicator):
     """
@@ -22,16 +23,22 @@ class OBCommunicator(WebsocketCommunicator):
     https://channels.readthedocs.io/en/latest/topics/testing.html
     """
 
-    def __init__(self, user, group_type, url_arg):
+    def __init__(self, user, group_type, url_arg, session_key=8, is_binary=False):
         """
         Sets up the OBCommunicator to simulate an OBConsumer with the given arguments.
         Gives a placeholder "session" key for the scope because OBConsumer uses a session key to
         generate anonymous usernames.
 
         Arguments:
-            user (OBUser): The user who will be assigned to the communicator's self.user.
+            user (OBUser or AnonymousUser): The user who will be assigned to the communicator's
+                self.user. An AnonymousUser connects as an ephemeral anonymous user (see
+                OB.utilities.anonymous).
             group_type (GroupType): Determines which type of group the communicator will connect to.
             url_arg (string): Either a room name or a username, depending on the group type.
+            session_key (string or int): The session key, which is the suffix of the username of an
+                ephemeral anonymous user. Must be unique among connected anonymous users.
+            is_binary (bool): Whether to request the binary protocol instead of JSON (see
+                OB.utilities.encoding). Requires OB_BINARY_PROTOCOL to be enabled.
         """
 
         if group_type == GroupTypes.Room:
@@ -48,7 +55,12 @@ class OBCommunicator(WebsocketCommunicator):
             raise TypeError("OBCommunicator.__init__ received an invalid GroupType.")
 
         self.scope["user"] = user
-        self.scope["session"] = SimpleNamespace(session_key=8)
+        self.scope["session"] = SimpleNamespace(session_key=session_key)
+        self.scope["subprotocols"] = [BINARY_SUBPROTOCOL] if is_binary else []
+        self.is_binary = is_binary
+
+        # Frames received in a batch frame that have not been returned by receive() yet
+        self.pending = []
 
     async def connect(self, timeout=1):
         """
@@ -58,28 +70,34 @@ class OBCommunicator(WebsocketCommunicator):
         is_connected, subprotocol = await super().connect()
 
         assert is_connected
-        assert not subprotocol
+        assert subprotocol == (BINARY_SUBPROTOCOL if self.is_binary else None)
 
         return self
 
     async def send(self, message_text):
         """
-        Sends a message in JSON format that OBConsumer uses.
+        Sends a message in the JSON or binary format that OBConsumer uses.
 
         Arguments:
             message_text (string): The desired text to be sent.
         """
 
-        message_json = json.dumps({"message_text": message_text})
-        await self.send_to(text_data=message_json)
+        if self.is_binary:
+            await self.send_to(bytes_data=encode_binary([FrameTypes.Message, message_text]))
+        else:
+            message_json = json.dumps({"message_text": message_text})
+            await self.send_to(text_data=message_json)
 
     async def receive(self):
         """
-        Decodes a JSON message received by this OBCommunicator and returns the message text.
+        Decodes a JSON or binary message received by this OBCommunicator and returns the message
+        text.
         If the frame received does not contain text, but contains a refresh signal, the refresh
         signal is returned as a dict.
         If the frame received contains neither text nor a refresh signal, the method attempts to
         receive another frame.
+        If the frame received is a batch frame, its frames are returned one at a time by this and
+        the following calls.
 
         Return Values:
             string: If text is received, the decoded text is returned
@@ -88,10 +106,42 @@ class OBCommunicator(WebsocketCommunicator):
         """
 
         while True:
-            receipt = json.loads(await self.receive_from())
+            if self.pending:
+                receipt = self.pending.pop(0)
+            elif self.is_binary:
+                receipt = self.decode_binary(msgpack.unpackb(await self.receive_from()))
+            else:
+                receipt = json.loads(await self.receive_from())
+
+            # Batch frames are lists of frames
+            if isinstance(receipt, list):
+                self.pending += receipt
+                continue
 
             if "text" in receipt:
                 return receipt["text"]
 
             if "refresh" in receipt:
                 return receipt
+
+    @staticmethod
+    def decode_binary(frame):
+        """
+        Converts an unpacked binary protocol frame into the same form as its JSON frame (see
+        OB.utilities.encoding).
+
+        Arguments:
+            frame (list): The unpacked binary protocol frame.
+
+        Return Values:
+            dict{string: obj} or list[dict{string: obj}]: The decoded frame, or a list of the
+                frames of a batch frame.
+        """
+
+        if frame[0] == FrameTypes.Batch:
+            return [OBCommunicator.decode_binary(batched) for batched in frame[1:]]
+
+        if frame[0] == FrameTypes.Refresh:
+            return {"refresh": True}
+
+        return {"text": frame[1], "sender_name": frame[2]}
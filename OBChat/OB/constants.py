@@ -23,6 +23,29 @@ class GroupTypes(IntEnum):
 
         return tuple((i.name, i.value) for i in cls)
 
+class FrameTypes(IntEnum):
+    """
+    The first element of every frame of the binary WebSocket protocol, which determines the layout
+    of the rest of the frame (see OB.utilities.encoding).
+    """
+
+    Invalid = 0
+    Message = 1
+    Refresh = 2
+    Batch = 3
+    Heartbeat = 4
+
+class OverflowPolicies(IntEnum):
+    """
+    What an OBConsumer does when its outbound queue is full because its client is not receiving
+    frames fast enough (see OB.utilities.outbound).
+    """
+
+    Invalid = 0
+    DropOldest = 1
+    Coalesce = 2
+    Disconnect = 3
+
 class Privilege(IntEnum):
     """
     The different levels of privilege that a user has to perform commands in a Room (see
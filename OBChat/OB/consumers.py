@@ -2,20 +2,26 @@
 OBConsumer class container module.
 """
 
-import json
+import asyncio
 
 from channels.generic.websocket import AsyncWebsocketConsumer
 
-from OB.commands import handle_command
+from OB.commands import queue_command
 from OB.constants import GroupTypes
-from OB.models import Ban, Message, OBUser, Room
-from OB.strings import StringId
+from OB.routers import set_current_user
+from OB.utilities import presence
+from OB.utilities.anonymous import is_ephemeral, make_anon_user, release_anon_user
 from OB.utilities.command import is_command_format
-from OB.utilities.database import async_add, async_delete, async_filter, async_get, \
-    async_model_list, async_remove, async_save, async_try_get
+from OB.utilities.context import async_join_room, async_load_context
+from OB.utilities.database import async_delete
 from OB.utilities.event import send_room_message
-from OB.utilities.format import get_datetime_string, get_group_name
-from OB.utilities.session import async_cycle_key
+from OB.utilities.encoding import BINARY_ENABLED, BINARY_SUBPROTOCOL, decode_message_text, \
+    encode_message, encode_refresh
+from OB.utilities.format import get_group_name, get_user_group_name
+from OB.utilities.outbound import CLOSE_TIMEOUT, SEND_FAILURE_CLOSE_CODE, SLOW_CLIENT_CLOSE_CODE, \
+    make_outbound_queue
+from OB.utilities.persistence import async_save_message
+from OB.utilities.privilege import invalidate_privilege_table
 
 class OBConsumer(AsyncWebsocketConsumer):
     """
@@ -30,11 +36,20 @@ class OBConsumer(AsyncWebsocketConsumer):
         Defines the instance variables for this consumer's session, user, and room.
         The session and user are unique to each OBConsumer.
         The room is not unique.
+        The context is a snapshot of the room and its owner (see OB.utilities.context).
+        is_binary is True if the client chose the binary protocol when it connected (see
+        OB.utilities.encoding).
+        The outbound queue holds frames waiting to be sent to the client by the outbound task (see
+        OB.utilities.outbound).
         """
 
         self.session = None
         self.user = None
         self.room = None
+        self.context = None
+        self.is_binary = False
+        self.outbound = None
+        self.outbound_task = None
 
         super().__init__(*args, **kwargs)
 
@@ -45,72 +60,89 @@ class OBConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         """
         Set the data for a consumer before it accepts an incoming WebSocket.
-        Add the OBConsumer's user reference to the OBConsumer's room reference's list of
-        occupants.
+        Add the OBConsumer's user to the occupants of its room (see OB.utilities.presence).
         """
 
         # Set the session
         self.session = self.scope["session"]
-        if not self.session.session_key:
-            await async_cycle_key(self.session)
 
         # Set the user
         if self.scope["user"].is_authenticated:
             self.user = self.scope["user"]
         else:
-            # Make an OBUser object for this anonymous user's session
-            while await async_try_get(OBUser, username=f"{StringId.AnonPrefix}{self.session.session_key}"):
-                await async_cycle_key(self.session)
-
-            self.user = await async_save(
-                OBUser,
-                username=f"{StringId.AnonPrefix}{self.session.session_key}",
-                is_anon=True
-            )
+            # Make an ephemeral OBUser object for this anonymous user's session, without saving it
+            self.user = make_anon_user(self.session.session_key)
+
+        # Send this user's reads to the primary database after they write (see OB.routers)
+        set_current_user(self.user)
 
         # Chat room
         if "room_name" in self.scope["url_route"]["kwargs"]:
-            room_name = self.scope["url_route"]["kwargs"]["room_name"]
             group_type = GroupTypes.Room
+            url_arg = self.scope["url_route"]["kwargs"]["room_name"]
         # Private message
         elif "username" in self.scope["url_route"]["kwargs"]:
-            target_username = self.scope["url_route"]["kwargs"]["username"]
-            target_user = await async_get(OBUser, username=target_username)
-            room_name = get_group_name(GroupTypes.Private, self.user.id, target_user.id)
             group_type = GroupTypes.Private
+            url_arg = self.scope["url_route"]["kwargs"]["username"]
         else:
             raise SystemError("OBConsumer could not get arguments from URL route.")
 
-        self.room = await async_get(Room, group_type=group_type, name=room_name)
+        # Load the room and its owner and check for a ban in one database hop
+        self.context = await async_join_room(self.user, group_type, url_arg)
 
-        # Stop here if banned
-        if await async_filter(Ban, user=self.user, room=self.room, is_lifted=False):
+        # Stop here if the room does not exist or if banned
+        if not self.context:
+            if is_ephemeral(self.user):
+                release_anon_user(self.user)
             return
 
+        self.room = self.context.room
+
         # Add to room group
         await self.channel_layer.group_add(
             get_group_name(GroupTypes.Room, self.room.id),
             self.channel_name
         )
 
-        # Add to the occupants list for this room
-        room = await async_get(Room, group_type=group_type, name=room_name)
-        await async_add(room.occupants, self.user)
+        # Add to this user's group for the room, which receives messages with recipients
+        await self.channel_layer.group_add(
+            get_user_group_name(self.user.id, self.room.id),
+            self.channel_name
+        )
+
+        # Add to the occupants of the room, without a database hop
+        presence.join(self.room.id, self.user, self.channel_name)
 
-        await self.accept()
+        # Use the binary protocol if the client asked for it
+        if BINARY_ENABLED and BINARY_SUBPROTOCOL in self.scope.get("subprotocols", []):
+            self.is_binary = True
+            await self.accept(BINARY_SUBPROTOCOL)
+        else:
+            await self.accept()
+
+        # Start sending queued frames
+        self.outbound = make_outbound_queue()
+        if self.outbound:
+            self.outbound_task = asyncio.ensure_future(
+                self.outbound.run(self.send_frame, self.close_after_send_failure)
+            )
 
     async def disconnect(self, code):
         """
         Leaves the Room group that this consumer was a part of. It will no longer send to or
         receive from that group.
-        Remove the OBConsumer's user reference to the OBConsumer's room reference's list of
-        occupants.
+        Remove the OBConsumer's user from the occupants of its room (see OB.utilities.presence).
         Called automatically when a WebSocket connection is disconnected by the client.
 
         Arguments:
             code: A disconnect code to indicate disconnect conditions
         """
 
+        # Stop sending queued frames
+        if self.outbound_task:
+            self.outbound_task.cancel()
+            self.outbound_task = None
+
         # The Consumer has already been disconnected
         if self.room is None or self.room.id is None:
             return
@@ -121,20 +153,35 @@ class OBConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
+        # Leave this user's group for the room
+        await self.channel_layer.group_discard(
+            get_user_group_name(self.user.id, self.room.id),
+            self.channel_name
+        )
+
+        # Remove from the occupants of the room, without a database hop
+        presence.leave(self.room.id, self.user, self.channel_name)
+
         print(f"WebSocket disconnected with code {code}.")
 
+        # Forget ephemeral anonymous users, which does not access the database
+        if is_ephemeral(self.user):
+            release_anon_user(self.user)
+
         if code == "safe":
             return
 
-        # Remove from the occupants list for this room and remove the room reference
-        await async_remove(self.room.occupants, self.user)
-        self.room = None
-
-        # Delete anonymous users' temporary OBUser from the database and remove the user reference
-        if self.user.is_anon:
+        # Remove the room and context references
+        if is_ephemeral(self.user):
+            self.user = None
+        elif self.user.is_anon:
+            # Delete anonymous users' saved OBUser from the database
             await async_delete(self.user)
             self.user = None
 
+        self.room = None
+        self.context = None
+
     async def close(self, code=None):
         """
         Forcibly closes a WebSocket from the server-side.
@@ -143,9 +190,23 @@ class OBConsumer(AsyncWebsocketConsumer):
             code: A close code to indicate close conditions
         """
 
+        # Give the client a chance to receive frames that are already queued, like a refresh signal
+        if self.outbound_task and not self.outbound_task.done():
+            await self.outbound.join(CLOSE_TIMEOUT)
+
         await self.disconnect(code)
         await super().close(code)
 
+    async def close_after_send_failure(self):
+        """
+        Closes the WebSocket after the outbound task failed to send a frame (see
+        OB.utilities.outbound.OutboundQueue.run()).
+        Called from the outbound task itself, so it is not cancelled or waited for.
+        """
+
+        self.outbound_task = None
+        await self.close(SEND_FAILURE_CLOSE_CODE)
+
     ###############################################################################################
     # Messaging Methods                                                                           #
     ###############################################################################################
@@ -156,51 +217,57 @@ class OBConsumer(AsyncWebsocketConsumer):
         consumers group.
         Only the consumer whose user sent the message will call this method.
         This is called first in the consumer messaging process.
-        Finally, if the message is in command format, then handle the command (see
-        is_command_format()).
+        Finally, if the message is in command format, then queue the command to be handled in the
+        background (see is_command_format() and OB.commands.command_handler.queue_command()).
 
         Arguments:
             text_data (string): A JSON string containing the message text. Constructed in the
                 JavaScript of room.html.
-            bytes_data: Not used yet, but will contain images or other message contents which
-                cannot be represented by text.
+            bytes_data (bytes): A binary protocol frame containing the message text (see
+                OB.utilities.encoding).
         """
 
         # Skip empty messages
         if not text_data and not bytes_data:
             return
 
-        # Decode the JSON
-        message_text = json.loads(text_data)["message_text"]
+        # Every frame shows that the client is still connected, including heartbeats
+        presence.heartbeat(self.room.id, self.user, self.channel_name)
+
+        # Suspended rooms are being deleted and do not accept messages
+        if self.room.is_suspended:
+            return
+
+        # Decode the JSON or binary frame
+        message_text = decode_message_text(text_data, bytes_data)
+
+        if not message_text:
+            return
 
-        # Save message to database
-        new_message = await async_save(
-            Message,
+        # Save message to database, with the sender as the only recipient if it is a command
+        recipients = [self.user] if is_command_format(message_text) else []
+        new_message = await async_save_message(
+            recipients,
             message=message_text,
             sender=self.user if not self.user.is_anon else None,
             room=self.room,
             anon_username=self.user.username if self.user.is_anon else None
         )
 
-        # Add sender as the only recipient if message is a command
-        await async_add(new_message.recipients, self.user if is_command_format(message_text) else None)
-        recipients = await async_model_list(new_message.recipients)
-
-        # Encode the message data and metadata
-        message_json = json.dumps({
-            "text": message_text,
-            "sender_name": self.user.display_name or self.user.username,
-            "has_recipients": bool(recipients),
-            "has_exclusions": False,
-            "timestamp": get_datetime_string(new_message.timestamp)
-        })
+        # Encode the message data and metadata once for every recipient
+        envelope = encode_message(
+            message_text,
+            self.user.display_name or self.user.username,
+            new_message.timestamp,
+            has_recipients=bool(recipients)
+        )
 
         # Send message to room group
-        await send_room_message(message_json, self.room.id, recipients)
+        await send_room_message(envelope, self.room.id, recipients)
 
         if is_command_format(message_text):
-            # Handle command
-            await handle_command(message_text, self.user, self.room)
+            # Handle command in the background so that this consumer keeps receiving events
+            queue_command(message_text, self.user, self.room)
 
     # This may be of use later on
     async def send(self, text_data=None, bytes_data=None, close=False):
@@ -212,13 +279,44 @@ class OBConsumer(AsyncWebsocketConsumer):
 
         Arguments:
             text_data (string): A JSON string containing the message text.
-            bytes_data: Not used yet, but will contain images or other message contents which
-                cannot be represented by text.
+            bytes_data (bytes): A binary protocol frame containing the message text.
             close: Used to send a WebSocket close signal to terminate the connection.
         """
 
         await super().send(text_data, bytes_data, close)
 
+    async def send_frame(self, frame):
+        """
+        Send an encoded frame to the client.
+
+        Arguments:
+            frame (string or bytes): A JSON frame or a binary protocol frame.
+        """
+
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def send_envelope(self, envelope):
+        """
+        Queue the frame of an envelope in the protocol this consumer's client chose (see
+        OB.utilities.encoding).
+        Disconnect the client if its outbound queue overflows and the overflow policy is to
+        disconnect.
+
+        Arguments:
+            envelope (dict{string: string/bytes}): The encoded frames.
+        """
+
+        frame = envelope["bytes"] if self.is_binary else envelope["text"]
+
+        if not self.outbound:
+            await self.send_frame(frame)
+        elif not self.outbound.put(frame):
+            print(f"WebSocket outbound queue overflowed ({self.outbound.dropped_frames} dropped).")
+            await self.close(SLOW_CLIENT_CLOSE_CODE)
+
     ###############################################################################################
     # Event Handler Methods                                                                       #
     ###############################################################################################
@@ -226,29 +324,70 @@ class OBConsumer(AsyncWebsocketConsumer):
     async def room_message(self, event):
         """
         An event of type "room_message" was sent to a group this consumer is a part of.
-        Send the message JSON to the client associated with this consumer.
+        Send the message envelope to the client associated with this consumer.
+        Messages with recipients are only sent to the recipients' user groups (see
+        OB.utilities.event.send_room_message()), so only exclusions need to be checked here.
 
         Arguments:
-            event (dict): Contains the message JSON
+            event (dict): Contains the message envelope and the IDs of excluded users
         """
 
-        has_recipients = all(id >= 0 for id in event["recipient_ids"])
-        is_user_recipient = self.user.id in event["recipient_ids"]
-        is_user_excluded = self.user.id in event["exclusion_ids"]
+        # Events sent before this consumer left its groups may still arrive after it disconnected
+        if self.user is None:
+            return
 
-        if not is_user_excluded and (not has_recipients or is_user_recipient):
-            await self.send(text_data=event["message_json"])
+        if self.user.id not in event["exclusion_ids"]:
+            await self.send_envelope(event["envelope"])
 
     async def kick(self, event):
         """
         An event of type "kick" was sent to a group this consumer is a part of.
-        Perform actions depending on if the user associated with this consumer is specified.
+        Leave the room if the user associated with this consumer is specified or if no users are
+        specified, unless the user is excluded.
 
         Arguments:
-            event (dict): Contains the target user's ID
+            event (dict): Contains the IDs of the users to kick, or None for all users, and the IDs
+                of excluded users.
         """
 
-        if event["target_id"] == self.user.id:
-            refresh_signal = {"refresh": True}
-            await self.send(text_data=json.dumps(refresh_signal))
+        # A kick sent before this consumer left its groups may arrive after it was already kicked
+        if self.user is None or self.user.id in event["exclusion_ids"]:
+            return
+
+        if event["target_ids"] is None or self.user.id in set(event["target_ids"]):
+            await self.send_envelope(encode_refresh())
             await self.close("kick")
+
+    async def invalidate_context(self, event):
+        """
+        An event of type "invalidate_context" was sent to a group this consumer is a part of.
+        Reload this consumer's context if the user associated with this consumer is specified or if
+        no users are specified.
+
+        Arguments:
+            event (dict): Contains the IDs of the users whose context should be reloaded, or None
+                for all users.
+        """
+
+        if self.context is None:
+            return
+
+        if event["user_ids"] is None or self.user.id in event["user_ids"]:
+            context = await async_load_context(id=self.room.id)
+
+            # The room may have been deleted, in which case this consumer will be kicked
+            if context:
+                self.context = context
+                self.room = context.room
+
+    async def invalidate_privileges(self, event):
+        """
+        An event of type "invalidate_privileges" was sent to a group this consumer is a part of.
+        Remove the room's privilege table from this process's cache, once for every OBConsumer of
+        the process (see OB.utilities.privilege).
+
+        Arguments:
+            event (dict): Contains the room's ID and the token of the invalidation
+        """
+
+        invalidate_privilege_table(event["room_id"], event["token"])
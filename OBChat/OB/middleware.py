@@ -0,0 +1,37 @@
+"""
+CurrentUserMiddleware class container module.
+"""
+
+from OB.routers import CURRENT_USER_ID, set_current_user
+
+class CurrentUserMiddleware:
+    """
+    Sets the current user for database routing while a request is handled (see OB.routers).
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        """
+        Arguments:
+            get_response (function): The next middleware or the view.
+        """
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """
+        Handles a request as the current user.
+
+        Arguments:
+            request (HttpRequest): The request to handle.
+
+        Return values:
+            HttpResponse: The response from the next middleware or the view.
+        """
+
+        token = set_current_user(request.user)
+
+        try:
+            return self.get_response(request)
+        finally:
+            CURRENT_USER_ID.reset(token)
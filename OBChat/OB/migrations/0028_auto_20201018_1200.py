@@ -0,0 +1,83 @@
+# Generated by Django 3.0.6 on 2020-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merges the rows that would violate the unique constraints below.
+    Rooms with the same group type and name are merged into the oldest one, which takes their
+    Admins, Bans, and Messages. Then only the least limited, oldest Admin of each user in each room
+    is kept.
+    """
+
+    Admin = apps.get_model('OB', 'Admin')
+    Ban = apps.get_model('OB', 'Ban')
+    Message = apps.get_model('OB', 'Message')
+    Room = apps.get_model('OB', 'Room')
+
+    duplicate_rooms = (
+        Room.objects.values('group_type', 'name').annotate(count=Count('id')).filter(count__gt=1)
+    )
+
+    for duplicate in duplicate_rooms:
+        room_ids = list(
+            Room.objects.filter(group_type=duplicate['group_type'], name=duplicate['name'])
+            .order_by('id').values_list('id', flat=True)
+        )
+        kept_room = Room.objects.get(id=room_ids[0])
+        merged_ids = room_ids[1:]
+
+        for model in [Admin, Ban, Message]:
+            model.objects.filter(room_id__in=merged_ids).update(room=kept_room)
+
+        # The owner of the kept room does not need to be its admin
+        Admin.objects.filter(room=kept_room, user_id=kept_room.owner_id).delete()
+
+        for merged_room in Room.objects.filter(id__in=merged_ids):
+            kept_room.occupants.add(*merged_room.occupants.all())
+
+        Room.objects.filter(id__in=merged_ids).delete()
+
+    duplicate_admins = (
+        Admin.objects.values('user', 'room').annotate(count=Count('id')).filter(count__gt=1)
+    )
+
+    for duplicate in duplicate_admins:
+        admin_ids = list(
+            Admin.objects.filter(user_id=duplicate['user'], room_id=duplicate['room'])
+            .order_by('is_limited', 'id').values_list('id', flat=True)
+        )
+        Admin.objects.filter(id__in=admin_ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    # The merge runs in its own transaction (see atomic=True below), which commits before the
+    # constraints alter the same tables, so that its deferred foreign key checks have already run
+    atomic = False
+
+    dependencies = [
+        ('OB', '0027_auto_20201017_1200'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop, atomic=True),
+        migrations.AddIndex(
+            model_name='ban',
+            index=models.Index(fields=['user', 'room', 'is_lifted'], name='ob_ban_user_room_lifted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'timestamp'], name='ob_message_room_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='admin',
+            constraint=models.UniqueConstraint(fields=('user', 'room'), name='ob_admin_user_room_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='room',
+            constraint=models.UniqueConstraint(fields=('group_type', 'name'), name='ob_room_type_name_unique'),
+        ),
+    ]
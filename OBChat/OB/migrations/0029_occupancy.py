@@ -0,0 +1,33 @@
+# Generated by Django 3.0.6 on 2020-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OB', '0028_auto_20201018_1200'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Occupancy',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occupant_id', models.BigIntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('process_id', models.CharField(max_length=32)),
+                ('last_seen', models.DateTimeField()),
+                ('room', models.ForeignKey(default=-1, on_delete=django.db.models.deletion.CASCADE, to='OB.Room')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='occupancy',
+            index=models.Index(fields=['last_seen'], name='ob_occupancy_last_seen_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='occupancy',
+            constraint=models.UniqueConstraint(fields=('room', 'occupant_id', 'process_id'), name='ob_occupancy_room_occupant_process_unique'),
+        ),
+    ]
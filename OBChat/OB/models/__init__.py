@@ -11,5 +11,6 @@ https://docs.djangoproject.com/en/3.0/topics/db/models/
 from OB.models.admin import Admin
 from OB.models.ban import Ban
 from OB.models.message import Message
+from OB.models.occupancy import Occupancy
 from OB.models.ob_user import OBUser
 from OB.models.room import Room
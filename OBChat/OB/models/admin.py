@@ -3,7 +3,7 @@ Admin class container module.
 """
 
 from django.db.models import BooleanField, CASCADE, CharField, DateField, DateTimeField, \
-    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
+    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField, UniqueConstraint
 
 from OB.models.ob_user import OBUser
 from OB.models.room import Room
@@ -34,6 +34,16 @@ class Admin(Model):
     )
     is_limited = BooleanField(default=True)
 
+    class Meta:
+        """
+        Constraints for the Admin lookups made by commands.
+        """
+
+        constraints = [
+            # A user has at most one adminship per room, which privilege lookups rely on
+            UniqueConstraint(fields=["user", "room"], name="ob_admin_user_room_unique")
+        ]
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         super().save(
             force_insert=force_insert,
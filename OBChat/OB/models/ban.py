@@ -3,7 +3,7 @@ Ban class container module.
 """
 
 from django.db.models import BooleanField, CASCADE, CharField, DateField, DateTimeField, \
-    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
+    ForeignKey, Index, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
 
 from OB.models.ob_user import OBUser
 from OB.models.room import Room
@@ -36,6 +36,16 @@ class Ban(Model):
     timestamp = DateTimeField(auto_now_add=True)
     is_lifted = BooleanField(default=False)
 
+    class Meta:
+        """
+        Indexes for the Ban lookups made by consumers and commands.
+        """
+
+        indexes = [
+            # Active ban lookups when connecting and banning
+            Index(fields=["user", "room", "is_lifted"], name="ob_ban_user_room_lifted_idx")
+        ]
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         super().save(
             force_insert=force_insert,
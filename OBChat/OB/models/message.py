@@ -3,7 +3,8 @@ Message class container module.
 """
 
 from django.db.models import BooleanField, CASCADE, CharField, DateField, DateTimeField, \
-    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
+    ForeignKey, Index, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
+from django.utils.timezone import now
 
 from OB.models.room import Room
 from OB.models.ob_user import OBUser
@@ -47,10 +48,22 @@ class Message(Model):
         on_delete=CASCADE,
         default=-1
     )
-    timestamp = DateTimeField(auto_now_add=True)
+    # Not auto_now_add so that write-behind persistence can keep the timestamp that was broadcast
+    # (see OB.utilities.persistence)
+    timestamp = DateTimeField(default=now)
     is_edited = BooleanField(default=False)
     is_deleted = BooleanField(default=False)
 
+    class Meta:
+        """
+        Indexes for the Message lookups made by consumers and views.
+        """
+
+        indexes = [
+            # Room history in order
+            Index(fields=["room", "timestamp"], name="ob_message_room_time_idx")
+        ]
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         super().save(force_insert=force_insert, force_update=force_update, using=using,
                      update_fields=update_fields)
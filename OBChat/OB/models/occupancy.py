@@ -0,0 +1,64 @@
+"""
+Occupancy class container module.
+"""
+
+from django.db.models import BigIntegerField, CASCADE, CharField, DateTimeField, ForeignKey, \
+    Index, Model, UniqueConstraint
+
+from OB.models.room import Room
+
+class Occupancy(Model):
+    """
+    Record of a user being in a room, written by the server process that serves the user's
+    WebSockets (see OB.utilities.presence).
+    Each process refreshes last_seen for its own rows while it runs, so the rows of a process that
+    stopped abruptly expire instead of being deleted by other processes.
+    """
+
+    room = ForeignKey(
+        Room,
+        on_delete=CASCADE,
+        default=-1
+    )
+    # Not a ForeignKey, because ephemeral anonymous users have no database row (see
+    # OB.utilities.anonymous)
+    occupant_id = BigIntegerField()
+    username = CharField(max_length=150)
+    process_id = CharField(max_length=32)
+    last_seen = DateTimeField()
+
+    class Meta:
+        """
+        Constraints and indexes for the presence lookups.
+        """
+
+        constraints = [
+            # A process records each user at most once per room
+            UniqueConstraint(
+                fields=["room", "occupant_id", "process_id"],
+                name="ob_occupancy_room_occupant_process_unique"
+            )
+        ]
+        indexes = [
+            # Expiring the rows of stopped processes
+            Index(fields=["last_seen"], name="ob_occupancy_last_seen_idx")
+        ]
+
+    def __str__(self, show_id=False):
+        display_string = f"{self.username} in room {self.room_id}"
+
+        if show_id:
+            display_string += f"[{self.id}]"
+
+        return display_string
+
+    def __repr__(self):
+        return "\n".join([
+            f"Occupancy {{",
+            f"    room: {self.room_id}",
+            f"    occupant_id: {self.occupant_id}",
+            f"    username: {self.username}",
+            f"    process_id: {self.process_id}",
+            f"    last_seen: {self.last_seen}",
+            f"}}"
+        ])
@@ -3,7 +3,7 @@ Room class container module.
 """
 
 from django.db.models import BooleanField, CASCADE, CharField, DateField, DateTimeField, \
-    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField
+    ForeignKey, ManyToManyField, Model, IntegerField, SET_DEFAULT, TextField, UniqueConstraint
 
 from OB.constants import GroupTypes
 from OB.models.ob_user import OBUser
@@ -41,6 +41,16 @@ class Room(Model):
         related_name="occupied_room"
     )
 
+    class Meta:
+        """
+        Constraints for the Room lookups made by consumers, commands, and views.
+        """
+
+        constraints = [
+            # Rooms are looked up by name, so names are unique within each group type
+            UniqueConstraint(fields=["group_type", "name"], name="ob_room_type_name_unique")
+        ]
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         super().save(
             force_insert=force_insert,
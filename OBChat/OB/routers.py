@@ -0,0 +1,176 @@
+"""
+ReadReplicaRouter class container module.
+
+If OB_READ_DATABASE is set, reads of Rooms and Messages, which make up the room list and the
+history of each room, are sent to that database alias. Every other read and every write is sent to
+"default".
+
+Replicas may lag behind the primary, so a user who just wrote reads from the primary for
+OB_READ_STICKINESS seconds afterwards. The current user is set by CurrentUserMiddleware for views
+and by OBConsumer for WebSockets (see set_current_user()).
+"""
+
+import time
+
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_DATABASE = getattr(settings, "OB_READ_DATABASE", None)
+READ_STICKINESS = getattr(settings, "OB_READ_STICKINESS", 5.0)
+
+# The models whose reads may be sent to the replica, by label
+REPLICA_MODELS = {"OB.Message", "OB.Room"}
+
+# The id of the user whose request or WebSocket is being handled
+CURRENT_USER_ID = ContextVar("CURRENT_USER_ID", default=None)
+
+# When reads in this context stop being sent to the primary, for writes without a current user
+CONTEXT_STICKY_UNTIL = ContextVar("CONTEXT_STICKY_UNTIL", default=0)
+
+# When each user's reads stop being sent to the primary, by user id
+STICKY_UNTIL = {}
+
+def set_current_user(user):
+    """
+    Sets the user whose writes make their own reads go to the primary.
+
+    Arguments:
+        user (OBUser or AnonymousUser): The user whose request or WebSocket is being handled.
+
+    Return values:
+        Token: A token to reset the current user with (see ContextVar.reset()).
+    """
+
+    user_id = user.id if user is not None and user.is_authenticated else None
+    return CURRENT_USER_ID.set(user_id)
+
+def mark_written():
+    """
+    Sends the reads of the current user, and of the current context, to the primary for
+    READ_STICKINESS seconds.
+    """
+
+    sticky_until = time.monotonic() + READ_STICKINESS
+    CONTEXT_STICKY_UNTIL.set(sticky_until)
+
+    user_id = CURRENT_USER_ID.get()
+
+    if user_id is not None:
+        STICKY_UNTIL[user_id] = sticky_until
+
+        # Forget expired users once in a while so that the dict does not grow forever
+        if len(STICKY_UNTIL) > 10000:
+            now = time.monotonic()
+
+            # Other threads may write to the dict while it is being pruned
+            for expired_id, expires_at in list(STICKY_UNTIL.items()):
+                if expires_at < now:
+                    STICKY_UNTIL.pop(expired_id, None)
+
+def is_sticky():
+    """
+    Determines if the current user or context wrote within the last READ_STICKINESS seconds.
+
+    Return values:
+        boolean: True if reads should be sent to the primary.
+    """
+
+    now = time.monotonic()
+
+    if CONTEXT_STICKY_UNTIL.get() > now:
+        return True
+
+    user_id = CURRENT_USER_ID.get()
+
+    return user_id is not None and STICKY_UNTIL.get(user_id, 0) > now
+
+class ReadReplicaRouter:
+    """
+    Sends reads of Rooms and Messages to OB_READ_DATABASE and everything else to "default".
+    Does nothing if OB_READ_DATABASE is not set.
+
+    See the Django documentation on multiple databases for more information.
+    https://docs.djangoproject.com/en/3.1/topics/db/multi-db/
+    """
+
+    # pylint: disable=no-self-use, unused-argument
+    # Justification: Django calls router methods on an instance with these arguments.
+    def db_for_read(self, model, **hints):
+        """
+        Chooses the database for reading a model.
+
+        Arguments:
+            model (Class): The database model class being read.
+            hints: Information from Django, such as the instance the read is related to.
+
+        Return values:
+            string: The database alias, or None to let Django choose.
+        """
+
+        if not READ_DATABASE:
+            return None
+
+        if (
+            model._meta.label not in REPLICA_MODELS or
+            # Reads in a transaction must see its writes
+            connections[DEFAULT_DB_ALIAS].in_atomic_block or
+            is_sticky()
+        ):
+            return DEFAULT_DB_ALIAS
+
+        return READ_DATABASE
+
+    def db_for_write(self, model, **hints):
+        """
+        Chooses the primary for every write, and sends the writer's reads to the primary for a
+        while.
+
+        Arguments:
+            model (Class): The database model class being written.
+            hints: Information from Django, such as the instance being written.
+
+        Return values:
+            string: The database alias, or None to let Django choose.
+        """
+
+        if not READ_DATABASE:
+            return None
+
+        mark_written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Allows relations between objects read from either database, which have the same data.
+
+        Return values:
+            boolean: True if both objects are in the primary or the replica.
+        """
+
+        if not READ_DATABASE:
+            return None
+
+        databases = {DEFAULT_DB_ALIAS, READ_DATABASE}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Only migrates the primary, since the replica copies its schema from it.
+
+        Arguments:
+            db (string): The database alias being migrated.
+            app_label (string): The label of the app being migrated.
+            model_name (string or None): The name of the model being migrated.
+            hints: Information from Django, such as the model class.
+
+        Return values:
+            boolean: True if the database is the primary.
+        """
+
+        if not READ_DATABASE:
+            return None
+
+        return db == DEFAULT_DB_ALIAS
+    # pylint: enable=no-self-use, unused-argument
@@ -37,6 +37,7 @@ class StringId:
     ElevateTargetsNotificationPreface = "Received an elevation request from {0}"
     Recipients = "Recipients:"
     CommandRequested = "Command requested:"
+    CommandFailed = "Something went wrong while running {0}, so it may not have finished. Try again later."
     Message = "Message:"
     AnonKicking = "You're not even logged in! Try making an account first, then we can talk about kicking people."
     NonAdminKicking = "That's a little outside your pay-grade. Only admins may kick users. Try to /apply to be an Admin."
@@ -70,6 +71,10 @@ class StringId:
     CreateSenderReceipt = "Sold! Check out your new room: {0}"
     NonOwnerDeleting = "Trying to delete someone else's room? How rude. Only the room owner may delete a room"
     DeleteSyntax = "Usage: /delete <room name> <owner username>"
+    DeleteStarted = "Deleting {0}. Everyone else has been kicked, and no one can join until it's gone."
+    DeleteProgress = "Still deleting {0}... {1} of {2} rows gone."
+    DeleteDone = "{0} has been deleted. Nothing lasts forever."
+    DeleteFailed = "Something went wrong while deleting {0}, so it's open again. Try again later."
     NonUnlimitedAdminFiring = "That's a little outside your pay-grade. Only Unlimited Admins may fire admins. Try to /apply to be Unlimited."
     FireSyntax = "Usage: /fire <user1> <user2> ..."
     FireUserNotPresent = "{0} does not exist. You can't fire a ghost... can you?"
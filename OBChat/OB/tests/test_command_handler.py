@@ -0,0 +1,152 @@
+"""
+Command queue test module (see OB.commands.command_handler).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+import asyncio
+
+from types import SimpleNamespace
+
+from pytest import mark
+
+import OB.commands
+
+from OB.commands import command_handler
+from OB.commands.command_handler import async_flush_commands, COMMAND_QUEUES, COMMAND_TASKS, \
+    queue_command
+from OB.models import OBUser
+from OB.strings import StringId
+
+# The arguments of each executed command, in the order they finished
+EXECUTED = []
+
+# The system messages sent to the senders of commands
+RECEIPTS = []
+
+class RecordCommand:
+    """
+    A command that waits for as many hundredths of a second as its first argument, then records
+    that it finished.
+    """
+
+    def __init__(self, arguments, sender, room):
+        """
+        Arguments:
+            arguments (list[string]): The arguments of the command.
+            sender (OBUser): The user who issued the command.
+            room (Room): The room the command was sent from.
+        """
+
+        self.arguments = arguments
+        self.room = room
+
+    async def execute(self):
+        """
+        Waits, then records the command's room and first argument.
+        """
+
+        await asyncio.sleep(int(self.arguments[0]) / 100)
+        EXECUTED.append((self.room.id, self.arguments[0]))
+
+class FailCommand(RecordCommand):
+    """
+    A command that raises while it executes.
+    """
+
+    async def execute(self):
+        """
+        Raises an error.
+        """
+
+        raise ValueError("The command failed")
+
+async def record_receipt(message_text, room, recipients):
+    """
+    Records a system message instead of sending it (see
+    OB.utilities.event.send_system_room_message()).
+
+    Arguments:
+        message_text (string): The text of the system message.
+        room (Room): The room the message would be sent to.
+        recipients (list[OBUser]): The users who would see the message.
+    """
+
+    RECEIPTS.append((message_text, room.id, recipients))
+
+# The state replaced by setup_function() and restored by teardown_function()
+SAVED_STATE = {}
+
+def setup_function():
+    """
+    Adds the test commands and records system messages instead of sending them.
+    This is a built-in pytest fixture that runs before every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    SAVED_STATE["send_system_room_message"] = command_handler.send_system_room_message
+    command_handler.send_system_room_message = record_receipt
+    OB.commands.COMMANDS["/record"] = RecordCommand
+    OB.commands.COMMANDS["/fail"] = FailCommand
+
+    EXECUTED.clear()
+    RECEIPTS.clear()
+
+def teardown_function():
+    """
+    Removes the test commands and restores system messages.
+    This is a built-in pytest fixture that runs after every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    command_handler.send_system_room_message = SAVED_STATE["send_system_room_message"]
+    del OB.commands.COMMANDS["/record"]
+    del OB.commands.COMMANDS["/fail"]
+
+@mark.asyncio
+async def test_order():
+    """
+    Tests that the commands of a room are executed one at a time in the order they were queued,
+    while the commands of different rooms run concurrently.
+    """
+
+    sender = OBUser(id=1, username="ob")
+    room = SimpleNamespace(id=1)
+    other_room = SimpleNamespace(id=2)
+
+    for delay in ["3", "2", "1"]:
+        queue_command(f"/record {delay}", sender, room)
+
+    queue_command("/record 0", sender, other_room)
+
+    await asyncio.wait_for(async_flush_commands(), 5)
+
+    assert EXECUTED == [(2, "0"), (1, "3"), (1, "2"), (1, "1")]
+    assert not COMMAND_QUEUES
+    assert not COMMAND_TASKS
+
+@mark.asyncio
+async def test_failure():
+    """
+    Tests that the sender of a command that raises is told it failed, and that the commands queued
+    after it still run.
+    """
+
+    sender = OBUser(id=1, username="ob")
+    room = SimpleNamespace(id=1)
+
+    queue_command("/record 1", sender, room)
+    queue_command("/fail", sender, room)
+    queue_command("/record 0", sender, room)
+
+    await asyncio.wait_for(async_flush_commands(), 5)
+
+    assert EXECUTED == [(1, "1"), (1, "0")]
+    assert RECEIPTS == [(StringId.CommandFailed.format("/fail"), 1, [sender])]
+    assert not COMMAND_QUEUES
+    assert not COMMAND_TASKS
@@ -6,11 +6,12 @@ import asyncio
 
 from pytest import mark
 
-from OB.models import Ban, OBUser
+from OB.models import Ban
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
-from OB.utilities.database import async_add_occupants, async_delete, async_get, async_model_list, \
-    async_save, async_try_get
+from OB.utilities.anonymous import is_ephemeral
+from OB.utilities.database import async_delete, async_get, async_save, async_try_get
+from OB.utilities.presence import get_occupants, is_present
 
 class BanTest(BaseCommandTest):
     """
@@ -52,10 +53,21 @@ class BanTest(BaseCommandTest):
             [self.auth_users[0]]
         )
 
+        # Test limited Admin banning anonymous user
+        await self.test_success(
+            self.limited_admins[0],
+            [self.anon_users[0]]
+        )
+
         # Test owner banning multiple users
         await self.test_success(
             self.owner,
-            [self.unlimited_admins[0], self.limited_admins[0], self.auth_users[0]]
+            [
+                self.unlimited_admins[0],
+                self.limited_admins[0],
+                self.auth_users[0],
+                self.anon_users[1]
+            ]
         )
 
         # Test unauthenticated user banning error
@@ -161,7 +173,7 @@ class BanTest(BaseCommandTest):
         assert await self.communicators[sender.username].receive() == sender_response
 
         # Test others response
-        occupants = await async_model_list(self.room.occupants)
+        occupants = get_occupants(self.room.id)
 
         for user in occupants:
             if user not in targets and user != sender:
@@ -174,7 +186,12 @@ class BanTest(BaseCommandTest):
                 (await self.communicators[user.username].receive_output())["type"]
                 == "websocket.close"
             )
-            assert user not in occupants
+            assert not is_present(self.room.id, user)
+
+            # Ephemeral anonymous users have no database object to ban, so they are only kicked
+            if is_ephemeral(user):
+                assert not await async_try_get(Ban, user_id=user.id)
+                continue
 
             # Test ban
             ban = await async_get(Ban, user=user)
@@ -189,20 +206,7 @@ class BanTest(BaseCommandTest):
                 # Remove ban
                 await async_delete(ban)
 
-        # Add banned users back to room occupants and reset Communicators
+        # Reset Communicators, which adds users whose ban was lifted back to the room occupants
         await self.communicator_teardown()
-        # Anonymous users are deleted when they disconnect, so make an identical replacement
-        for i in range(len(self.anon_users)):
-            if await async_try_get(OBUser, id=self.anon_users[i].id):
-                self.anon_users[i] = await async_save(
-                    OBUser,
-                    id=self.anon_users[i].id,
-                    username=self.anon_users[i].username,
-                    is_anon=True
-                )
-        await async_add_occupants(self.room, self.anon_users)
-        await async_add_occupants(self.room, self.auth_users)
-        await async_add_occupants(self.room, self.limited_admins)
-        await async_add_occupants(self.room, self.unlimited_admins)
-        await async_add_occupants(self.room, [self.owner])
+        # Anonymous users are ephemeral, so they are replaced when they connect again
         await self.communicator_setup()
@@ -4,11 +4,9 @@ KickTest class container module.
 
 from pytest import mark
 
-from OB.models import OBUser
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
-from OB.utilities.database import async_add_occupants, async_model_list, async_save, \
-    async_try_get
+from OB.utilities.presence import get_occupants, is_present
 
 class KickTest(BaseCommandTest):
     """
@@ -46,11 +44,18 @@ class KickTest(BaseCommandTest):
             [self.limited_admins[0], self.auth_users[0]]
         )
 
+        # Test limited Admin kicking anonymous user
+        await self.test_success(self.limited_admins[0], [self.anon_users[0]])
+
         # Test owner kicking multiple users
-        # TODO: Testing kicking anonymous users is causing database lock
         await self.test_success(
             self.owner,
-            [self.unlimited_admins[0], self.limited_admins[0], self.auth_users[0]]
+            [
+                self.unlimited_admins[0],
+                self.limited_admins[0],
+                self.auth_users[0],
+                self.anon_users[1]
+            ]
         )
 
         # Test unauthenticated user kicking error
@@ -138,7 +143,7 @@ class KickTest(BaseCommandTest):
         assert await self.communicators[sender.username].receive() == sender_response
 
         # Test others response
-        occupants = await async_model_list(self.room.occupants)
+        occupants = get_occupants(self.room.id)
         for user in occupants:
             if user not in targets and user != sender:
                 assert await self.communicators[user.username].receive() == others_response
@@ -150,22 +155,9 @@ class KickTest(BaseCommandTest):
                 (await self.communicators[user.username].receive_output())["type"]
                 == "websocket.close"
             )
-            assert user not in occupants
+            assert not is_present(self.room.id, user)
 
-        # Add kicked users back to room occupants and reset Communicators
+        # Reset Communicators, which adds kicked users back to the room occupants
         await self.communicator_teardown()
-        # Anonymous users are deleted when they disconnect, so make an identical replacement
-        for i in range(len(self.anon_users)):
-            if await async_try_get(OBUser, id=self.anon_users[i].id):
-                self.anon_users[i] = await async_save(
-                    OBUser,
-                    id=self.anon_users[i].id,
-                    username=self.anon_users[i].username,
-                    is_anon=True
-                )
-        await async_add_occupants(self.room, self.anon_users)
-        await async_add_occupants(self.room, self.auth_users)
-        await async_add_occupants(self.room, self.limited_admins)
-        await async_add_occupants(self.room, self.unlimited_admins)
-        await async_add_occupants(self.room, [self.owner])
+        # Anonymous users are ephemeral, so they are replaced when they connect again
         await self.communicator_setup()
@@ -8,8 +8,8 @@ from OB.constants import Privilege
 from OB.models import Admin, OBUser
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
-from OB.utilities.command import async_get_privilege
 from OB.utilities.database import async_filter, async_get
+from OB.utilities.privilege import async_get_privilege_table
 
 class ApplyTest(BaseCommandTest):
     """
@@ -60,7 +60,7 @@ class ApplyTest(BaseCommandTest):
             message (string): The accompanying message for the application.
         """
 
-        sender_privilege = await async_get_privilege(sender, self.room)
+        sender_privilege = (await async_get_privilege_table(self.room)).get(sender)
 
         # Send the command
         command = f" {message}" if message else ""
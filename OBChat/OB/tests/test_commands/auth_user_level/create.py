@@ -2,14 +2,16 @@
 CreateTest class container module.
 """
 
+from django.contrib.auth.models import AnonymousUser
+
 from pytest import mark
 
 from OB.communicators import OBCommunicator
 from OB.constants import GroupTypes
-from OB.models import Room
+from OB.models import Message, OBUser, Room
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
-from OB.utilities.database import async_get
+from OB.utilities.database import async_filter, async_get
 
 class CreateTest(BaseCommandTest):
     """
@@ -73,9 +75,10 @@ class CreateTest(BaseCommandTest):
         ).connect()
 
         self.communicators["anon_room_1"] = await OBCommunicator(
-            self.anon_users[1],
+            AnonymousUser(),
             GroupTypes.Room,
-            room_1.name
+            room_1.name,
+            session_key="room_1"
         ).connect()
 
         # Test new room messaging
@@ -105,3 +108,9 @@ class CreateTest(BaseCommandTest):
             await self.communicators["anon_room_1"].receive() ==
             message
         )
+
+        # Test that the ephemeral anonymous user's message is saved without an OBUser
+        saved_message = await async_get(Message, message=message, room=room_1)
+        assert saved_message.sender_id is None
+        assert saved_message.anon_username == f"{StringId.AnonPrefix}room_1"
+        assert not await async_filter(OBUser, is_anon=True)
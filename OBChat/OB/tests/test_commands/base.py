@@ -2,19 +2,22 @@
 The BaseCommandTest class container module.
 """
 
+import asyncio
 import sqlite3
 
 import django
 
 from channels.db import database_sync_to_async
 
+from django.contrib.auth.models import AnonymousUser
+
 from pytest import mark
 
 from OB.communicators import OBCommunicator
 from OB.constants import GroupTypes
 from OB.models import Admin, Ban, Message, OBUser, Room
 from OB.strings import StringId
-from OB.utilities.database import async_model_list
+from OB.utilities.anonymous import get_anon_user
 
 class BaseCommandTest:
     """
@@ -31,7 +34,9 @@ class BaseCommandTest:
             unlimited_admins (int): The number of Unlimited Admins that will be needed to test.
             limited_admins (int): The number of limited admins that will be needed to test.
             auth_users (int): The number of authenticated users that will be needed to test.
-            anon_users (int): The number of anonymous users that will be needed to test.
+            anon_users (int): The number of anonymous users that will be needed to test. They are
+                ephemeral, so they are made when their communicators connect (see
+                communicator_setup()).
         """
 
         self.owner = OBUser()
@@ -68,8 +73,6 @@ class BaseCommandTest:
             owner=self.owner
         ).save()
 
-        self.room.occupants.add(self.owner)
-
         for i in range(len(self.unlimited_admins)):
             self.unlimited_admins[i] = OBUser.objects.create_user(
                 username=f"unlimited_admin_{i}",
@@ -85,8 +88,6 @@ class BaseCommandTest:
                 is_limited=False
             ).save()
 
-            self.room.occupants.add(self.unlimited_admins[i])
-
         for i in range(len(self.limited_admins)):
             self.limited_admins[i] = OBUser.objects.create_user(
                 username=f"limited_admin_{i}",
@@ -102,8 +103,6 @@ class BaseCommandTest:
                 is_limited=True
             ).save()
 
-            self.room.occupants.add(self.limited_admins[i])
-
         for i in range(len(self.auth_users)):
             self.auth_users[i] = OBUser.objects.create_user(
                 username=f"auth_user_{i}",
@@ -112,16 +111,6 @@ class BaseCommandTest:
                 display_name=f"AuthUser{i}"
             ).save()
 
-            self.room.occupants.add(self.auth_users[i])
-
-        for i in range(len(self.anon_users)):
-            self.anon_users[i] = OBUser.objects.create_user(
-                username=f"{StringId.AnonPrefix}{i}",
-                is_anon=True
-            ).save()
-
-            self.room.occupants.add(self.anon_users[i])
-
     @database_sync_to_async
     def database_teardown(self):
         """
@@ -148,15 +137,29 @@ class BaseCommandTest:
     async def communicator_setup(self):
         """
         Sets up the communicator objects used to test the commands.
+        Connecting adds each user to the occupants of the room (see OB.utilities.presence).
+        Anonymous users connect without a database object, like they do outside of testing, and
+        their ephemeral users are replaced each time they connect.
         """
 
-        for user in await async_model_list(self.room.occupants):
+        for user in [self.owner] + self.unlimited_admins + self.limited_admins + self.auth_users:
             self.communicators[user.username] = await OBCommunicator(
                 user,
                 GroupTypes.Room,
                 self.room.name
             ).connect()
 
+        for i in range(len(self.anon_users)):
+            communicator = await OBCommunicator(
+                AnonymousUser(),
+                GroupTypes.Room,
+                self.room.name,
+                session_key=str(i)
+            ).connect()
+
+            self.anon_users[i] = get_anon_user(f"{StringId.AnonPrefix}{i}")
+            self.communicators[self.anon_users[i].username] = communicator
+
     async def communicator_teardown(self, safe=True):
         """
         Cleans up the communicator objects used to test the commands.
@@ -173,6 +176,10 @@ class BaseCommandTest:
                 # The commnicator has already been disconnected
                 # OB.consumers.disconnect() raises an AttributeError because OBConsumer.room is None
                 pass
+            except asyncio.CancelledError:
+                # The communicator never connected, like a banned user's, and its application was
+                # cancelled when connecting timed out
+                pass
             except (django.db.utils.OperationalError, sqlite3.OperationalError):
                 # The database is locked, but he current communicator disconnected before the error
                 pass
@@ -63,6 +63,15 @@ class DeleteTest(BaseCommandTest):
         message = f"/d {self.room.name} owner"
         await self.communicators[self.owner.username].send(message)
         assert await self.communicators[self.owner.username].receive() == message
+        assert await self.communicators[self.owner.username].receive() == \
+            StringId.DeleteStarted.format(self.room)
+
+        # Test other users kicked right away
+        assert await self.communicators[self.auth_users[1].username].receive() == {"refresh": True}
+
+        # Test owner kicked once the deletion is done
+        while await self.communicators[self.owner.username].receive() != {"refresh": True}:
+            pass
 
         # Test Admins deleted
         assert not await async_filter(Admin, room=self.room)
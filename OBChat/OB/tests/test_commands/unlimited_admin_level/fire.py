@@ -4,8 +4,12 @@ FireTest class container module.
 
 from pytest import mark
 
+from OB.commands import async_flush_commands
+from OB.models import Admin
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
+from OB.utilities.database import async_get, async_save, async_try_get
+from OB.utilities.presence import get_occupants
 
 class FireTest(BaseCommandTest):
     """
@@ -66,4 +70,68 @@ class FireTest(BaseCommandTest):
         correct_response = StringId.FirePeer.format(self.unlimited_admins[1])
         await self.test_isolated(self.unlimited_admins[0], message, correct_response)
 
-        # TODO: Test successes
\ No newline at end of file
+        # Test Unlimited Admin firing Limited Admin
+        await self.test_success(self.unlimited_admins[0], [self.limited_admins[0]])
+
+        # Test owner firing Unlimited Admin and Limited Admin
+        await self.test_success(self.owner, [self.unlimited_admins[1], self.limited_admins[1]])
+
+    @mark.asyncio
+    @mark.django_db()
+    async def test_success(self, sender, targets):
+        """
+        Tests a successful fire through the /fire command.
+
+        Arguments:
+            sender (OBUser): The user to send the /fire command.
+            targets (list[OBUser]): The Admins to fire.
+        """
+
+        # Prepare the message and responses
+        message = "/f"
+        sender_response = StringId.FireSenderReceiptPreface + "\n"
+        targets_response = StringId.FireOccupantsNotificationPreface + "\n"
+        others_response = StringId.FireOccupantsNotificationPreface + "\n"
+        was_limited = {}
+
+        for user in targets:
+            message += f" {user.username}"
+            sender_response += f"    {user}\n"
+            targets_response += f"    {user}\n"
+            others_response += f"    {user}\n"
+            was_limited[user.id] = (await async_get(Admin, user=user, room=self.room)).is_limited
+
+        sender_response += StringId.FireSenderReceiptNote
+        targets_response += StringId.FireTargetsNotificationNote
+        others_response += StringId.FireOccupantsNotificationNote
+
+        # Send the command message
+        await self.communicators[sender.username].send(message)
+        assert await self.communicators[sender.username].receive() == message
+
+        # Test sender response
+        assert await self.communicators[sender.username].receive() == sender_response
+
+        # Commands are executed in the background, so wait for this one before reading the database
+        await async_flush_commands()
+
+        for user in targets:
+            # Test target response
+            assert await self.communicators[user.username].receive() == targets_response
+
+            adminship = await async_try_get(Admin, user=user, room=self.room)
+
+            if was_limited[user.id]:
+                # Test removed adminship, then undo
+                assert not adminship
+                await async_save(Admin, user=user, room=self.room, issuer=self.owner)
+            else:
+                # Test limited adminship, then undo
+                assert adminship.is_limited
+                adminship.is_limited = False
+                await async_save(adminship)
+
+        # Test others response
+        for user in get_occupants(self.room.id):
+            if user not in targets and user != sender:
+                assert await self.communicators[user.username].receive() == others_response
@@ -4,11 +4,12 @@ HireTest class container module.
 
 from pytest import mark
 
+from OB.commands import async_flush_commands
 from OB.models import Admin
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
-from OB.utilities.database import async_delete, async_get, async_model_list, async_save, \
-    async_try_get
+from OB.utilities.database import async_delete, async_get, async_save, async_try_get
+from OB.utilities.presence import get_occupants
 
 class HireTest(BaseCommandTest):
     """
@@ -119,6 +120,9 @@ class HireTest(BaseCommandTest):
         await self.communicators[sender.username].send(message)
         assert await self.communicators[sender.username].receive() == message
 
+        # Commands are executed in the background, so wait for this one before reading the database
+        await async_flush_commands()
+
         for user in targets:
             was_already_admin = bool(await async_try_get(Admin, user=user, is_limited=False))
 
@@ -141,7 +145,7 @@ class HireTest(BaseCommandTest):
         assert await self.communicators[sender.username].receive() == sender_response
 
         # Test others response
-        occupants = await async_model_list(self.room.occupants)
+        occupants = get_occupants(self.room.id)
         for user in occupants:
             if user not in targets and user != sender:
                 assert await self.communicators[user.username].receive() == others_response
@@ -4,6 +4,7 @@ PrivateTest class container module.
 
 from pytest import mark
 
+from OB.commands import async_flush_commands
 from OB.communicators import OBCommunicator
 from OB.constants import GroupTypes
 from OB.models import Room
@@ -56,6 +57,9 @@ class PrivateTest(BaseCommandTest):
         message = "/p /owner What's it like to own room_0?"
         await self.communicators["unlimited_admin_0"].send(message)
         assert await self.communicators["unlimited_admin_0"].receive() == message
+
+        # Commands are executed in the background, so wait for this one before reading the database
+        await async_flush_commands()
         await async_get(
             Room,
             group_type=GroupTypes.Private,
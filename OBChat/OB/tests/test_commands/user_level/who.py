@@ -2,13 +2,49 @@
 WhoTest class container module.
 """
 
+from channels.db import database_sync_to_async
 from pytest import mark
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from OB.commands.user_level.who import WhoCommand
 from OB.models import Room
 from OB.strings import StringId
 from OB.tests.test_commands.base import BaseCommandTest
 from OB.utilities.database import async_save
 
+@database_sync_to_async
+def start_capturing_queries():
+    """
+    Starts capturing the queries of the database thread, which every database hop of the commands
+    runs in.
+
+    Return values:
+        CaptureQueriesContext: The captured queries.
+    """
+
+    captured_queries = CaptureQueriesContext(connection)
+    captured_queries.__enter__()
+
+    return captured_queries
+
+@database_sync_to_async
+def stop_capturing_queries(captured_queries):
+    """
+    Stops capturing the queries of the database thread.
+
+    Arguments:
+        captured_queries (CaptureQueriesContext): The captured queries.
+
+    Return values:
+        int: The number of queries captured.
+    """
+
+    captured_queries.__exit__(None, None, None)
+
+    return len(captured_queries)
+
 class WhoTest(BaseCommandTest):
     """
     Class to test the /who command function (see OB.commands.user_level.who).
@@ -79,3 +115,12 @@ class WhoTest(BaseCommandTest):
             StringId.WhoEmpty.format(empty_room)
         ])
         await self.test_isolated(self.owner, message, correct_response)
+
+        # Test that every room argument is looked up with one query, without a query for each
+        # occupant (the room's privileges were cached by the commands above)
+        who_command = WhoCommand(["nonexistent_room", "room", "empty_room"], self.owner, self.room)
+        captured_queries = await start_capturing_queries()
+        await who_command.check_arguments()
+        await who_command.execute_implementation()
+        assert await stop_capturing_queries(captured_queries) == 1
+        assert "\n".join(who_command.sender_receipt) == correct_response
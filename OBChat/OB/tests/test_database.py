@@ -0,0 +1,99 @@
+"""
+Database utilities test module (see OB.utilities.database).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+from channels.db import database_sync_to_async
+from pytest import mark, raises
+
+from OB.models import OBUser, Room
+from OB.utilities.database import async_filter, async_get, async_iterate, async_iterate_chunks, \
+    UnitOfWork
+
+@database_sync_to_async
+def database_setup(room_count):
+    """
+    Creates the Rooms to iterate over.
+
+    Arguments:
+        room_count (int): How many Rooms to create.
+
+    Return values:
+        list[int]: The ids of the Rooms, in order.
+    """
+
+    owner = OBUser.objects.create_user(username="ob", email="ob@ob.ob", password="ob").save()
+
+    return [Room(name=f"room_{i}", owner=owner).save().id for i in range(room_count)]
+
+@database_sync_to_async
+def database_teardown():
+    """
+    Cleans up the database objects used to test the iterators.
+    They are saved from database threads, outside of the transaction of the test, so they must be
+    deleted by each test.
+    """
+
+    for room in Room.objects.all():
+        room.delete()
+
+    for user in OBUser.objects.all():
+        user.delete()
+
+@mark.asyncio
+@mark.django_db()
+async def test_iterate_chunks():
+    """
+    Tests that every database object is loaded exactly once, in order, whether or not the number of
+    database objects is a multiple of the chunk size.
+    """
+
+    try:
+        room_ids = await database_setup(7)
+
+        for chunk_size, chunk_lengths in [(1, [1] * 7), (3, [3, 3, 1]), (7, [7]), (10, [7])]:
+            chunks = [chunk async for chunk in async_iterate_chunks(Room.objects, chunk_size)]
+
+            assert [len(chunk) for chunk in chunks] == chunk_lengths
+            assert [room.id for chunk in chunks for room in chunk] == room_ids
+
+        assert [room.id async for room in async_iterate(Room.objects, 3)] == room_ids
+        assert [chunk async for chunk in async_iterate_chunks(Room.objects.none(), 3)] == []
+    finally:
+        await database_teardown()
+
+def fail():
+    """
+    Raises an error, like an operation of a UnitOfWork that fails.
+    """
+
+    raise ValueError("The operation failed")
+
+@mark.asyncio
+@mark.django_db()
+async def test_unit_of_work_rollback():
+    """
+    Tests that every write of an atomic UnitOfWork is rolled back when one of its operations fails,
+    and that the writes of a UnitOfWork that is not atomic are kept.
+    """
+
+    try:
+        await database_setup(0)
+        owner = await async_get(OBUser, username="ob")
+
+        for atomic in [True, False]:
+            work = UnitOfWork(atomic)
+            work.save(Room, name="obchat", owner=owner)
+            work.save(OBUser, username="mafia", email="ma@fi.a", password="ma")
+            work.call(fail)
+
+            with raises(ValueError):
+                await work.async_run()
+
+            assert not work
+            assert bool(await async_filter(Room, name="obchat")) != atomic
+            assert bool(await async_filter(OBUser, username="mafia")) != atomic
+    finally:
+        await database_teardown()
@@ -0,0 +1,181 @@
+"""
+Encoding test module (see OB.utilities.encoding).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+import json
+
+from datetime import datetime, timezone
+
+from channels.db import database_sync_to_async
+from pytest import importorskip, mark
+
+from django.contrib.auth.models import AnonymousUser
+
+from OB import consumers
+from OB.communicators import OBCommunicator
+from OB.constants import FrameTypes, GroupTypes
+from OB.models import Message, OBUser, Room
+from OB.utilities import encoding
+from OB.utilities.encoding import decode_message_text, encode_message, encode_refresh, \
+    MESSAGE_HAS_RECIPIENTS
+
+# MessagePack is an optional dependency
+msgpack = importorskip("msgpack")
+
+# The modules whose binary protocol setting is enabled by setup_function()
+BINARY_MODULES = [consumers, encoding]
+
+# The binary protocol settings replaced by setup_function() and restored by teardown_function()
+SAVED_STATE = {}
+
+def setup_function():
+    """
+    Enables the binary protocol, which is disabled by default.
+    This is a built-in pytest fixture that runs before every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    for module in BINARY_MODULES:
+        SAVED_STATE[module] = module.BINARY_ENABLED
+        module.BINARY_ENABLED = True
+
+def teardown_function():
+    """
+    Restores the binary protocol settings.
+    This is a built-in pytest fixture that runs after every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    for module in BINARY_MODULES:
+        module.BINARY_ENABLED = SAVED_STATE[module]
+
+@database_sync_to_async
+def database_setup():
+    """
+    Creates the room to connect to.
+    """
+
+    owner = OBUser.objects.create_user(username="ob", email="ob@ob.ob", password="ob").save()
+    Room(name="obchat", owner=owner).save()
+
+@database_sync_to_async
+def database_teardown():
+    """
+    Cleans up the database objects used to test the binary protocol.
+    They are saved from database threads, outside of the transaction of the test, so they must be
+    deleted by each test.
+    """
+
+    for message in Message.objects.all():
+        message.delete()
+
+    for room in Room.objects.all():
+        room.delete()
+
+    for user in OBUser.objects.all():
+        user.delete()
+
+def test_round_trip():
+    """
+    Tests that the JSON and binary frames of an envelope hold the same message, and that the
+    message frames of clients are decoded in either protocol.
+    """
+
+    timestamp = datetime(2020, 10, 18, 12, tzinfo=timezone.utc)
+    envelope = encode_message("hello", "ob", timestamp, has_recipients=True)
+
+    assert json.loads(envelope["text"])["text"] == "hello"
+    assert msgpack.unpackb(envelope["bytes"]) == [
+        FrameTypes.Message,
+        "hello",
+        "ob",
+        MESSAGE_HAS_RECIPIENTS,
+        int(timestamp.timestamp() * 1000)
+    ]
+    assert msgpack.unpackb(encode_refresh()["bytes"]) == [FrameTypes.Refresh]
+
+    assert decode_message_text(text_data=json.dumps({"message_text": "hello"})) == "hello"
+    assert decode_message_text(bytes_data=msgpack.packb([FrameTypes.Message, "hello"])) == "hello"
+
+def test_malformed_frames():
+    """
+    Tests that frames that are malformed or that are not messages are ignored.
+    """
+
+    for text_data in ["", "{", "[]", "null", "{}", '{"message_text": 1}', '{"heartbeat": true}']:
+        assert decode_message_text(text_data=text_data) is None
+
+    for bytes_data in [
+            b"",
+            b"\xc1",
+            # An array of two elements with only one
+            b"\x92\x01",
+            msgpack.packb({"message_text": "hello"}),
+            msgpack.packb([FrameTypes.Message]),
+            msgpack.packb([FrameTypes.Message, 1]),
+            msgpack.packb([FrameTypes.Heartbeat]),
+            msgpack.packb([FrameTypes.Refresh, "hello"])
+    ]:
+        assert decode_message_text(bytes_data=bytes_data) is None
+
+    # Binary frames are ignored unless the binary protocol is enabled
+    encoding.BINARY_ENABLED = False
+
+    assert decode_message_text(bytes_data=msgpack.packb([FrameTypes.Message, "hello"])) is None
+
+@mark.asyncio
+@mark.django_db()
+async def test_binary_consumer():
+    """
+    Tests that a client that requests the binary protocol sends and receives binary frames, and
+    that a client in the same room that does not receives JSON frames.
+    """
+
+    binary_communicator = None
+    json_communicator = None
+
+    try:
+        await database_setup()
+
+        binary_communicator = await OBCommunicator(
+            AnonymousUser(),
+            GroupTypes.Room,
+            "obchat",
+            session_key="0",
+            is_binary=True
+        ).connect()
+        json_communicator = await OBCommunicator(
+            AnonymousUser(),
+            GroupTypes.Room,
+            "obchat",
+            session_key="1"
+        ).connect()
+
+        await binary_communicator.send("hello")
+
+        assert msgpack.unpackb(await binary_communicator.receive_from())[:2] == [
+            FrameTypes.Message,
+            "hello"
+        ]
+        assert json.loads(await json_communicator.receive_from())["text"] == "hello"
+
+        # Malformed frames are ignored without disconnecting
+        await binary_communicator.send_to(bytes_data=b"\xc1")
+        await binary_communicator.send_to(text_data="{")
+        await binary_communicator.send("still connected")
+
+        assert await binary_communicator.receive() == "still connected"
+        assert await json_communicator.receive() == "still connected"
+    finally:
+        for communicator in [binary_communicator, json_communicator]:
+            if communicator:
+                await communicator.disconnect()
+
+        await database_teardown()
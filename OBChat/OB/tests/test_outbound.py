@@ -0,0 +1,160 @@
+"""
+Outbound frame test module (see OB.utilities.outbound).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+import asyncio
+import json
+
+from pytest import importorskip, mark
+
+from OB.constants import FrameTypes, OverflowPolicies
+from OB.utilities.encoding import encode_batch
+from OB.utilities.outbound import OutboundQueue
+
+def get_items(outbound_queue):
+    """
+    Takes every item that is waiting in an OutboundQueue without sending it.
+
+    Arguments:
+        outbound_queue (OutboundQueue): The queue to take the items of.
+
+    Return values:
+        list[list[string]]: The frames of each item, in order.
+    """
+
+    items = []
+
+    while not outbound_queue.queue.empty():
+        items += [outbound_queue.queue.get_nowait()]
+        outbound_queue.queue.task_done()
+
+    return items
+
+def test_drop_oldest():
+    """
+    Tests that the DropOldest policy drops the oldest item to make room for a new frame.
+    """
+
+    outbound_queue = OutboundQueue(2, OverflowPolicies.DropOldest)
+
+    assert all(outbound_queue.put(f"frame {i}") for i in range(3))
+    assert outbound_queue.dropped_frames == 1
+    assert outbound_queue.peak_depth == 2
+    assert get_items(outbound_queue) == [["frame 1"], ["frame 2"]]
+
+def test_coalesce():
+    """
+    Tests that the Coalesce policy merges the waiting items into one item instead of dropping them,
+    until it would hold more than max_coalesced_frames.
+    """
+
+    outbound_queue = OutboundQueue(2, OverflowPolicies.Coalesce, max_coalesced_frames=3)
+
+    assert all(outbound_queue.put(f"frame {i}") for i in range(3))
+    assert outbound_queue.dropped_frames == 0
+    assert outbound_queue.depth == 2
+
+    # The merged item and the new frame would be 4 frames
+    assert not outbound_queue.put("frame 3")
+    assert outbound_queue.dropped_frames == 3
+
+    outbound_queue = OutboundQueue(2, OverflowPolicies.Coalesce, max_coalesced_frames=3)
+
+    for i in range(3):
+        outbound_queue.put(f"frame {i}")
+
+    assert get_items(outbound_queue) == [["frame 0", "frame 1"], ["frame 2"]]
+
+def test_disconnect():
+    """
+    Tests that the Disconnect policy drops every waiting frame and asks for a disconnect.
+    """
+
+    outbound_queue = OutboundQueue(2, OverflowPolicies.Disconnect)
+
+    assert outbound_queue.put("frame 0")
+    assert outbound_queue.put("frame 1")
+    assert not outbound_queue.put("frame 2")
+    assert outbound_queue.dropped_frames == 2
+    assert outbound_queue.depth == 0
+
+def test_encode_batch():
+    """
+    Tests that JSON frames are batched into a JSON array and binary frames into a binary batch
+    frame, without decoding them.
+    """
+
+    json_frames = [json.dumps({"text": f"message {i}"}) for i in range(2)]
+
+    assert json.loads(encode_batch(json_frames)) == [{"text": f"message {i}"} for i in range(2)]
+
+    # MessagePack is an optional dependency
+    msgpack = importorskip("msgpack")
+    binary_frames = [msgpack.packb([FrameTypes.Message, f"message {i}"]) for i in range(2)]
+
+    assert msgpack.unpackb(encode_batch(binary_frames)) == [
+        FrameTypes.Batch,
+        [FrameTypes.Message, "message 0"],
+        [FrameTypes.Message, "message 1"]
+    ]
+
+@mark.asyncio
+async def test_coalescing_window():
+    """
+    Tests that the frames queued within the coalescing window are sent as one batch frame, and that
+    a frame queued after it is sent alone.
+    """
+
+    outbound_queue = OutboundQueue(10, OverflowPolicies.Disconnect, coalescing_window=0.1)
+    sent_frames = []
+
+    async def send(frame):
+        sent_frames.append(frame)
+
+    task = asyncio.ensure_future(outbound_queue.run(send))
+
+    try:
+        outbound_queue.put('{"text": 0}')
+        await asyncio.sleep(0.02)
+        outbound_queue.put('{"text": 1}')
+
+        assert await outbound_queue.join(5)
+        assert sent_frames == ['[{"text": 0},{"text": 1}]']
+
+        outbound_queue.put('{"text": 2}')
+
+        assert await outbound_queue.join(5)
+        assert sent_frames[1:] == ['{"text": 2}']
+    finally:
+        task.cancel()
+
+@mark.asyncio
+async def test_send_failure():
+    """
+    Tests that a frame that cannot be sent closes the connection, drops the waiting frames, and
+    stops the queue from accepting more.
+    """
+
+    outbound_queue = OutboundQueue(10, OverflowPolicies.Disconnect)
+    closed = []
+
+    async def send(frame):
+        raise ConnectionResetError(frame)
+
+    async def on_failure():
+        # Every waiting frame was dropped before the connection is closed
+        closed.append(outbound_queue.depth)
+
+    for i in range(3):
+        outbound_queue.put(f"frame {i}")
+
+    await asyncio.wait_for(outbound_queue.run(send, on_failure), 5)
+
+    assert closed == [0]
+    assert outbound_queue.failed
+    assert outbound_queue.dropped_frames == 2
+    assert not outbound_queue.put("frame 3")
+    assert await outbound_queue.join(1)
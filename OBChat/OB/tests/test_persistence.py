@@ -0,0 +1,210 @@
+"""
+Message persistence test module (see OB.utilities.persistence).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+import asyncio
+
+from channels.db import database_sync_to_async
+from pytest import mark
+
+from django.db import DatabaseError
+
+from OB.models import Message, OBUser, Room
+from OB.utilities import persistence
+from OB.utilities.persistence import MessageWriter
+
+@database_sync_to_async
+def database_teardown():
+    """
+    Cleans up the database objects used to test the MessageWriter.
+    They are saved from database threads, outside of the transaction of the test, so they must be
+    deleted by each test.
+    """
+
+    for message in Message.objects.all():
+        message.delete()
+
+    for user in OBUser.objects.all():
+        user.delete()
+
+    for room in Room.objects.all():
+        room.delete()
+
+@database_sync_to_async
+def create_room():
+    """
+    Creates the database objects required to test the MessageWriter.
+
+    Return values:
+        tuple(OBUser, Room): The owner of the room and the room.
+    """
+
+    owner = OBUser.objects.create_user(username="ob", email="ob@ob.ob", password="ob").save()
+    room = Room(name="obchat", owner=owner).save()
+
+    return owner, room
+
+@database_sync_to_async
+def get_saved_messages():
+    """
+    Gets the saved Messages and the ids of their recipients.
+
+    Return values:
+        dict{string: list[int]}: The ids of the recipients of each Message, by message text.
+    """
+
+    return {
+        message.message: [user.id for user in message.recipients.all()]
+        for message in Message.objects.all()
+    }
+
+async def put_messages(writer, owner, room, count):
+    """
+    Queues several Messages, each with the owner as the only recipient.
+
+    Arguments:
+        writer (MessageWriter): The writer to queue the Messages with.
+        owner (OBUser): The recipient and sender of the Messages.
+        room (Room): The room of the Messages.
+        count (int): How many Messages to queue.
+
+    Return values:
+        list[Message]: The queued Messages.
+    """
+
+    return [
+        await writer.put(Message(message=f"message {i}", sender=owner, room=room), [owner])
+        for i in range(count)
+    ]
+
+@mark.asyncio
+@mark.django_db()
+async def test_flush_on_size():
+    """
+    Tests that a full batch is saved without waiting for the flush interval.
+    """
+
+    try:
+        owner, room = await create_room()
+        writer = MessageWriter(max_queue_size=10, flush_size=3, flush_interval=60)
+
+        messages = await put_messages(writer, owner, room, 3)
+        await asyncio.wait_for(writer.flush(), 5)
+
+        assert await get_saved_messages() == {f"message {i}": [owner.id] for i in range(3)}
+        assert all(message.id for message in messages)
+
+        writer.task.cancel()
+    finally:
+        await database_teardown()
+
+@mark.asyncio
+@mark.django_db()
+async def test_flush_on_interval():
+    """
+    Tests that a batch that is not full is saved once the flush interval passes.
+    """
+
+    try:
+        owner, room = await create_room()
+        writer = MessageWriter(max_queue_size=10, flush_size=100, flush_interval=0.2)
+        loop = asyncio.get_event_loop()
+
+        start = loop.time()
+        await put_messages(writer, owner, room, 2)
+
+        await asyncio.sleep(0.05)
+        assert not await get_saved_messages()
+
+        await asyncio.wait_for(writer.flush(), 5)
+
+        assert loop.time() - start >= 0.2
+        assert await get_saved_messages() == {f"message {i}": [owner.id] for i in range(2)}
+
+        writer.task.cancel()
+    finally:
+        await database_teardown()
+
+@mark.asyncio
+@mark.django_db()
+async def test_flush_at_exit():
+    """
+    Tests that the Messages still queued when the event loop stops are saved at exit.
+    """
+
+    try:
+        owner, room = await create_room()
+        writer = MessageWriter(max_queue_size=10, flush_size=100, flush_interval=60)
+
+        await put_messages(writer, owner, room, 2)
+
+        # The event loop is no longer running the writer task at exit
+        writer.task.cancel()
+        await asyncio.sleep(0)
+
+        await database_sync_to_async(writer.flush_sync)()
+
+        assert await get_saved_messages() == {f"message {i}": [owner.id] for i in range(2)}
+    finally:
+        await database_teardown()
+
+@mark.asyncio
+@mark.django_db()
+async def test_retry():
+    """
+    Tests that a batch that fails to save is retried instead of dropped.
+    """
+
+    try:
+        owner, room = await create_room()
+        writer = MessageWriter(max_queue_size=10, flush_size=2, flush_interval=0.01)
+        write_messages = persistence.write_messages
+        failures = []
+
+        def fail_once(batch):
+            if not failures:
+                failures.append(batch)
+                raise DatabaseError("The database is unavailable")
+
+            write_messages(batch)
+
+        persistence.write_messages = fail_once
+
+        try:
+            await put_messages(writer, owner, room, 2)
+            await asyncio.wait_for(writer.flush(), 5)
+        finally:
+            persistence.write_messages = write_messages
+
+        assert failures
+        assert await get_saved_messages() == {f"message {i}": [owner.id] for i in range(2)}
+
+        writer.task.cancel()
+    finally:
+        await database_teardown()
+
+@mark.asyncio
+@mark.django_db()
+async def test_drop_invalid():
+    """
+    Tests that a Message that violates a constraint is dropped without the rest of its batch.
+    """
+
+    try:
+        owner, room = await create_room()
+        writer = MessageWriter(max_queue_size=10, flush_size=3, flush_interval=60)
+
+        await writer.put(Message(message="message 0", sender=owner, room=room), [owner])
+        # The room of this message was deleted while it was queued
+        await writer.put(Message(message="deleted room", sender=owner, room_id=room.id + 1))
+        await writer.put(Message(message="message 1", sender=owner, room=room), [owner])
+        await asyncio.wait_for(writer.flush(), 5)
+
+        assert await get_saved_messages() == {f"message {i}": [owner.id] for i in range(2)}
+
+        writer.task.cancel()
+    finally:
+        await database_teardown()
@@ -0,0 +1,181 @@
+"""
+Presence test module (see OB.utilities.presence).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+from datetime import timedelta
+
+from pytest import mark
+
+from django.utils import timezone
+
+from OB.models import Occupancy, OBUser, Room
+from OB.utilities import presence
+from OB.utilities.anonymous import get_anon_user, make_anon_user
+
+class Clock:
+    """
+    A time module stand-in whose monotonic() time only moves when a test moves it.
+    """
+
+    def __init__(self, now):
+        """
+        Arguments:
+            now (float): The starting time.monotonic() seconds.
+        """
+
+        self.now = now
+
+    def monotonic(self):
+        """
+        Return values:
+            float: The current time.monotonic() seconds.
+        """
+
+        return self.now
+
+CLOCK = Clock(1000.0)
+
+# The presence state replaced by setup_function() and restored by teardown_function()
+SAVED_STATE = {}
+
+def setup_function():
+    """
+    Gives presence a controlled clock and an empty state.
+    This is a built-in pytest fixture that runs before every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    SAVED_STATE["time"] = presence.time
+    SAVED_STATE["last_sweep"] = presence.LAST_SWEEP
+
+    CLOCK.now = 1000.0
+    presence.time = CLOCK
+    presence.LAST_SWEEP = CLOCK.now
+    presence.ROOM_PRESENCE.clear()
+
+def teardown_function():
+    """
+    Restores the clock and state of presence.
+    This is a built-in pytest fixture that runs after every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    presence.time = SAVED_STATE["time"]
+    presence.LAST_SWEEP = SAVED_STATE["last_sweep"]
+    presence.ROOM_PRESENCE.clear()
+
+def test_heartbeat():
+    """
+    Tests that a WebSocket that sends heartbeats is kept while a silent one is swept, and that a
+    heartbeat adds a swept WebSocket back to its room.
+    """
+
+    ob_user = OBUser(id=1, username="ob")
+    mafia_user = OBUser(id=2, username="mafia")
+
+    presence.join(1, ob_user, "ob_channel")
+    presence.join(1, mafia_user, "mafia_channel")
+
+    for _ in range(3):
+        CLOCK.now += presence.PRESENCE_TIMEOUT / 2
+        presence.heartbeat(1, ob_user, "ob_channel")
+
+    assert presence.sweep() == 1
+    assert presence.get_occupants(1) == [ob_user]
+
+    # The client of the swept WebSocket was only slow
+    presence.heartbeat(1, mafia_user, "mafia_channel")
+
+    assert presence.get_occupants(1) == [ob_user, mafia_user]
+
+def test_sweep():
+    """
+    Tests that only the silent WebSockets of a user are swept, that the user leaves with their last
+    one, and that a swept ephemeral user is forgotten.
+    """
+
+    ob_user = OBUser(id=1, username="ob")
+    anon_user = make_anon_user("0")
+
+    presence.join(1, ob_user, "old_channel")
+    presence.join(2, anon_user, "anon_channel")
+    CLOCK.now += presence.PRESENCE_TIMEOUT
+    presence.join(1, ob_user, "new_channel")
+
+    # Exactly PRESENCE_TIMEOUT seconds without a heartbeat is not stale yet
+    assert presence.sweep() == 0
+
+    CLOCK.now += 1
+
+    assert presence.sweep() == 2
+    assert presence.ROOM_PRESENCE == {1: {ob_user.id: [ob_user, {"new_channel": CLOCK.now - 1}]}}
+    assert not get_anon_user(anon_user.username)
+
+    CLOCK.now += presence.PRESENCE_TIMEOUT + 1
+
+    assert presence.sweep() == 1
+    assert not presence.ROOM_PRESENCE
+
+def test_maybe_sweep():
+    """
+    Tests that presence sweeps at most every PRESENCE_SWEEP_INTERVAL seconds.
+    """
+
+    ob_user = OBUser(id=1, username="ob")
+
+    presence.join(1, ob_user, "ob_channel")
+    CLOCK.now += presence.PRESENCE_TIMEOUT - 1
+    presence.maybe_sweep()
+
+    assert presence.LAST_SWEEP == CLOCK.now
+    assert presence.is_occupied(1)
+
+    # Stale, but the last sweep was too recent
+    CLOCK.now += presence.PRESENCE_SWEEP_INTERVAL / 2
+    presence.maybe_sweep()
+
+    assert presence.is_occupied(1)
+
+    CLOCK.now += presence.PRESENCE_SWEEP_INTERVAL / 2
+    presence.maybe_sweep()
+
+    assert not presence.is_occupied(1)
+
+@mark.django_db()
+def test_reconcile():
+    """
+    Tests that reconciling removes the expired Occupancy rows and the anonymous OBUsers that only
+    they referred to, and the stale Room.occupants rows, while the live rows of other processes are
+    kept.
+    """
+
+    ob_user = OBUser.objects.create_user(username="ob", email="ob@ob.ob", password="ob").save()
+    anon_user = OBUser(username="anon", is_anon=True).save()
+    room = Room(name="obchat", owner=ob_user).save()
+    room.occupants.add(ob_user)
+    now = timezone.now()
+
+    for occupant, last_seen in [
+            (ob_user, now),
+            (anon_user, now - timedelta(seconds=presence.PRESENCE_TIMEOUT + 1))
+    ]:
+        Occupancy(
+            room=room,
+            occupant_id=occupant.id,
+            username=occupant.username,
+            process_id="remote",
+            last_seen=last_seen
+        ).save()
+
+    presence.reconcile()
+
+    assert list(Occupancy.objects.values_list("occupant_id", flat=True)) == [ob_user.id]
+    assert not OBUser.objects.filter(is_anon=True).exists()
+    assert not room.occupants.exists()
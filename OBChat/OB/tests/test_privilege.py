@@ -0,0 +1,175 @@
+"""
+Privilege test module (see OB.utilities.privilege).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+import asyncio
+
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from pytest import mark, raises
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from OB.constants import GroupTypes, Privilege
+from OB.models import Admin, Ban, Occupancy, OBUser, Room
+from OB.strings import StringId
+from OB.utilities import presence
+from OB.utilities.format import get_group_name
+from OB.utilities.privilege import broadcast_invalidation, get_privilege_table, \
+    invalidate_privilege_table, PRIVILEGE_TABLES, PRIVILEGE_VERSIONS, QUEUED_TOKENS, \
+    resolve_targets
+
+def setup_function():
+    """
+    Sets up the database objects required to test the privilege functions.
+    This is a built-in pytest fixture that runs before every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    ob_user = OBUser.objects.create_user(username="ob", email="ob@ob.ob", password="ob").save()
+    Room(name="obchat", owner=ob_user).save()
+
+@mark.django_db()
+def test_resolve_remote_anon_targets():
+    """
+    Tests that the ephemeral anonymous users of other processes are resolved from the Occupancy
+    table with one query, however many there are (see OB.utilities.presence).
+    """
+
+    room = Room.objects.get(name="obchat")
+    now = timezone.now()
+
+    for i in range(3):
+        Occupancy(
+            room=room,
+            occupant_id=-(i + 1),
+            username=f"{StringId.AnonPrefix}{i}",
+            process_id="remote",
+            # The last user's process stopped
+            last_seen=now - timedelta(seconds=presence.PRESENCE_TIMEOUT + 1) if i == 2 else now
+        ).save()
+
+    usernames = ["ob", "nobody"] + [f"{StringId.AnonPrefix}{i}" for i in range(3)]
+    presence_table = presence.PRESENCE_TABLE
+    presence.PRESENCE_TABLE = True
+
+    try:
+        with CaptureQueriesContext(connection) as one_target_queries:
+            resolve_targets(usernames[:3], room, include_anon=True)
+
+        with CaptureQueriesContext(connection) as all_targets_queries:
+            targets = resolve_targets(usernames, room, include_anon=True)
+    finally:
+        presence.PRESENCE_TABLE = presence_table
+
+    assert len(all_targets_queries) <= len(one_target_queries)
+    assert [target.username for target in targets] == usernames
+    assert targets[0].privilege == Privilege.Owner
+    assert targets[1].user is None
+
+    for i in range(2):
+        assert targets[i + 2].user.id == -(i + 1)
+        assert targets[i + 2].user.is_anon
+        assert targets[i + 2].privilege == Privilege.User
+
+    assert targets[4].user is None
+
+@mark.django_db()
+def test_invalidate_on_change():
+    """
+    Tests that saving or deleting an Admin or Ban removes the cached table of its room, so that the
+    next privilege check sees the change (see OB.utilities.privilege.invalidate_on_change()).
+    """
+
+    ob_user = OBUser.objects.get(username="ob")
+    mafia_user = OBUser.objects.create_user(username="mafia", email="ma@fi.a", password="ma").save()
+    room = Room.objects.get(name="obchat")
+
+    assert get_privilege_table(room).get(mafia_user) == Privilege.AuthUser
+    assert room.id in PRIVILEGE_TABLES
+
+    admin = Admin(user=mafia_user, room=room, issuer=ob_user, is_limited=False).save()
+
+    assert room.id not in PRIVILEGE_TABLES
+    assert get_privilege_table(room).get(mafia_user) == Privilege.UnlimitedAdmin
+
+    admin.delete()
+
+    assert room.id not in PRIVILEGE_TABLES
+    assert get_privilege_table(room).get(mafia_user) == Privilege.AuthUser
+
+    ban = Ban(user=mafia_user, room=room, issuer=ob_user).save()
+
+    assert room.id not in PRIVILEGE_TABLES
+    assert get_privilege_table(room).is_banned(mafia_user)
+
+    ban.is_lifted = True
+    ban.save()
+
+    assert room.id not in PRIVILEGE_TABLES
+    assert not get_privilege_table(room).is_banned(mafia_user)
+
+@mark.django_db()
+def test_invalidation_token():
+    """
+    Tests that an "invalidate_privileges" event invalidates a room's table only once, however many
+    OBConsumers of the process receive it.
+    """
+
+    PRIVILEGE_TABLES[-1] = "table"
+    version = PRIVILEGE_VERSIONS.get(-1, 0)
+
+    invalidate_privilege_table(-1, "token")
+
+    assert -1 not in PRIVILEGE_TABLES
+    assert PRIVILEGE_VERSIONS[-1] == version + 1
+
+    # A table loaded after the first OBConsumer applied the event
+    PRIVILEGE_TABLES[-1] = "table"
+    invalidate_privilege_table(-1, "token")
+
+    assert PRIVILEGE_TABLES.pop(-1) == "table"
+    assert PRIVILEGE_VERSIONS[-1] == version + 1
+
+@mark.asyncio
+@mark.django_db()
+async def test_broadcast_invalidation():
+    """
+    Tests that only the last invalidation of a room queued by a transaction sends an
+    "invalidate_privileges" event to the room once it commits.
+    """
+
+    channel_layer = get_channel_layer()
+    group_name = get_group_name(GroupTypes.Room, -1)
+    channel_name = await channel_layer.new_channel()
+    await channel_layer.group_add(group_name, channel_name)
+
+    @database_sync_to_async
+    def commit(tokens):
+        # The callbacks queued by invalidate_on_change() for two changes to the room
+        QUEUED_TOKENS.tokens = {-1: tokens[-1]}
+
+        for token in tokens:
+            broadcast_invalidation(-1, token)
+
+    try:
+        await commit([object(), object()])
+
+        event = await channel_layer.receive(channel_name)
+
+        assert event["type"] == "invalidate_privileges"
+        assert event["room_id"] == -1
+
+        with raises(asyncio.TimeoutError):
+            await asyncio.wait_for(channel_layer.receive(channel_name), 0.1)
+    finally:
+        await channel_layer.group_discard(group_name, channel_name)
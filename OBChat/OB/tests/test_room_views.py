@@ -14,7 +14,7 @@ from django.test import Client
 from django.urls import reverse
 
 from OB.constants import GroupTypes
-from OB.models import OBUser, Room
+from OB.models import Message, OBUser, Room
 
 def setup_function():
     """
@@ -182,3 +182,17 @@ def test_room():
 
     assert response.status_code == 200
     assert "messages" in response.context
+
+    # Test GET with message history, which only includes the messages of the room
+    ob_user = OBUser.objects.get(username="ob")
+    obchat = Room.objects.get(name="obchat")
+    other_room = Room(name="knobchat", owner=ob_user).save()
+
+    for i in range(3):
+        Message(message=f"message {i}", sender=ob_user, room=obchat).save()
+    Message(message="other room", sender=ob_user, room=other_room).save()
+
+    response = client.get(reverse("OB:OB-room", kwargs={"room_name": "obchat"}))
+
+    assert [message.message for message, _ in response.context["messages"]] == \
+        [f"message {i}" for i in range(3)]
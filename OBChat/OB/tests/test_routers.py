@@ -0,0 +1,130 @@
+"""
+Database routing test module (see OB.routers).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+from OB import routers
+from OB.models import Message, OBUser, Room
+from OB.routers import CONTEXT_STICKY_UNTIL, CURRENT_USER_ID, ReadReplicaRouter, STICKY_UNTIL
+
+class Clock:
+    """
+    A time module stand-in whose monotonic() time only moves when a test moves it.
+    """
+
+    def __init__(self, now):
+        """
+        Arguments:
+            now (float): The starting time.monotonic() seconds.
+        """
+
+        self.now = now
+
+    def monotonic(self):
+        """
+        Return values:
+            float: The current time.monotonic() seconds.
+        """
+
+        return self.now
+
+CLOCK = Clock(1000.0)
+
+# The routing state replaced by setup_function() and restored by teardown_function()
+SAVED_STATE = {}
+
+def setup_function():
+    """
+    Gives the router a replica, a controlled clock, and no current user.
+    This is a built-in pytest fixture that runs before every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    SAVED_STATE["time"] = routers.time
+    SAVED_STATE["read_database"] = routers.READ_DATABASE
+    SAVED_STATE["user_token"] = CURRENT_USER_ID.set(None)
+    SAVED_STATE["context_token"] = CONTEXT_STICKY_UNTIL.set(0)
+
+    CLOCK.now = 1000.0
+    routers.time = CLOCK
+    routers.READ_DATABASE = "replica"
+    STICKY_UNTIL.clear()
+
+def teardown_function():
+    """
+    Restores the routing state.
+    This is a built-in pytest fixture that runs after every function.
+
+    See the pytest documentation on xunit-style setup for more information.
+    https://docs.pytest.org/en/latest/xunit_setup.html
+    """
+
+    routers.time = SAVED_STATE["time"]
+    routers.READ_DATABASE = SAVED_STATE["read_database"]
+    CURRENT_USER_ID.reset(SAVED_STATE["user_token"])
+    CONTEXT_STICKY_UNTIL.reset(SAVED_STATE["context_token"])
+    STICKY_UNTIL.clear()
+
+def test_replica_fallback():
+    """
+    Tests that only reads of Rooms and Messages go to the replica, and that everything goes to the
+    primary without one.
+    """
+
+    router = ReadReplicaRouter()
+
+    assert router.db_for_read(Room) == "replica"
+    assert router.db_for_read(Message) == "replica"
+    assert router.db_for_read(OBUser) == "default"
+    assert router.allow_migrate("default", "OB")
+    assert not router.allow_migrate("replica", "OB")
+
+    routers.READ_DATABASE = None
+
+    assert router.db_for_read(Room) is None
+    assert router.db_for_write(Room) is None
+    assert router.allow_migrate("default", "OB") is None
+
+def test_stickiness_expiry():
+    """
+    Tests that the reads of a user who wrote go to the primary for READ_STICKINESS seconds, without
+    affecting other users.
+    """
+
+    router = ReadReplicaRouter()
+
+    CURRENT_USER_ID.set(1)
+
+    assert router.db_for_write(Room) == "default"
+    assert router.db_for_read(Room) == "default"
+
+    # Another context of the same user, like another of their WebSockets
+    CONTEXT_STICKY_UNTIL.set(0)
+
+    assert router.db_for_read(Room) == "default"
+
+    CURRENT_USER_ID.set(2)
+
+    assert router.db_for_read(Room) == "replica"
+
+    CURRENT_USER_ID.set(1)
+    CLOCK.now += routers.READ_STICKINESS + 1
+
+    assert router.db_for_read(Room) == "replica"
+
+def test_forget_expired_users():
+    """
+    Tests that users whose stickiness expired are forgotten once there are too many.
+    """
+
+    STICKY_UNTIL.update({user_id: CLOCK.now - 1 for user_id in range(10000)})
+    STICKY_UNTIL[10000] = CLOCK.now + 1
+
+    CURRENT_USER_ID.set(10001)
+    routers.mark_written()
+
+    assert STICKY_UNTIL == {10000: CLOCK.now + 1, 10001: CLOCK.now + routers.READ_STICKINESS}
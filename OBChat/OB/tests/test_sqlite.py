@@ -0,0 +1,44 @@
+"""
+SQLite tuning test module (see OB.utilities.sqlite).
+
+See the pytest documentation for more information.
+https://docs.pytest.org/en/latest/contents.html
+"""
+
+from pytest import mark
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+from OB.utilities import sqlite
+
+@mark.django_db()
+def test_production_pragmas(tmp_path):
+    """
+    Tests that the production profile configures every new SQLite connection with WAL journaling
+    and a busy timeout, and that the default profile leaves SQLite's defaults.
+    """
+
+    profile = sqlite.PROFILE
+
+    try:
+        for profile_name, journal_mode, busy_timeout in [
+                ("production", "wal", sqlite.PRODUCTION_PRAGMAS["busy_timeout"]),
+                (None, "delete", 1000)
+        ]:
+            sqlite.PROFILE = profile_name
+            new_connection = DatabaseWrapper({
+                **connection.settings_dict,
+                "NAME": str(tmp_path / f"{profile_name}.sqlite3"),
+                # Python's sqlite3 module sets a busy timeout of its own, 5 seconds by default
+                "OPTIONS": {"timeout": 1}
+            })
+
+            try:
+                with new_connection.cursor() as cursor:
+                    assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == journal_mode
+                    assert cursor.execute("PRAGMA busy_timeout").fetchone()[0] == busy_timeout
+            finally:
+                new_connection.close()
+    finally:
+        sqlite.PROFILE = profile
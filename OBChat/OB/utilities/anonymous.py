@@ -0,0 +1,95 @@
+"""
+Useful anonymous user functions.
+
+Anonymous users are ephemeral: they are unsaved OBUser objects that only exist in the process that
+is serving their WebSocket, so connecting and disconnecting as an anonymous user does not write to
+the database. Their messages are saved with Message.anon_username instead of a sender.
+Ephemeral users have negative ids so that they can be used in group names, events, and presence
+(see OB.utilities.presence) without colliding with the ids of saved OBUsers.
+"""
+
+import secrets
+
+from OB.models import OBUser
+from OB.strings import StringId
+
+# Ephemeral users of this process, by username
+ANON_USERS = {}
+
+def is_ephemeral(user):
+    """
+    Determines if a user is an ephemeral anonymous user, which has no database row.
+
+    Arguments:
+        user (OBUser): The user to check.
+
+    Return values:
+        boolean: True if the user is ephemeral.
+    """
+
+    return user is not None and user.id is not None and user.id < 0
+
+def make_anon_user(session_key=None):
+    """
+    Makes an ephemeral anonymous user.
+    The username is made from the session key if there is one and it is not already in use, and
+    from a random token otherwise.
+
+    Arguments:
+        session_key (string or None): The key of the user's session.
+
+    Return values:
+        OBUser: The new ephemeral user.
+    """
+
+    username = f"{StringId.AnonPrefix}{session_key or secrets.token_hex(16)}"
+
+    while username in ANON_USERS:
+        username = f"{StringId.AnonPrefix}{secrets.token_hex(16)}"
+
+    # Random ids keep ephemeral users of different processes from colliding in group names
+    anon_user = OBUser(
+        id=-(secrets.randbits(52) + 1),
+        username=username,
+        is_anon=True
+    )
+
+    ANON_USERS[username] = anon_user
+
+    return anon_user
+
+def release_anon_user(anon_user):
+    """
+    Forgets an ephemeral anonymous user when it disconnects.
+
+    Arguments:
+        anon_user (OBUser): The ephemeral user.
+    """
+
+    ANON_USERS.pop(anon_user.username, None)
+
+def get_anon_user(username):
+    """
+    Gets an ephemeral anonymous user of this process by username.
+
+    Arguments:
+        username (string): The username to look up.
+
+    Return values:
+        OBUser: The ephemeral user, or None if there is none with the username.
+    """
+
+    return ANON_USERS.get(username)
+
+def get_persistent_users(users):
+    """
+    Removes ephemeral users from a list of users, so that the rest may be used in database queries.
+
+    Arguments:
+        users (list[OBUser] or None): The users to filter.
+
+    Return values:
+        list[OBUser]: The users that have database rows.
+    """
+
+    return [user for user in users or [] if not is_ephemeral(user)]
@@ -2,14 +2,6 @@
 Useful command functions.
 """
 
-from channels.db import database_sync_to_async
-
-import OB.commands
-
-from OB.constants import Privilege
-from OB.models import Admin
-from OB.utilities.database import try_get
-
 def is_command_format(command):
     """
     Determines if a string is formatted as a command or normal message. Command format is any
@@ -39,33 +31,10 @@ def is_valid_command(command):
         boolean: True if the string is in command format and the command is in the COMMANDS dict.
     """
 
-    return is_command_format(command) and command[1:] in OB.commands.COMMANDS
-
-@database_sync_to_async
-def async_get_privilege(user, room):
-    """
-    Determines the highest privilege level of a user for a room.
-
-    Arguments:
-        username (string): The username of the OBUser to find the privilege of.
-        room (Room): The database object of the room to find privilege for.
-
-    Return values:
-        Privilege: The Privilege of the user for the room.
-    """
-
-    if user == room.owner:
-        return Privilege.Owner
-
-    admin_object = try_get(Admin, user=user)
-
-    if admin_object:
-        if not admin_object.is_limited:
-            return Privilege.UnlimitedAdmin
-
-        return Privilege.Admin
-
-    if user.is_authenticated and not user.is_anon:
-        return Privilege.AuthUser
+    # pylint: disable=import-outside-toplevel
+    # Justification: OB.commands imports this module, so importing it at the module-level makes
+    #   this module unusable without importing OB.commands first.
+    from OB.commands import COMMANDS
+    # pylint: enable=import-outside-toplevel
 
-    return Privilege.User
+    return is_command_format(command) and command[1:] in COMMANDS
@@ -0,0 +1,143 @@
+"""
+Useful consumer context functions.
+
+An OBConsumer keeps a ConsumerContext so that it does not have to query the database for its room
+or the room's owner for every message and command. The context is reloaded when an
+"invalidate_context" event is sent to the room (see OB.utilities.event.send_invalidate_context()).
+Privileges are not part of the context. They are only cached in the room's PrivilegeTable, which
+commands read when they execute (see OB.utilities.privilege).
+
+The first context of an OBConsumer is loaded by join_room(), which also checks for a ban, so that
+connecting takes at most one database hop. The occupants of each room are tracked in memory (see
+OB.utilities.presence).
+"""
+
+from channels.db import database_sync_to_async
+
+from django.db import transaction
+
+from OB.constants import GroupTypes
+from OB.models import OBUser, Room
+from OB.utilities.anonymous import is_ephemeral
+from OB.utilities.format import get_group_name
+from OB.utilities.presence import is_occupied
+from OB.utilities.privilege import get_privilege_table, invalidate_privilege_table
+
+class ConsumerContext:
+    """
+    A snapshot of an OBConsumer's room and room owner.
+    An OBConsumer handles its events one at a time, so a reloaded context always replaces an older
+    one and does not need a version.
+    """
+
+    __slots__ = ("room",)
+
+    def __init__(self, room):
+        """
+        Arguments:
+            room (Room): The room of the OBConsumer. Its owner must already be loaded, so that
+                commands may read room.owner without a database hop.
+        """
+
+        self.room = room
+
+def load_context(**kwargs):
+    """
+    Loads the room and its owner with one query.
+    Used both to join a room (see join_room()) and to reload a context.
+
+    Arguments:
+        kwargs: Class variable values to use for the Room query.
+
+    Return values:
+        ConsumerContext: The new context, or None if the room does not exist.
+    """
+
+    room = Room.objects.select_related("owner").filter(**kwargs).first()
+
+    if not room:
+        return None
+
+    return ConsumerContext(room)
+
+@database_sync_to_async
+def async_load_context(**kwargs):
+    """
+    Allows an asynchronous function to load a ConsumerContext in one database hop (see
+    load_context()).
+
+    Arguments:
+        kwargs: Class variable values to use for the Room query.
+
+    Return values:
+        ConsumerContext: The new context, or None if the room does not exist.
+    """
+
+    return load_context(**kwargs)
+
+def join_room(user, group_type, url_arg):
+    """
+    Resolves the room of a new OBConsumer, loads its context, and checks that the user is not
+    banned, all in one transaction.
+    Ephemeral anonymous users are not checked for bans because they are not in the database (see
+    OB.utilities.anonymous).
+
+    Arguments:
+        user (OBUser): The user of the OBConsumer.
+        group_type (GroupTypes): GroupTypes.Room or GroupTypes.Private.
+        url_arg (string): The room name of a room, or the username of the other user of a private
+            room.
+
+    Return values:
+        ConsumerContext: The new context, or None if the room does not exist, is suspended, or the
+            user is banned.
+    """
+
+    with transaction.atomic():
+        if group_type == GroupTypes.Private:
+            target_id = OBUser.objects.filter(username=url_arg).values_list("id", flat=True).first()
+
+            if target_id is None:
+                return None
+
+            room_name = get_group_name(GroupTypes.Private, user.id, target_id)
+        else:
+            room_name = url_arg
+
+        context = load_context(group_type=group_type, name=room_name)
+
+        # Suspended rooms are being deleted (see OB.commands.owner_level.delete)
+        if not context or context.room.is_suspended:
+            return None
+
+        room = context.room
+
+        # This process does not receive invalidations for rooms that no one here is in, so the
+        # cached privilege table may be out of date
+        if not is_occupied(room.id):
+            invalidate_privilege_table(room.id)
+
+        privileges = get_privilege_table(room)
+
+        if not is_ephemeral(user) and privileges.is_banned(user):
+            return None
+
+    return context
+
+@database_sync_to_async
+def async_join_room(user, group_type, url_arg):
+    """
+    Allows an asynchronous function to join a room in one database hop (see join_room()).
+
+    Arguments:
+        user (OBUser): The user of the OBConsumer.
+        group_type (GroupTypes): GroupTypes.Room or GroupTypes.Private.
+        url_arg (string): The room name of a room, or the username of the other user of a private
+            room.
+
+    Return values:
+        ConsumerContext: The new context, or None if the room does not exist, is suspended, or the
+            user is banned.
+    """
+
+    return join_room(user, group_type, url_arg)
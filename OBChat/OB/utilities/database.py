@@ -1,10 +1,28 @@
 """
 Useful database functions.
+
+Each async_ function is one database_sync_to_async hop to a worker thread. To make several
+database calls in one hop, queue them in a UnitOfWork and run it.
+
+To process a large QuerySet without loading it all into memory, iterate over it with
+async_iterate() or async_iterate_chunks().
+
+The system user is loaded once and cached in this process (see get_system_user()).
 """
 
 from channels.db import database_sync_to_async
 
+from django.conf import settings
+from django.db import transaction
+
 from OB.models import OBUser
+from OB.strings import StringId
+
+# The default number of database objects to load or delete at once from a large QuerySet
+ITERATION_CHUNK_SIZE = getattr(settings, "OB_ITERATION_CHUNK_SIZE", 500)
+
+# The cached OBUser of the server, which sends system messages
+SYSTEM_USER = None
 
 def try_get(model, **kwargs):
     """
@@ -42,6 +60,20 @@ def async_try_get(model, **kwargs):
 
     return try_get(model, **kwargs)
 
+def get(model, **kwargs):
+    """
+    Retrieves a single database object.
+
+    Arguments:
+        model (Class): A database model class (see OB.models.py).
+        kwargs: Class variable values to use for the database query.
+
+    Return values:
+        obj: A single database object whose class variable values match the kwargs.
+    """
+
+    return model.objects.get(**kwargs)
+
 @database_sync_to_async
 def async_get(model, **kwargs):
     """
@@ -55,12 +87,11 @@ def async_get(model, **kwargs):
         obj: A single database object whose class variable values match the kwargs.
     """
 
-    return model.objects.get(**kwargs)
+    return get(model, **kwargs)
 
-@database_sync_to_async
-def async_filter(model, **kwargs):
+def filter_list(model, **kwargs):
     """
-    Allows an asynchronous function to filter database objects.
+    Filters database objects into a list.
 
     Arguments:
         model (Class): A database model class (see OB.models.py).
@@ -77,9 +108,23 @@ def async_filter(model, **kwargs):
     # pylint: enable=unnecessary-comprehension
 
 @database_sync_to_async
-def async_save(model_or_object, **kwargs):
+def async_filter(model, **kwargs):
     """
-    Allows an asynchronous function to save a new or existing database object.
+    Allows an asynchronous function to filter database objects.
+
+    Arguments:
+        model (Class): A database model class (see OB.models.py).
+        kwargs: Class variable values to use for the database query.
+
+    Return values:
+        list[obj]: A list of database objects whose class variable values match the kwargs.
+    """
+
+    return filter_list(model, **kwargs)
+
+def save(model_or_object, **kwargs):
+    """
+    Saves a new or existing database object.
 
     Arguments:
         model_or_object: A database model class or a database object (see OB.models.py).
@@ -102,6 +147,93 @@ def async_save(model_or_object, **kwargs):
     new_object.save()
     return new_object
 
+@database_sync_to_async
+def async_save(model_or_object, **kwargs):
+    """
+    Allows an asynchronous function to save a new or existing database object.
+
+    Arguments:
+        model_or_object: A database model class or a database object (see OB.models.py).
+            If there are no kwargs, then it is assumed that this is an object, not a model.
+        kwargs: Class variable values to assign to the new database object.
+
+    Return values:
+        obj: The newly created database object or the existing database object that was just saved.
+    """
+
+    return save(model_or_object, **kwargs)
+
+def bulk_save(model, kwargs_list):
+    """
+    Saves many new database objects of a model with one query.
+    Does not call the model's save() method. Do not use for OBUsers, which must be created with
+    OBUser.objects.create_user() (see save()).
+
+    Arguments:
+        model (Class): A database model class (see OB.models.py).
+        kwargs_list (list[dict]): The class variable values of each new database object.
+
+    Return values:
+        list[obj]: The newly created database objects. Their ids are only set if the database
+            backend supports returning them from a bulk insert.
+    """
+
+    if not kwargs_list:
+        return []
+
+    return model.objects.bulk_create([model(**kwargs) for kwargs in kwargs_list])
+
+@database_sync_to_async
+def async_bulk_save(model, kwargs_list):
+    """
+    Allows an asynchronous function to save many new database objects of a model with one query
+    (see bulk_save()).
+
+    Arguments:
+        model (Class): A database model class (see OB.models.py).
+        kwargs_list (list[dict]): The class variable values of each new database object.
+
+    Return values:
+        list[obj]: The newly created database objects.
+    """
+
+    return bulk_save(model, kwargs_list)
+
+def bulk_update(objects, fields):
+    """
+    Saves changes to the same fields of many existing database objects with one query.
+
+    Arguments:
+        objects (list[obj]): The changed database objects. Must all be of the same model.
+        fields (list[string]): The names of the changed fields.
+    """
+
+    if objects:
+        type(objects[0]).objects.bulk_update(objects, fields)
+
+@database_sync_to_async
+def async_bulk_update(objects, fields):
+    """
+    Allows an asynchronous function to save changes to many existing database objects with one
+    query (see bulk_update()).
+
+    Arguments:
+        objects (list[obj]): The changed database objects. Must all be of the same model.
+        fields (list[string]): The names of the changed fields.
+    """
+
+    bulk_update(objects, fields)
+
+def delete(delete_object):
+    """
+    Deletes a database object.
+
+    Arguments:
+        delete_object: The database object to delete.
+    """
+
+    delete_object.delete()
+
 @database_sync_to_async
 def async_delete(delete_object):
     """
@@ -111,8 +243,70 @@ def async_delete(delete_object):
         delete_object: The database object to delete.
     """
 
-    delete_object.delete()
+    delete(delete_object)
 
+def bulk_delete(objects):
+    """
+    Deletes many database objects of the same model with one query for each table they cascade
+    to.
+
+    Arguments:
+        objects (list[obj]): The database objects to delete.
+    """
+
+    if objects:
+        type(objects[0]).objects.filter(id__in=[obj.id for obj in objects]).delete()
+
+def delete_chunk(query_set, chunk_size=ITERATION_CHUNK_SIZE):
+    """
+    Deletes the first chunk of a QuerySet in order of id with one query for the ids and one query
+    for each table the rows cascade to.
+    Django loads the full rows of the chunk before deleting them if the model has delete signal
+    receivers, like Admins and Bans (see OB.utilities.privilege.invalidate_on_change()), or rows
+    that cascade, like the recipients of Messages. Chunks bound how many rows are loaded at once.
+    Call repeatedly to delete a large QuerySet in bounded chunks.
+
+    Arguments:
+        query_set (QuerySet): The QuerySet to delete a chunk of. Its ordering is ignored.
+        chunk_size (int): The most database objects to delete.
+
+    Return values:
+        int: The number of database objects deleted. 0 if the QuerySet was already empty.
+    """
+
+    chunk_ids = list(query_set.order_by("id").values_list("id", flat=True)[:chunk_size])
+
+    if chunk_ids:
+        query_set.model.objects.filter(id__in=chunk_ids).delete()
+
+    return len(chunk_ids)
+
+@database_sync_to_async
+def async_delete_chunk(query_set, chunk_size=ITERATION_CHUNK_SIZE):
+    """
+    Allows an asynchronous function to delete a chunk of a QuerySet (see delete_chunk()).
+
+    Arguments:
+        query_set (QuerySet): The QuerySet to delete a chunk of.
+        chunk_size (int): The most database objects to delete.
+
+    Return values:
+        int: The number of database objects deleted.
+    """
+
+    return delete_chunk(query_set, chunk_size)
+
+def add(field, add_object):
+    """
+    Adds to a database object's OneToManyField or ManyToManyField.
+
+    Arguments:
+        field (OneToManyField/ManyToManyField): A database object's field to add to.
+        add_object: The database object to add. Type must match to object model's type (see
+            OB.models.py).
+    """
+
+    field.add(add_object)
 
 @database_sync_to_async
 def async_add(field, add_object):
@@ -126,7 +320,46 @@ def async_add(field, add_object):
             OB.models.py).
     """
 
-    field.add(add_object)
+    add(field, add_object)
+
+def bulk_add(field, add_objects):
+    """
+    Adds many database objects to a database object's ManyToManyField with one query.
+    Objects that are already in the field are skipped.
+
+    Arguments:
+        field (ManyToManyField): A database object's field to add to.
+        add_objects (list[obj]): The database objects to add. Type must match to object model's
+            type (see OB.models.py).
+    """
+
+    if not add_objects:
+        return
+
+    # add() selects the existing links before inserting the new ones, but ignoring conflicting
+    # links in the insert has the same result
+    field.through.objects.bulk_create(
+        [
+            field.through(**{
+                f"{field.source_field_name}_id": field.instance.id,
+                f"{field.target_field_name}_id": add_object.id
+            })
+            for add_object in add_objects
+        ],
+        ignore_conflicts=True
+    )
+
+def remove(field, remove_object):
+    """
+    Removes from a database object's OneToManyField or ManyToManyField.
+
+    Arguments:
+        field (OneToManyField/ManyToManyField): A database object's field to remove from.
+        remove_object: The database object to remove. Type must match to object model's type (see
+            OB.models.py).
+    """
+
+    field.remove(remove_object)
 
 @database_sync_to_async
 def async_remove(field, remove_object):
@@ -140,7 +373,22 @@ def async_remove(field, remove_object):
             OB.models.py).
     """
 
-    field.remove(remove_object)
+    remove(field, remove_object)
+
+def len_all(query_set):
+    """
+    Gets the length of a database table with a COUNT query, without loading its rows.
+
+    Arguments:
+        table: A database table to find the length of.
+               May be in the form QuerySet, OneToManyField, ManyToManyField, etc., as long as there
+               exists a corresponding table in the database.
+
+    Return values:
+        int: The length of the table.
+    """
+
+    return query_set.all().count()
 
 @database_sync_to_async
 def async_len_all(query_set):
@@ -156,13 +404,11 @@ def async_len_all(query_set):
         int: The length of the table.
     """
 
-    return len(query_set.all())
+    return len_all(query_set)
 
-@database_sync_to_async
-def async_model_list(model):
+def model_list(model):
     """
-    Allows an asynchronous function to get a list of database objects of a model so that it may
-    be iterated on asynchronously.
+    Gets a list of database objects of a model.
 
     Arguments:
         model: The model to get a list of.
@@ -182,45 +428,142 @@ def async_model_list(model):
         return [obj for obj in model.all()]
 
 @database_sync_to_async
-def async_get_owner(room):
+def async_model_list(model):
     """
-    Allows an asynchronous function to get the owner attribute of a Room.
-    The owner attribute of a Room is a ForeignKey, which require a database query to access.
+    Allows an asynchronous function to get a list of database objects of a model so that it may
+    be iterated on asynchronously.
 
     Arguments:
-        room (Room): The Room object to get the owner attribute of.
+        model: The model to get a list of.
+            May also be a ManyRelatedManager, which has its own table in the database.
 
     Return values:
-        OBUser: The owner of the room argument.
+        list[obj]: A list of database objects from the model's QuerySet.
     """
 
-    return room.owner
+    return model_list(model)
 
-def add_occupants(room, occupants):
+def get_chunk(query_set, after_id=None, chunk_size=ITERATION_CHUNK_SIZE):
     """
-    Adds a list of users to the occupants of room if they are not already in it.
+    Gets the next chunk of a QuerySet in order of id, using the last id of the previous chunk
+    instead of an offset so that each chunk is one indexed range query.
 
     Arguments:
-        room (Room): The room to add users to the occupants of.
-        occupants (list[OBUser]): The list of users to add to the room's occupants list.
+        query_set (QuerySet): The QuerySet to get a chunk of. Its ordering is ignored.
+        after_id (int or None): The id of the last database object of the previous chunk, or None
+            for the first chunk.
+        chunk_size (int): The most database objects to get.
+
+    Return values:
+        list[obj]: The database objects of the chunk. Fewer than chunk_size if it is the last.
     """
 
-    for user in occupants:
-        if user not in room.occupants.all():
-            room.occupants.add(user)
+    if after_id is not None:
+        query_set = query_set.filter(id__gt=after_id)
 
-@database_sync_to_async
-def async_add_occupants(room, occupants):
+    return list(query_set.order_by("id")[:chunk_size])
+
+async def async_iterate_chunks(query_set, chunk_size=ITERATION_CHUNK_SIZE):
     """
-    Allows an asynchronous function to add a list of users to the occupants of room if they are not
-    already in it.
+    Allows an asynchronous function to iterate over a QuerySet in chunks, loading one chunk at a
+    time (see get_chunk()).
+    Server-side cursors are not used because each chunk may be loaded in a different worker thread,
+    with a different database connection.
 
     Arguments:
-        room (Room): The room to add users to the occupants of.
-        occupants (list[OBUser]): The list of users to add to the room's occupants list.
+        query_set (QuerySet or ManyRelatedManager): The database objects to iterate over, in order
+            of id.
+        chunk_size (int): The most database objects to load at once.
+
+    Return values:
+        AsyncIterator[list[obj]]: The chunks of database objects.
+    """
+
+    # ManyRelatedManagers have their own table in the database
+    query_set = query_set.all()
+    after_id = None
+
+    while True:
+        chunk = await database_sync_to_async(get_chunk)(query_set, after_id, chunk_size)
+
+        if chunk:
+            yield chunk
+
+        if len(chunk) < chunk_size:
+            return
+
+        after_id = chunk[-1].id
+
+async def async_iterate(query_set, chunk_size=ITERATION_CHUNK_SIZE):
+    """
+    Allows an asynchronous function to iterate over a QuerySet, loading chunk_size database
+    objects at a time (see async_iterate_chunks()).
+
+    Arguments:
+        query_set (QuerySet or ManyRelatedManager): The database objects to iterate over, in order
+            of id.
+        chunk_size (int): The most database objects to load at once.
+
+    Return values:
+        AsyncIterator[obj]: The database objects.
     """
 
-    add_occupants(room, occupants)
+    async for chunk in async_iterate_chunks(query_set, chunk_size):
+        for obj in chunk:
+            yield obj
+
+def get_system_user():
+    """
+    Gets the OBUser of the server, loading it if it is not cached.
+
+    Return values:
+        OBUser: The system user.
+    """
+
+    # pylint: disable=global-statement
+    # Justification: The system user is cached for every caller in this process.
+    global SYSTEM_USER
+    # pylint: enable=global-statement
+
+    if SYSTEM_USER is None:
+        SYSTEM_USER = OBUser.objects.get(username=StringId.SystemUsername)
+
+    return SYSTEM_USER
+
+async def async_get_system_user():
+    """
+    Allows an asynchronous function to get the OBUser of the server, without a database hop if it
+    is cached (see get_system_user()).
+
+    Return values:
+        OBUser: The system user.
+    """
+
+    return SYSTEM_USER or await database_sync_to_async(get_system_user)()
+
+def forget_system_user(sender, instance, **kwargs):
+    """
+    Removes the system user from this process's cache if it is saved or deleted, so that it is not
+    used after it changes.
+    Connected to the post_save and post_delete signals of OBUser in OB.apps.
+
+    Arguments:
+        sender (Class): The model class of the database object.
+        instance (OBUser): The saved or deleted OBUser.
+        kwargs: The other arguments of the signal.
+    """
+
+    # pylint: disable=global-statement, unused-argument
+    # Justification: The system user is cached for every caller in this process. Signal receivers
+    #   must accept the sender and any other arguments.
+    global SYSTEM_USER
+
+    if SYSTEM_USER is not None and (
+        instance.id == SYSTEM_USER.id or
+        instance.username == StringId.SystemUsername
+    ):
+        SYSTEM_USER = None
+    # pylint: enable=global-statement, unused-argument
 
 @database_sync_to_async
 def async_repr(repr_object):
@@ -234,3 +577,154 @@ def async_repr(repr_object):
         occupants (list[OBUser]): The list of users to add to the room's occupants list.
     """
     return repr_object.__repr__()
+
+class UnitOfWork:
+    """
+    A list of database operations that are run together in one database_sync_to_async hop,
+    optionally in one transaction.
+    Each method queues an operation and returns the index of its result in the list returned by
+    run() or async_run().
+
+    Example:
+        work = UnitOfWork()
+        work.try_get(OBUser, username=username)
+        work.filter(Ban, room=room, is_lifted=False)
+        user, bans = await work.async_run()
+    """
+
+    def __init__(self, atomic=False):
+        """
+        Arguments:
+            atomic (bool): Whether to run the operations in one transaction.
+        """
+
+        self.atomic = atomic
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Queues any synchronous function, such as one that makes several dependent database calls.
+
+        Arguments:
+            function (function): The function to call.
+            args: The positional arguments of the function.
+            kwargs: The keyword arguments of the function.
+
+        Return values:
+            int: The index of the function's return value in the results.
+        """
+
+        self.operations += [(function, args, kwargs)]
+        return len(self.operations) - 1
+
+    def try_get(self, model, **kwargs):
+        """
+        Queues try_get().
+        """
+
+        return self.call(try_get, model, **kwargs)
+
+    def get(self, model, **kwargs):
+        """
+        Queues get().
+        """
+
+        return self.call(get, model, **kwargs)
+
+    def filter(self, model, **kwargs):
+        """
+        Queues filter_list().
+        """
+
+        return self.call(filter_list, model, **kwargs)
+
+    def save(self, model_or_object, **kwargs):
+        """
+        Queues save().
+        """
+
+        return self.call(save, model_or_object, **kwargs)
+
+    def bulk_save(self, model, kwargs_list):
+        """
+        Queues bulk_save().
+        """
+
+        return self.call(bulk_save, model, kwargs_list)
+
+    def bulk_update(self, objects, fields):
+        """
+        Queues bulk_update().
+        """
+
+        return self.call(bulk_update, objects, fields)
+
+    def delete(self, delete_object):
+        """
+        Queues delete().
+        """
+
+        return self.call(delete, delete_object)
+
+    def bulk_delete(self, objects):
+        """
+        Queues bulk_delete().
+        """
+
+        return self.call(bulk_delete, objects)
+
+    def add(self, field, add_object):
+        """
+        Queues add().
+        """
+
+        return self.call(add, field, add_object)
+
+    def remove(self, field, remove_object):
+        """
+        Queues remove().
+        """
+
+        return self.call(remove, field, remove_object)
+
+    def model_list(self, model):
+        """
+        Queues model_list().
+        """
+
+        return self.call(model_list, model)
+
+    def run(self):
+        """
+        Runs the queued operations in order and clears the queue.
+        If the unit of work is atomic and an operation raises an exception, the operations before
+        it are rolled back.
+
+        Return values:
+            list: The result of each operation, in the order they were queued.
+        """
+
+        operations, self.operations = self.operations, []
+
+        if not self.atomic:
+            return [function(*args, **kwargs) for function, args, kwargs in operations]
+
+        with transaction.atomic():
+            return [function(*args, **kwargs) for function, args, kwargs in operations]
+
+    async def async_run(self):
+        """
+        Allows an asynchronous function to run the queued operations in one database hop (see
+        run()).
+
+        Return values:
+            list: The result of each operation, in the order they were queued.
+        """
+
+        if not self.operations:
+            return []
+
+        return await database_sync_to_async(self.run)()
@@ -0,0 +1,224 @@
+"""
+Useful encoding functions.
+
+Messages are encoded once by the sender into an envelope, which is sent through the channel layer
+as-is and written to each client's WebSocket without being decoded or encoded again.
+
+An envelope is a dict with a "text" JSON frame and, if the binary protocol is enabled, a "bytes"
+MessagePack frame. Clients choose the binary protocol by requesting the BINARY_SUBPROTOCOL
+WebSocket subprotocol when they connect. JSON is the default. The binary protocol is disabled by
+default, because then every envelope is encoded both ways; enable OB_BINARY_PROTOCOL in the settings
+only if clients use it.
+
+Binary frames are MessagePack arrays whose first element is a FrameTypes value:
+    [FrameTypes.Message, text, sender_name, flags, timestamp]
+        flags: MESSAGE_HAS_RECIPIENTS and MESSAGE_HAS_EXCLUSIONS bits
+        timestamp: Milliseconds since the epoch
+    [FrameTypes.Refresh]
+    [FrameTypes.Batch, frame, frame, ...]
+Several frames may be sent at once as a batch frame (see encode_batch()). Batched JSON frames are a
+JSON array of frames.
+Binary frames from the client are [FrameTypes.Message, text] or [FrameTypes.Heartbeat]. JSON frames
+from the client are {"message_text": text} or {"heartbeat": true}. Heartbeats have no message text
+(see OB.utilities.presence).
+
+The JSON encoder is chosen with OB_JSON_ENCODER in the settings. It may be "json", "orjson",
+"ujson", or the dotted path of a function that takes an object and returns a JSON string. If the
+chosen encoder is not installed, the standard library json module is used instead.
+"""
+
+import json
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from OB.constants import FrameTypes
+from OB.utilities.format import get_datetime_string
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BINARY_SUBPROTOCOL = "ob.msgpack"
+BINARY_ENABLED = msgpack is not None and getattr(settings, "OB_BINARY_PROTOCOL", False)
+
+MESSAGE_HAS_RECIPIENTS = 1
+MESSAGE_HAS_EXCLUSIONS = 2
+
+def get_json_encoder(name):
+    """
+    Gets a function that encodes an object as a JSON string.
+
+    Arguments:
+        name (string): "json", "orjson", "ujson", or the dotted path of an encoder function.
+
+    Return values:
+        function: A function that takes an object and returns a JSON string.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    # Justification: The fast encoders are optional dependencies.
+    try:
+        if name == "orjson":
+            import orjson
+            return lambda obj: orjson.dumps(obj).decode()
+
+        if name == "ujson":
+            import ujson
+            return ujson.dumps
+    except ImportError:
+        return json.dumps
+    # pylint: enable=import-outside-toplevel
+
+    if name == "json":
+        return json.dumps
+
+    return import_string(name)
+
+# The encoder used for every JSON frame sent to a client
+ENCODE_JSON = get_json_encoder(getattr(settings, "OB_JSON_ENCODER", "json"))
+
+def encode_json(obj):
+    """
+    Encodes an object as a JSON string with the configured encoder.
+
+    Arguments:
+        obj: The object to encode. Must only contain JSON types.
+
+    Return values:
+        string: The encoded JSON.
+    """
+
+    return ENCODE_JSON(obj)
+
+def encode_binary(frame):
+    """
+    Encodes a binary protocol frame with MessagePack.
+
+    Arguments:
+        frame (list): The frame to encode, starting with a FrameTypes value.
+
+    Return values:
+        bytes: The encoded frame.
+    """
+
+    return msgpack.packb(frame)
+
+def encode_message(text, sender_name, timestamp, has_recipients=False, has_exclusions=False):
+    """
+    Encodes a message and its metadata into the envelope that is sent to every client.
+
+    Arguments:
+        text (string): The message text.
+        sender_name (string): The name to display as the sender.
+        timestamp (datetime): When the message was sent.
+        has_recipients (bool): Whether the message is only for specific users.
+        has_exclusions (bool): Whether the message is hidden from specific users.
+
+    Return values:
+        dict{string: string/bytes}: The envelope.
+    """
+
+    envelope = {
+        "text": encode_json({
+            "text": text,
+            "sender_name": sender_name,
+            "has_recipients": has_recipients,
+            "has_exclusions": has_exclusions,
+            "timestamp": get_datetime_string(timestamp)
+        })
+    }
+
+    if BINARY_ENABLED:
+        flags = (
+            (MESSAGE_HAS_RECIPIENTS if has_recipients else 0) |
+            (MESSAGE_HAS_EXCLUSIONS if has_exclusions else 0)
+        )
+        envelope["bytes"] = encode_binary([
+            FrameTypes.Message,
+            text,
+            sender_name,
+            flags,
+            int(timestamp.timestamp() * 1000)
+        ])
+
+    return envelope
+
+def encode_refresh():
+    """
+    Encodes the signal for a client to leave the room and refresh its page.
+
+    Return values:
+        dict{string: string/bytes}: The envelope.
+    """
+
+    envelope = {"text": encode_json({"refresh": True})}
+
+    if BINARY_ENABLED:
+        envelope["bytes"] = encode_binary([FrameTypes.Refresh])
+
+    return envelope
+
+def encode_batch(frames):
+    """
+    Combines already encoded frames into one batch frame without decoding them.
+
+    Arguments:
+        frames (list[string] or list[bytes]): The JSON frames or the binary frames to combine.
+
+    Return values:
+        string or bytes: A JSON array of the JSON frames or a binary batch frame of the binary
+            frames.
+    """
+
+    if isinstance(frames[0], str):
+        return "[" + ",".join(frames) + "]"
+
+    # A MessagePack array is a header followed by its already encoded elements
+    packer = msgpack.Packer()
+    return (
+        packer.pack_array_header(len(frames) + 1) +
+        packer.pack(FrameTypes.Batch) +
+        b"".join(frames)
+    )
+
+def decode_message_text(text_data=None, bytes_data=None):
+    """
+    Decodes the message text of a frame received from a client.
+    Frames come from the network, so any frame that is malformed or not a message is ignored.
+
+    Arguments:
+        text_data (string): A JSON frame containing the message text. Constructed in the JavaScript
+            of room.html.
+        bytes_data (bytes): A binary protocol frame containing the message text.
+
+    Return values:
+        string: The message text, or None if the frame is malformed or does not contain a message.
+    """
+
+    if bytes_data is not None:
+        if not BINARY_ENABLED:
+            return None
+
+        try:
+            frame = msgpack.unpackb(bytes_data)
+        except (TypeError, ValueError):
+            return None
+
+        if not isinstance(frame, list) or len(frame) < 2 or frame[0] != FrameTypes.Message:
+            return None
+
+        message_text = frame[1]
+    else:
+        try:
+            frame = json.loads(text_data)
+        except (TypeError, ValueError):
+            return None
+
+        if not isinstance(frame, dict):
+            return None
+
+        message_text = frame.get("message_text")
+
+    return message_text if isinstance(message_text, str) else None
@@ -2,15 +2,20 @@
 Useful Consumer event functions.
 """
 
-import json
+import asyncio
+
+from uuid import uuid4
 
 from channels.layers import get_channel_layer
 
 from OB.constants import GroupTypes
-from OB.models import Message, OBUser, Room
+from OB.models import Room
 from OB.strings import StringId
-from OB.utilities.database import async_add, async_get, async_save, async_try_get
-from OB.utilities.format import get_datetime_string, get_group_name
+from OB.utilities.database import async_get_system_user, async_save, async_try_get
+from OB.utilities.encoding import encode_message
+from OB.utilities.format import get_group_name, get_user_group_name
+from OB.utilities.persistence import async_save_message, async_save_messages
+from OB.utilities.privilege import invalidate_privilege_table
 
 async def send_event(event, group_name):
     """
@@ -26,6 +31,18 @@ async def send_event(event, group_name):
 
     await get_channel_layer().group_send(group_name, event)
 
+async def send_events(events, group_name):
+    """
+    Distributes several events to a consumer group, one after another.
+
+    Arguments:
+        events (list[dict]): The events to send, in order (see send_event()).
+        group_name (string): The name of the group to send the events to.
+    """
+
+    for event in events:
+        await send_event(event, group_name)
+
 async def send_room_event(room_id, event):
     """
     Distributes an event to the consumer group associated with a room.
@@ -39,13 +56,135 @@ async def send_room_event(room_id, event):
 
     await send_event(event, get_group_name(GroupTypes.Room, room_id))
 
-async def send_room_message(message_json, room_id, recipients=None, exclusions=None):
+async def send_kick(room_id, users=None, exclusions=None):
+    """
+    Sends one event of type "kick" to a specified room so that the OBConsumers of the specified
+    users leave it (see OBConsumer.kick()), however many users there are.
+
+    Arguments:
+        room_id (int): The id of the room whose group to send the event to.
+        users (list[OBUser] or None): The users to kick. If None, every OBConsumer in the room is
+            kicked.
+        exclusions (list[OBUser] or None): Users who will not be kicked, even if they are in users.
+    """
+
+    event = {
+        "type": "kick",
+        "target_ids": [user.id for user in users] if users is not None else None,
+        "exclusion_ids": [user.id for user in exclusions] if exclusions else []
+    }
+
+    await send_room_event(room_id, event)
+
+async def send_channel_kick(channel_name):
+    """
+    Sends an event of type "kick" to one OBConsumer so that it leaves its room (see
+    OBConsumer.kick()), like when its WebSocket is swept (see OB.utilities.presence.sweep()).
+
+    Arguments:
+        channel_name (string): The channel name of the OBConsumer.
+    """
+
+    event = {
+        "type": "kick",
+        "target_ids": None,
+        "exclusion_ids": []
+    }
+
+    await get_channel_layer().send(channel_name, event)
+
+async def send_invalidate_context(room_id, users=None):
+    """
+    Sends an event of type "invalidate_context" to a specified room so that the OBConsumers of the
+    specified users reload their context (see OBConsumer.invalidate_context()).
+    Should be sent whenever a command changes the room itself. Privileges and bans are not part of
+    the context (see send_invalidate_privileges()).
+
+    Arguments:
+        room_id (int): The id of the room whose group to send the event to.
+        users (list[OBUser] or None): The users whose context should be reloaded. If None, every
+            OBConsumer in the room reloads its context.
+    """
+
+    event = {
+        "type": "invalidate_context",
+        "user_ids": [user.id for user in users] if users is not None else None
+    }
+
+    await send_room_event(room_id, event)
+
+async def send_invalidate_privileges(room_id):
+    """
+    Invalidates the privilege table of a room in this process and sends an event of type
+    "invalidate_privileges" to the room so that every other process serving it does too (see
+    OBConsumer.invalidate_privileges()).
+    Should be sent whenever Admins or Bans are created or updated without a signal, such as in bulk.
+
+    Arguments:
+        room_id (int): The id of the room whose group to send the event to.
+    """
+
+    token = uuid4().hex
+    invalidate_privilege_table(room_id, token)
+
+    event = {
+        "type": "invalidate_privileges",
+        "room_id": room_id,
+        "token": token
+    }
+
+    await send_room_event(room_id, event)
+
+def get_room_message_events(envelope, room_id, recipients=None, exclusions=None):
+    """
+    Makes the events of type "room_message" that deliver a message to a specified room, and the
+    group to send each one to (see send_room_message()).
+
+    Arguments:
+        envelope (dict{string: string/bytes}): The encoded message text and any metadata to be
+            displayed (see OB.utilities.encoding.encode_message()).
+        room_id (int): The id of the room to send the message to.
+        recipients (list[OBUser] or None): The only users who will see the response.
+        exclusions (list[OBUser] or None): Users who will not see the response.
+
+    Return values:
+        list[tuple(dict, string)]: Each event and the name of the group to send it to.
+    """
+
+    exclusion_ids = {user.id for user in exclusions} if exclusions else set()
+
+    if recipients:
+        event = {
+            "type": "room_message",
+            "envelope": envelope,
+            "exclusion_ids": []
+        }
+
+        return [
+            (event, get_user_group_name(recipient_id, room_id))
+            for recipient_id in dict.fromkeys(user.id for user in recipients)
+            if recipient_id not in exclusion_ids
+        ]
+
+    event = {
+        "type": "room_message",
+        "envelope": envelope,
+        "exclusion_ids": list(exclusion_ids)
+    }
+
+    return [(event, get_group_name(GroupTypes.Room, room_id))]
+
+async def send_room_message(envelope, room_id, recipients=None, exclusions=None):
     """
     Sends an event of type "room_message", to a specified room (see OBConsumer.room_message()).
     This is the last operation performed for only the sender.
+    If there are recipients, the event is only sent to each recipient's user group (see
+    get_user_group_name()), so the other consumers in the room never receive it.
 
     Arguments:
-        message_json (string): A JSON containing the message text and any metadata to be displayed.
+        envelope (dict{string: string/bytes}): The encoded message text and any metadata to be
+            displayed (see OB.utilities.encoding.encode_message()). It is sent to every consumer
+            as-is.
         room_id (int): The id of the room to send the message to.
         recipients (list[OBUser] or None): The only users who will see the response. If None, all
             occupants of the room will see the response. If a user in this list is also in
@@ -55,14 +194,8 @@ async def send_room_message(message_json, room_id, recipients=None, exclusions=N
             will not receive the message.
     """
 
-    event = {
-        "type": "room_message",
-        "message_json": message_json,
-        "recipient_ids": [user.id for user in recipients] if recipients else [-1],
-        "exclusion_ids": [user.id for user in exclusions] if exclusions else [-1]
-    }
-
-    await send_room_event(room_id, event)
+    for event, group_name in get_room_message_events(envelope, room_id, recipients, exclusions):
+        await send_event(event, group_name)
 
 async def send_system_room_message(message_text, room, recipients=None, exclusions=None):
     """
@@ -81,40 +214,57 @@ async def send_system_room_message(message_text, room, recipients=None, exclusio
             will not receive the message.
     """
 
-    if not message_text or message_text.isspace():
+    await send_system_room_messages([(message_text, recipients, exclusions)], room)
+
+async def send_system_room_messages(messages, room):
+    """
+    Sends several messages from the server to a specified room's group (see
+    send_system_room_message()), saving them in one batch and sending them in one pass over the
+    channel layer.
+    Messages sent to the same group arrive in order. Empty messages are skipped.
+
+    Arguments:
+        messages (list[tuple(string, list[OBUser] or None, list[OBUser] or None)]): The text of
+            each message to send from the server, with its recipients and exclusions.
+        room (Room): The database object of the room to send these messages to.
+    """
+
+    messages = [
+        (message_text, recipients, exclusions)
+        for message_text, recipients, exclusions in messages
+        if message_text and not message_text.isspace()
+    ]
+
+    if not messages:
         return
 
-    # Save message to database
-    system_user = await async_get(OBUser, username=StringId.SystemUsername)
-    new_message = await async_save(
-        Message,
-        message=message_text,
-        sender=system_user,
-        room=room
-    )
+    # Save messages to database
+    system_user = await async_get_system_user()
+    new_messages = await async_save_messages([
+        ({"message": message_text, "sender": system_user, "room": room}, recipients, exclusions)
+        for message_text, recipients, exclusions in messages
+    ])
 
-    if recipients:
-        for user in recipients:
-            await async_add(new_message.recipients, user)
-    else:
-        await async_add(new_message.recipients, None)
-
-    if exclusions:
-        for user in exclusions:
-            await async_add(new_message.exclusions, user)
-    else:
-        await async_add(new_message.exclusions, None)
-
-    message_json = json.dumps({
-        "text": message_text,
-        "sender_name": StringId.SystemUsername,
-        "has_recipients": bool(recipients),
-        "has_exclusions": bool(exclusions),
-        "timestamp": get_datetime_string(new_message.timestamp)
-    })
-
-    # Send the message
-    await send_room_message(message_json, room.id, recipients, exclusions)
+    # Encode each message once for every recipient and collect the events of each group
+    group_events = {}
+
+    for (message_text, recipients, exclusions), new_message in zip(messages, new_messages):
+        envelope = encode_message(
+            message_text,
+            StringId.SystemUsername,
+            new_message.timestamp,
+            has_recipients=bool(recipients),
+            has_exclusions=bool(exclusions)
+        )
+
+        for event, group_name in get_room_message_events(envelope, room.id, recipients,
+                                                         exclusions):
+            group_events.setdefault(group_name, []).append(event)
+
+    # Send the messages
+    await asyncio.gather(*[
+        send_events(events, group_name) for group_name, events in group_events.items()
+    ])
 
 async def send_private_message(message_text, sender, recipient):
     """
@@ -141,19 +291,18 @@ async def send_private_message(message_text, sender, recipient):
 
 
     # Save message to database
-    new_message = await async_save(
-        Message,
+    new_message = await async_save_message(
         message=message_text,
         sender=sender,
         room=private_message_room
     )
 
-    # Encode the message data and metadata
-    message_json = json.dumps({
-        "text": message_text,
-        "sender_name": sender.display_name or sender.username,
-        "timestamp": get_datetime_string(new_message.timestamp)
-    })
+    # Encode the message data and metadata once for both users
+    envelope = encode_message(
+        message_text,
+        sender.display_name or sender.username,
+        new_message.timestamp
+    )
 
     # Send message to room group
-    await send_room_message(message_json, private_message_room.id)
+    await send_room_message(envelope, private_message_room.id)
@@ -31,6 +31,21 @@ def get_group_name(group_type, target_id, second_id=-1):
 
     return switch[group_type]
 
+def get_user_group_name(user_id, room_id):
+    """
+    Gets the correctly formatted name of the group of a single user's consumers in a room.
+    Messages with recipients are sent to these groups instead of the whole room group.
+
+    Arguments:
+        user_id (int): The id of the user of this group.
+        room_id (int): The id of the room of this group.
+
+    Return values:
+        string: A formatted name string.
+    """
+
+    return f"{get_group_name(GroupTypes.Room, room_id)}_user_{user_id}"
+
 def get_datetime_string(date_time):
     """
     Gets the correctly formatted string for a datetime.
@@ -0,0 +1,222 @@
+"""
+Useful outbound frame functions.
+
+Each OBConsumer sends frames to its client through a bounded OutboundQueue, so that a client that
+is not receiving frames fast enough cannot make the consumer hold an unbounded number of frames or
+stall while sending them. What happens when the queue is full is determined by an
+OverflowPolicies value.
+
+If OB_FRAME_COALESCING_WINDOW is set, the frames queued within that many seconds of each other are
+sent as one batch frame, so that a bursty room costs each client fewer frames and wakeups.
+
+The Coalesce policy merges waiting frames instead of dropping them, but never holds more than
+OB_OUTBOUND_MAX_COALESCED_FRAMES frames for one client. Past that, the client is disconnected like
+with the Disconnect policy.
+"""
+
+import asyncio
+import logging
+
+from django.conf import settings
+
+from OB.constants import OverflowPolicies
+from OB.utilities.encoding import encode_batch
+
+OUTBOUND_QUEUE_SIZE = getattr(settings, "OB_OUTBOUND_QUEUE_SIZE", 256)
+OVERFLOW_POLICY = OverflowPolicies[getattr(settings, "OB_OUTBOUND_OVERFLOW_POLICY", "Disconnect")]
+CLOSE_TIMEOUT = getattr(settings, "OB_OUTBOUND_CLOSE_TIMEOUT", 1.0)
+COALESCING_WINDOW = getattr(settings, "OB_FRAME_COALESCING_WINDOW", 0)
+MAX_COALESCED_FRAMES = getattr(settings, "OB_OUTBOUND_MAX_COALESCED_FRAMES", 1024)
+
+# The WebSocket close code sent to a client that is disconnected because its queue overflowed
+SLOW_CLIENT_CLOSE_CODE = 4008
+
+# The WebSocket close code sent to a client whose frames could not be sent
+SEND_FAILURE_CLOSE_CODE = 1011
+
+LOGGER = logging.getLogger(__name__)
+
+class OutboundQueue:
+    """
+    A bounded queue of frames waiting to be sent to one client.
+    Each item is a list of frames, which is sent as a single frame or as one batch frame (see
+    OB.utilities.encoding.encode_batch()).
+    """
+
+    def __init__(self, max_size, policy, coalescing_window=0, max_coalesced_frames=1024):
+        """
+        Arguments:
+            max_size (int): The most items that may wait to be sent.
+            policy (OverflowPolicies): What to do when a frame is put in a full queue.
+            coalescing_window (float): How many seconds to wait for more frames after a frame is
+                queued, before sending them all as one batch frame. If 0, frames are not coalesced.
+            max_coalesced_frames (int): The most frames that the Coalesce policy may merge into one
+                item. Putting a frame that would exceed it is treated as an overflow with the
+                Disconnect policy.
+        """
+
+        self.max_size = max_size
+        self.policy = policy
+        self.coalescing_window = coalescing_window
+        self.max_coalesced_frames = max_coalesced_frames
+        self.queue = asyncio.Queue()
+
+        # True once a frame could not be sent, after which nothing more is queued
+        self.failed = False
+
+        # Counters for monitoring this connection
+        self.dropped_frames = 0
+        self.peak_depth = 0
+
+    @property
+    def depth(self):
+        """
+        The number of items waiting to be sent.
+        """
+
+        return self.queue.qsize()
+
+    def put(self, frame):
+        """
+        Queues a frame to be sent, applying the overflow policy if the queue is full.
+
+        Arguments:
+            frame (string or bytes): The encoded frame.
+
+        Return values:
+            boolean: False if the client should be disconnected, because the queue was full and the
+                policy is to disconnect, because coalescing would hold too many frames, or because
+                an earlier frame could not be sent.
+        """
+
+        if self.failed:
+            return False
+
+        if self.queue.qsize() >= self.max_size:
+            if self.policy == OverflowPolicies.Disconnect:
+                self.clear()
+                return False
+
+            if self.policy == OverflowPolicies.Coalesce:
+                # Merge everything that is waiting into one item, which is sent as one batch frame
+                frames = []
+
+                while not self.queue.empty():
+                    frames += self.queue.get_nowait()
+                    self.queue.task_done()
+
+                # A client that never catches up must not make this grow forever
+                if len(frames) + 1 > self.max_coalesced_frames:
+                    self.dropped_frames += len(frames)
+                    return False
+
+                self.queue.put_nowait(frames)
+            else:
+                self.dropped_frames += len(self.queue.get_nowait())
+                self.queue.task_done()
+
+        self.queue.put_nowait([frame])
+        self.peak_depth = max(self.peak_depth, self.queue.qsize())
+
+        return True
+
+    def clear(self):
+        """
+        Drops every frame that is waiting to be sent.
+        """
+
+        while not self.queue.empty():
+            self.dropped_frames += len(self.queue.get_nowait())
+            self.queue.task_done()
+
+    async def run(self, send, on_failure=None):
+        """
+        Sends queued items until cancelled or until a frame cannot be sent.
+        Items are sent one at a time, or, if there is a coalescing window, every item queued
+        within the window is sent as one batch frame.
+
+        Arguments:
+            send (function): A coroutine function that sends one encoded frame to the client.
+            on_failure (function or None): A coroutine function called with no arguments after a
+                frame could not be sent, which should close the connection. The queue is cleared
+                and stops accepting frames first.
+        """
+
+        try:
+            await self.send_items(send)
+        except asyncio.CancelledError:
+            raise
+        # pylint: disable=broad-except
+        # Justification: Any error means the client can no longer be sent frames.
+        except Exception:
+            LOGGER.exception("Sending a frame to a WebSocket client failed.")
+
+            self.failed = True
+            self.clear()
+
+            if on_failure:
+                await on_failure()
+        # pylint: enable=broad-except
+
+    async def send_items(self, send):
+        """
+        Sends queued items until cancelled, raising the error of the first frame that cannot be
+        sent (see run()).
+
+        Arguments:
+            send (function): A coroutine function that sends one encoded frame to the client.
+        """
+
+        while True:
+            frames = await self.queue.get()
+            items = 1
+
+            if self.coalescing_window:
+                await asyncio.sleep(self.coalescing_window)
+
+                while not self.queue.empty():
+                    frames = frames + self.queue.get_nowait()
+                    items += 1
+
+            try:
+                await send(frames[0] if len(frames) == 1 else encode_batch(frames))
+            finally:
+                for _ in range(items):
+                    self.queue.task_done()
+
+    async def join(self, timeout):
+        """
+        Waits until every queued item has been sent, or until the timeout.
+
+        Arguments:
+            timeout (float): The most seconds to wait.
+
+        Return values:
+            boolean: True if every item was sent.
+        """
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+def make_outbound_queue():
+    """
+    Makes an OutboundQueue with the size, overflow policy, and coalescing window from the
+    settings.
+
+    Return values:
+        OutboundQueue: The new queue, or None if OB_OUTBOUND_QUEUE_SIZE is 0, in which case frames
+            are sent directly.
+    """
+
+    if not OUTBOUND_QUEUE_SIZE:
+        return None
+
+    return OutboundQueue(
+        OUTBOUND_QUEUE_SIZE,
+        OVERFLOW_POLICY,
+        COALESCING_WINDOW,
+        MAX_COALESCED_FRAMES
+    )
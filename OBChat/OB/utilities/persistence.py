@@ -0,0 +1,428 @@
+"""
+Useful message persistence functions.
+
+Messages are either saved immediately or, if OB_MESSAGE_WRITE_BEHIND is enabled in the settings,
+queued and saved in batches by a background MessageWriter so that the database write is not on the
+latency-critical path of a broadcast. The database assigns the ids of queued Messages when they are
+saved, so any number of processes may write Messages. Batches that fail to save are kept and
+retried, so Messages are not lost while the database is unavailable.
+"""
+
+import asyncio
+import atexit
+import logging
+
+from django.conf import settings
+from django.db import connection, DatabaseError, IntegrityError, transaction
+
+from OB.models import Message
+from OB.utilities.anonymous import get_persistent_users
+from OB.utilities.database import async_iterate_chunks, bulk_add
+from OB.utilities.format import get_datetime_string
+from OB.utilities.sqlite import writer_sync_to_async
+
+# The most seconds to wait before retrying a batch that failed to save
+MAX_RETRY_DELAY = 5.0
+
+LOGGER = logging.getLogger(__name__)
+
+def save_message(recipients=None, exclusions=None, **kwargs):
+    """
+    Saves a new Message and its recipients and exclusions in one transaction.
+
+    Arguments:
+        recipients (list[OBUser] or None): The only users who will see the message.
+        exclusions (list[OBUser] or None): Users who will not see the message.
+        kwargs: Class variable values to assign to the new Message.
+
+    Return values:
+        Message: The newly created Message.
+    """
+
+    with transaction.atomic():
+        new_message = Message(**kwargs).save()
+
+        bulk_add(new_message.recipients, recipients)
+        bulk_add(new_message.exclusions, exclusions)
+
+    return new_message
+
+def save_messages(batch):
+    """
+    Saves several new Messages and their recipients and exclusions in one transaction, with one
+    insert per Message and one bulk_create per link table.
+
+    Arguments:
+        batch (list[tuple(dict, list[OBUser] or None, list[OBUser] or None)]): The class variable
+            values of each new Message, with its recipients and exclusions.
+
+    Return values:
+        list[Message]: The newly created Messages, in the same order.
+    """
+
+    new_messages = []
+    recipient_links = []
+    exclusion_links = []
+
+    with transaction.atomic():
+        for kwargs, recipients, exclusions in batch:
+            new_message = Message(**kwargs).save()
+            new_messages += [new_message]
+
+            recipient_links += [
+                Message.recipients.through(message_id=new_message.id, obuser_id=user.id)
+                for user in recipients or []
+            ]
+            exclusion_links += [
+                Message.exclusions.through(message_id=new_message.id, obuser_id=user.id)
+                for user in exclusions or []
+            ]
+
+        Message.recipients.through.objects.bulk_create(recipient_links)
+        Message.exclusions.through.objects.bulk_create(exclusion_links)
+
+    return new_messages
+
+def write_messages(batch):
+    """
+    Inserts a batch of queued Messages and their recipient and exclusion links in one transaction,
+    with one bulk_create per table. The database assigns the ids of the Messages.
+    If the database cannot return the ids of bulk inserted rows, like SQLite, the Messages with
+    recipients or exclusions are inserted one at a time instead, since their links need their ids.
+
+    Arguments:
+        batch (list[tuple(Message, list[int], list[int])]): The unsaved Messages to insert, each
+            with the ids of its recipients and exclusions.
+    """
+
+    try:
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Message.objects.bulk_create([message for message, _, _ in batch])
+            else:
+                Message.objects.bulk_create([
+                    message for message, recipient_ids, exclusion_ids in batch
+                    if not recipient_ids and not exclusion_ids
+                ])
+
+                for message, recipient_ids, exclusion_ids in batch:
+                    if recipient_ids or exclusion_ids:
+                        message.save()
+
+            Message.recipients.through.objects.bulk_create([
+                Message.recipients.through(message_id=message.id, obuser_id=user_id)
+                for message, recipient_ids, _ in batch for user_id in recipient_ids
+            ])
+            Message.exclusions.through.objects.bulk_create([
+                Message.exclusions.through(message_id=message.id, obuser_id=user_id)
+                for message, _, exclusion_ids in batch for user_id in exclusion_ids
+            ])
+    except DatabaseError:
+        # The ids of a rolled back insert must not be reused when the batch is retried
+        for message, _, _ in batch:
+            message.id = None
+
+        raise
+
+@writer_sync_to_async
+def async_write_messages(batch):
+    """
+    Allows an asynchronous function to insert a batch of queued Messages (see write_messages()).
+
+    Arguments:
+        batch (list[tuple(Message, list[int], list[int])]): The Messages to insert.
+    """
+
+    write_messages(batch)
+
+def write_each_message(batch):
+    """
+    Inserts a batch of queued Messages one at a time, dropping the Messages that violate a
+    constraint, like a Message queued for a Room that was deleted before it was saved.
+    Each Message is removed from the batch once it is saved or dropped, so the batch only has the
+    Messages that are left if another error stops it.
+
+    Arguments:
+        batch (list[tuple(Message, list[int], list[int])]): The Messages to insert.
+    """
+
+    while batch:
+        try:
+            write_messages(batch[:1])
+        except IntegrityError:
+            LOGGER.exception("MessageWriter dropped a message that cannot be saved")
+
+        del batch[0]
+
+@writer_sync_to_async
+def async_write_each_message(batch):
+    """
+    Allows an asynchronous function to insert a batch of queued Messages one at a time (see
+    write_each_message()).
+
+    Arguments:
+        batch (list[tuple(Message, list[int], list[int])]): The Messages to insert.
+    """
+
+    write_each_message(batch)
+
+class MessageWriter:
+    """
+    Drains a bounded queue of Messages and inserts them in batches.
+    Messages are given a timestamp when they are created, so they may be broadcast before they are
+    saved. Their ids are assigned by the database when they are saved.
+    A batch that fails to save is retried, waiting longer after each failure, until it is saved.
+    The Messages behind it wait in the queue meanwhile. Retrying cannot fix a violated constraint,
+    so a batch that violates one is saved one Message at a time instead, without the Messages that
+    violate it.
+    """
+
+    def __init__(self, max_queue_size, flush_size, flush_interval):
+        """
+        Arguments:
+            max_queue_size (int): The most Messages that may wait to be saved. Queueing a Message
+                while the queue is full waits until there is room.
+            flush_size (int): The most Messages to insert in one batch.
+            flush_interval (float): The most seconds to wait for a batch to fill before inserting
+                it.
+        """
+
+        self.max_queue_size = max_queue_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        # The queue and task are made lazily so that they belong to the running event loop
+        self.loop = None
+        self.queue = None
+        self.task = None
+
+        # The batch being saved, which is not in the queue anymore
+        self.batch = []
+
+    async def put(self, message, recipients=None, exclusions=None):
+        """
+        Queues a Message to be saved.
+
+        Arguments:
+            message (Message): The unsaved Message to queue.
+            recipients (list[OBUser] or None): The only users who will see the message.
+            exclusions (list[OBUser] or None): Users who will not see the message.
+
+        Return values:
+            Message: The queued Message. Its id is assigned when it is saved.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        if self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue(self.max_queue_size)
+            self.task = None
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+        await self.queue.put((
+            message,
+            [user.id for user in recipients or []],
+            [user.id for user in exclusions or []]
+        ))
+
+        return message
+
+    async def run(self):
+        """
+        Inserts queued Messages in batches of up to flush_size, waiting at most flush_interval
+        seconds for each batch to fill. Retries a batch that fails to save until it is saved.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            self.batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(self.batch) < self.flush_size:
+                timeout = deadline - loop.time()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    self.batch += [await asyncio.wait_for(self.queue.get(), timeout)]
+                except asyncio.TimeoutError:
+                    break
+
+            batch_size = len(self.batch)
+            retry_delay = self.flush_interval
+            is_separate = False
+
+            while self.batch:
+                try:
+                    if is_separate:
+                        await async_write_each_message(self.batch)
+                    else:
+                        await async_write_messages(self.batch)
+                        self.batch = []
+                except IntegrityError:
+                    LOGGER.exception(
+                        "MessageWriter failed to save %d messages, saving them one at a time",
+                        len(self.batch)
+                    )
+                    is_separate = True
+                except DatabaseError:
+                    LOGGER.exception(
+                        "MessageWriter failed to save %d messages, retrying in %.2f seconds",
+                        len(self.batch),
+                        retry_delay
+                    )
+
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+
+            for _ in range(batch_size):
+                self.queue.task_done()
+
+    async def flush(self):
+        """
+        Waits until every queued Message has been inserted.
+        """
+
+        if self.queue is not None:
+            await self.queue.join()
+
+    def flush_sync(self):
+        """
+        Synchronously inserts the Messages that are still queued, including a batch that was being
+        retried.
+        Registered to run at exit, when the event loop is no longer running the writer task.
+        """
+
+        if self.queue is None:
+            return
+
+        batch, self.batch = self.batch, []
+
+        while not self.queue.empty():
+            batch += [self.queue.get_nowait()]
+
+        if not batch:
+            return
+
+        try:
+            try:
+                write_messages(batch)
+            except IntegrityError:
+                write_each_message(batch)
+        except DatabaseError:
+            LOGGER.exception("MessageWriter failed to save %d messages at exit", len(batch))
+
+# The MessageWriter for this process, or None if write-behind is disabled
+MESSAGE_WRITER = None
+
+if getattr(settings, "OB_MESSAGE_WRITE_BEHIND", False):
+    MESSAGE_WRITER = MessageWriter(
+        getattr(settings, "OB_MESSAGE_QUEUE_SIZE", 10000),
+        getattr(settings, "OB_MESSAGE_FLUSH_SIZE", 100),
+        getattr(settings, "OB_MESSAGE_FLUSH_INTERVAL", 0.05)
+    )
+    atexit.register(MESSAGE_WRITER.flush_sync)
+
+async def async_save_message(recipients=None, exclusions=None, **kwargs):
+    """
+    Saves a new Message, either immediately or through the write-behind MessageWriter.
+    Either way, the returned Message has its id and timestamp set and may be broadcast.
+
+    Arguments:
+        recipients (list[OBUser] or None): The only users who will see the message.
+        exclusions (list[OBUser] or None): Users who will not see the message.
+        kwargs: Class variable values to assign to the new Message.
+
+    Return values:
+        Message: The new Message. It is not saved if all of its recipients are ephemeral anonymous
+            users, who are not in the database and cannot read the message history.
+    """
+
+    # Ephemeral anonymous users have no database rows to link to
+    persistent_recipients = get_persistent_users(recipients)
+    exclusions = get_persistent_users(exclusions)
+
+    if recipients and not persistent_recipients:
+        return Message(**kwargs)
+
+    recipients = persistent_recipients
+
+    if MESSAGE_WRITER:
+        return await MESSAGE_WRITER.put(Message(**kwargs), recipients, exclusions)
+
+    return await writer_sync_to_async(save_message)(recipients, exclusions, **kwargs)
+
+async def async_save_messages(batch):
+    """
+    Saves several new Messages in one database hop, or queues them all through the write-behind
+    MessageWriter (see async_save_message()).
+
+    Arguments:
+        batch (list[tuple(dict, list[OBUser] or None, list[OBUser] or None)]): The class variable
+            values of each new Message, with its recipients and exclusions.
+
+    Return values:
+        list[Message]: The new Messages, in the same order. Messages whose recipients are all
+            ephemeral anonymous users are not saved.
+    """
+
+    new_messages = [None] * len(batch)
+    persistent_batch = []
+
+    for i, (kwargs, recipients, exclusions) in enumerate(batch):
+        # Ephemeral anonymous users have no database rows to link to
+        persistent_recipients = get_persistent_users(recipients)
+
+        if recipients and not persistent_recipients:
+            new_messages[i] = Message(**kwargs)
+        else:
+            persistent_batch += [(i, kwargs, persistent_recipients,
+                                  get_persistent_users(exclusions))]
+
+    if MESSAGE_WRITER:
+        for i, kwargs, recipients, exclusions in persistent_batch:
+            new_messages[i] = await MESSAGE_WRITER.put(Message(**kwargs), recipients, exclusions)
+    elif persistent_batch:
+        saved_messages = await writer_sync_to_async(save_messages)(
+            [(kwargs, recipients, exclusions) for _, kwargs, recipients, exclusions
+             in persistent_batch]
+        )
+
+        for (i, _, _, _), new_message in zip(persistent_batch, saved_messages):
+            new_messages[i] = new_message
+
+    return new_messages
+
+async def async_flush_messages():
+    """
+    Waits until every Message queued by the write-behind MessageWriter has been saved.
+    Does nothing if write-behind is disabled.
+    """
+
+    if MESSAGE_WRITER:
+        await MESSAGE_WRITER.flush()
+
+async def async_get_history(query_set):
+    """
+    Gets the saved Messages of a history page with their display timestrings, loading them a chunk
+    at a time (see OB.utilities.database.async_iterate_chunks()) so that a long history is not
+    loaded in one query.
+
+    Arguments:
+        query_set (QuerySet): The Messages of the history, in order of id.
+
+    Return values:
+        list[tuple(Message, string)]: Each Message with the timestring to display it with.
+    """
+
+    history = []
+
+    async for chunk in async_iterate_chunks(query_set):
+        history += [(message, get_datetime_string(message.timestamp)) for message in chunk]
+
+    return history
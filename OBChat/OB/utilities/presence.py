@@ -0,0 +1,540 @@
+"""
+Useful presence functions.
+
+The users in each room are tracked in memory by the process that serves their WebSockets, so
+joining and leaving a room does not write to the database, and /who, /kick, and /elevate do not
+read from it. A user may be in a room with several WebSockets at once, and is only removed when the
+last one leaves.
+
+Clients send a heartbeat every OB_PRESENCE_HEARTBEAT_INTERVAL seconds, and any frame from a client
+counts as one (see heartbeat()). WebSockets that have not sent one for OB_PRESENCE_TIMEOUT seconds
+are swept and kicked, so a WebSocket whose OBConsumer never disconnected does not stay in its room,
+or keep receiving its messages, forever. Sweeps happen at most every OB_PRESENCE_SWEEP_INTERVAL
+seconds, when presence is used (see maybe_sweep()), instead of in a background task.
+
+Presence is tracked per process: each process only knows the users it serves in memory (see
+get_occupants() and is_present()). With several server processes, OB_PRESENCE_TABLE must be enabled
+in the settings, along with a channel layer shared by the processes. Then this process's joins and
+leaves are also written to the Occupancy table in batches every OB_PRESENCE_SYNC_INTERVAL seconds,
+and commands read the users of every process from it (see async_get_occupants() and
+async_get_present_ids()), so that /who, /kick, and /elevate see users served by other processes.
+Each row belongs to the process that wrote it (see PROCESS_ID), which refreshes its rows' last_seen
+with every batch. Rows that have not been refreshed for OB_PRESENCE_TIMEOUT seconds belong to a
+process that stopped abruptly, and are expired by any process instead of being deleted along with
+the live rows of other processes (see reconcile()).
+"""
+
+import asyncio
+import logging
+import time
+
+from datetime import timedelta
+from uuid import uuid4
+
+from channels.db import database_sync_to_async
+
+from django.conf import settings
+from django.db import connection, DatabaseError, transaction
+from django.utils import timezone
+
+from OB.models import Occupancy, OBUser, Room
+from OB.utilities.anonymous import is_ephemeral, release_anon_user
+from OB.utilities.database import bulk_delete, get_chunk
+from OB.utilities.event import send_channel_kick
+
+PRESENCE_TABLE = getattr(settings, "OB_PRESENCE_TABLE", False)
+PRESENCE_SYNC_INTERVAL = getattr(settings, "OB_PRESENCE_SYNC_INTERVAL", 5.0)
+PRESENCE_HEARTBEAT_INTERVAL = getattr(settings, "OB_PRESENCE_HEARTBEAT_INTERVAL", 30.0)
+PRESENCE_TIMEOUT = getattr(settings, "OB_PRESENCE_TIMEOUT", 90.0)
+PRESENCE_SWEEP_INTERVAL = getattr(settings, "OB_PRESENCE_SWEEP_INTERVAL", 10.0)
+
+# Identifies the Occupancy rows written by this process
+PROCESS_ID = uuid4().hex
+
+# The users of this process in each room and the last heartbeat of each of their WebSockets, by
+# room id, user id, and channel name, in the order they joined
+ROOM_PRESENCE = {}
+
+# Joins (the username) and leaves (None) that have not been written to the Occupancy table yet, by
+# room id and user id
+PENDING_CHANGES = {}
+
+# The task that writes pending changes to the Occupancy table, and its event loop
+SYNC_TASK = None
+SYNC_LOOP = None
+
+# When the last sweep happened, in time.monotonic() seconds
+LAST_SWEEP = 0.0
+
+# Kicks of swept WebSockets that are still being sent, so that they are not garbage collected
+KICK_TASKS = set()
+
+LOGGER = logging.getLogger(__name__)
+
+def join(room_id, user, channel_name):
+    """
+    Adds a WebSocket of a user to a room.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user (OBUser): The user joining the room.
+        channel_name (string): The channel name of the WebSocket's OBConsumer.
+
+    Return values:
+        boolean: True if it is the user's first WebSocket in the room.
+    """
+
+    maybe_sweep()
+
+    room_presence = ROOM_PRESENCE.setdefault(room_id, {})
+    presence = room_presence.get(user.id)
+
+    if presence:
+        presence[1][channel_name] = time.monotonic()
+        return False
+
+    room_presence[user.id] = [user, {channel_name: time.monotonic()}]
+    queue_change(room_id, user, True)
+
+    return True
+
+def leave(room_id, user, channel_name):
+    """
+    Removes a WebSocket of a user from a room.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user (OBUser): The user leaving the room.
+        channel_name (string): The channel name of the WebSocket's OBConsumer.
+
+    Return values:
+        boolean: True if it was the user's last WebSocket in the room.
+    """
+
+    room_presence = ROOM_PRESENCE.get(room_id, {})
+    presence = room_presence.get(user.id)
+
+    if not presence or presence[1].pop(channel_name, None) is None or presence[1]:
+        return False
+
+    del room_presence[user.id]
+
+    if not room_presence:
+        ROOM_PRESENCE.pop(room_id, None)
+
+    queue_change(room_id, user, False)
+
+    return True
+
+def heartbeat(room_id, user, channel_name):
+    """
+    Records that a WebSocket of a user is still connected.
+    Adds the WebSocket back to the room if it was swept while its client was only slow.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user (OBUser): The user of the WebSocket.
+        channel_name (string): The channel name of the WebSocket's OBConsumer.
+    """
+
+    presence = ROOM_PRESENCE.get(room_id, {}).get(user.id)
+
+    if presence and channel_name in presence[1]:
+        presence[1][channel_name] = time.monotonic()
+    else:
+        join(room_id, user, channel_name)
+
+def get_occupants(room_id):
+    """
+    Gets the users of this process in a room.
+
+    Arguments:
+        room_id (int): The id of the room.
+
+    Return values:
+        list[OBUser]: The users in the room, in the order they joined.
+    """
+
+    maybe_sweep()
+
+    return [presence[0] for presence in ROOM_PRESENCE.get(room_id, {}).values()]
+
+def is_present(room_id, user):
+    """
+    Determines if a user is in a room.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user (OBUser): The user to look for.
+
+    Return values:
+        boolean: True if the user has a WebSocket in the room.
+    """
+
+    maybe_sweep()
+
+    return user.id in ROOM_PRESENCE.get(room_id, {})
+
+def is_occupied(room_id):
+    """
+    Determines if this process serves anyone in a room, without sweeping, so that it may be called
+    from a database thread.
+
+    Arguments:
+        room_id (int): The id of the room.
+
+    Return values:
+        boolean: True if a user of this process is in the room.
+    """
+
+    return bool(ROOM_PRESENCE.get(room_id))
+
+def get_remote_occupants(room_ids):
+    """
+    Gets the users of other processes in several rooms from the Occupancy table, with one query for
+    the table and one for the saved users.
+    The rows of this process are skipped, since its users are already known in memory.
+
+    Arguments:
+        room_ids (list[int]): The ids of the rooms.
+
+    Return values:
+        dict{int: list[OBUser]}: The users of other processes in each room, by room id, in the order
+            their rows were written. Ephemeral anonymous users are unsaved OBUsers.
+    """
+
+    rows = list(
+        Occupancy.objects.filter(
+            room_id__in=room_ids,
+            last_seen__gte=timezone.now() - timedelta(seconds=PRESENCE_TIMEOUT)
+        ).exclude(
+            process_id=PROCESS_ID
+        ).order_by("id").values_list("room_id", "occupant_id", "username")
+    )
+    saved_users = OBUser.objects.in_bulk(
+        [occupant_id for _, occupant_id, _ in rows if occupant_id > 0]
+    )
+
+    remote_occupants = {room_id: {} for room_id in room_ids}
+
+    for room_id, occupant_id, username in rows:
+        if occupant_id > 0:
+            user = saved_users.get(occupant_id)
+        else:
+            user = OBUser(id=occupant_id, username=username, is_anon=True)
+
+        # A user may be in a room through several processes
+        if user:
+            remote_occupants[room_id].setdefault(occupant_id, user)
+
+    return {room_id: list(users.values()) for room_id, users in remote_occupants.items()}
+
+async def async_get_occupants(room_ids):
+    """
+    Gets the users of every process in several rooms, in at most one database hop.
+    Only reads the Occupancy table if OB_PRESENCE_TABLE is enabled (see get_remote_occupants()).
+
+    Arguments:
+        room_ids (list[int]): The ids of the rooms.
+
+    Return values:
+        dict{int: list[OBUser]}: The users in each room, by room id. This process's users come
+            first, in the order they joined.
+    """
+
+    occupants = {room_id: get_occupants(room_id) for room_id in room_ids}
+
+    if not PRESENCE_TABLE or not room_ids:
+        return occupants
+
+    remote_occupants = await database_sync_to_async(get_remote_occupants)(room_ids)
+
+    for room_id, users in remote_occupants.items():
+        local_ids = {user.id for user in occupants[room_id]}
+        occupants[room_id] += [user for user in users if user.id not in local_ids]
+
+    return occupants
+
+def get_remote_present_ids(room_id, user_ids):
+    """
+    Determines which of several users are in a room through another process, with one query.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user_ids (list[int]): The ids of the users to look for.
+
+    Return values:
+        set{int}: The ids of the users that have a live Occupancy row in the room.
+    """
+
+    return set(
+        Occupancy.objects.filter(
+            room_id=room_id,
+            occupant_id__in=user_ids,
+            last_seen__gte=timezone.now() - timedelta(seconds=PRESENCE_TIMEOUT)
+        ).values_list("occupant_id", flat=True)
+    )
+
+async def async_get_present_ids(room_id, users):
+    """
+    Determines which of several users are in a room through any process, without a database hop if
+    they are all served by this process or OB_PRESENCE_TABLE is disabled.
+
+    Arguments:
+        room_id (int): The id of the room.
+        users (list[OBUser]): The users to look for.
+
+    Return values:
+        set{int}: The ids of the users that are in the room.
+    """
+
+    present_ids = {user.id for user in users if is_present(room_id, user)}
+    missing_ids = [user.id for user in users if user.id not in present_ids]
+
+    if PRESENCE_TABLE and missing_ids:
+        present_ids |= await database_sync_to_async(get_remote_present_ids)(room_id, missing_ids)
+
+    return present_ids
+
+def find_remote_anon_users(usernames):
+    """
+    Finds the ephemeral anonymous users served by other processes in the Occupancy table with one
+    query, so that commands may target them. Always empty if OB_PRESENCE_TABLE is disabled.
+
+    Arguments:
+        usernames (list[string]): The usernames to look up.
+
+    Return values:
+        dict{string: OBUser}: An unsaved OBUser with the user's id and username, by username, for
+            each username that was found.
+    """
+
+    if not PRESENCE_TABLE or not usernames:
+        return {}
+
+    occupants = Occupancy.objects.filter(
+        username__in=usernames,
+        occupant_id__lt=0,
+        last_seen__gte=timezone.now() - timedelta(seconds=PRESENCE_TIMEOUT)
+    ).values_list("username", "occupant_id")
+
+    return {
+        username: OBUser(id=occupant_id, username=username, is_anon=True)
+        for username, occupant_id in occupants
+    }
+
+def sweep(now=None):
+    """
+    Removes the WebSockets that have not sent a heartbeat for PRESENCE_TIMEOUT seconds, and the
+    users left without any WebSockets in their rooms.
+    The OBConsumers of removed WebSockets are kicked, so that they stop receiving the room's
+    messages and their clients refresh (see OB.consumers.OBConsumer.kick()).
+    Ephemeral anonymous users who are no longer in any room are forgotten.
+
+    Arguments:
+        now (float): The current time.monotonic() seconds.
+
+    Return values:
+        int: The number of WebSockets removed.
+    """
+
+    # pylint: disable=global-statement
+    # Justification: The time of the last sweep is shared by every consumer of this process.
+    global LAST_SWEEP
+    # pylint: enable=global-statement
+
+    now = time.monotonic() if now is None else now
+    LAST_SWEEP = now
+    expired_before = now - PRESENCE_TIMEOUT
+    swept_channels = []
+    left_users = []
+
+    for room_id, room_presence in list(ROOM_PRESENCE.items()):
+        for user, heartbeats in list(room_presence.values()):
+            for channel_name, last_heartbeat in list(heartbeats.items()):
+                if last_heartbeat < expired_before:
+                    swept_channels += [channel_name]
+
+                    if leave(room_id, user, channel_name):
+                        left_users += [user]
+
+    for user in left_users:
+        if is_ephemeral(user) and not any(user.id in room_presence
+                                          for room_presence in ROOM_PRESENCE.values()):
+            release_anon_user(user)
+
+    if swept_channels:
+        LOGGER.warning("Presence swept %s WebSocket(s) without a heartbeat.", len(swept_channels))
+        kick_channels(swept_channels)
+
+    return len(swept_channels)
+
+def kick_channels(channel_names):
+    """
+    Kicks the OBConsumers of swept WebSockets in the background.
+    Does nothing if there is no running event loop, like in a database thread.
+
+    Arguments:
+        channel_names (list[string]): The channel names of the OBConsumers.
+    """
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    for channel_name in channel_names:
+        task = asyncio.ensure_future(send_channel_kick(channel_name))
+        KICK_TASKS.add(task)
+        task.add_done_callback(KICK_TASKS.discard)
+
+def maybe_sweep():
+    """
+    Sweeps if the last sweep was more than PRESENCE_SWEEP_INTERVAL seconds ago (see sweep()).
+    """
+
+    now = time.monotonic()
+
+    if now - LAST_SWEEP >= PRESENCE_SWEEP_INTERVAL:
+        sweep(now)
+
+def queue_change(room_id, user, is_join):
+    """
+    Queues a join or leave to be written to the Occupancy table, if OB_PRESENCE_TABLE is enabled.
+    A join and a leave of the same user cancel each other out.
+
+    Arguments:
+        room_id (int): The id of the room.
+        user (OBUser): The user joining or leaving.
+        is_join (bool): True for a join and False for a leave.
+    """
+
+    # pylint: disable=global-statement
+    # Justification: The sync task is shared by every consumer of this process.
+    global SYNC_TASK, SYNC_LOOP
+    # pylint: enable=global-statement
+
+    if not PRESENCE_TABLE:
+        return
+
+    key = (room_id, user.id)
+
+    if key in PENDING_CHANGES and (PENDING_CHANGES[key] is None) == is_join:
+        del PENDING_CHANGES[key]
+    else:
+        PENDING_CHANGES[key] = user.username if is_join else None
+
+    loop = asyncio.get_event_loop()
+
+    if SYNC_LOOP is not loop or SYNC_TASK is None or SYNC_TASK.done():
+        SYNC_LOOP = loop
+        SYNC_TASK = asyncio.ensure_future(run_sync())
+
+def write_changes(changes):
+    """
+    Writes this process's joins and leaves to the Occupancy table, refreshes the last_seen of its
+    rows, and expires the rows of processes that stopped, all in one transaction.
+
+    Arguments:
+        changes (dict{tuple(int, int): string or None}): Joins (the username) and leaves (None) by
+            room id and user id.
+    """
+
+    now = timezone.now()
+    joins = [
+        Occupancy(
+            room_id=room_id,
+            occupant_id=user_id,
+            username=username,
+            process_id=PROCESS_ID,
+            last_seen=now
+        )
+        for (room_id, user_id), username in changes.items() if username is not None
+    ]
+    leaves = [key for key, username in changes.items() if username is None]
+
+    with transaction.atomic():
+        if joins:
+            Occupancy.objects.bulk_create(joins, ignore_conflicts=True)
+
+        for room_id in {room_id for room_id, _ in leaves}:
+            Occupancy.objects.filter(
+                process_id=PROCESS_ID,
+                room_id=room_id,
+                occupant_id__in=[user_id for leave_room_id, user_id in leaves
+                                 if leave_room_id == room_id]
+            ).delete()
+
+        Occupancy.objects.filter(process_id=PROCESS_ID).update(last_seen=now)
+        expire_rows(now)
+
+def expire_rows(now=None):
+    """
+    Deletes the Occupancy rows that have not been refreshed for PRESENCE_TIMEOUT seconds, which
+    belong to processes that stopped without removing them.
+
+    Arguments:
+        now (datetime): The current time.
+    """
+
+    now = now or timezone.now()
+    Occupancy.objects.filter(last_seen__lt=now - timedelta(seconds=PRESENCE_TIMEOUT)).delete()
+
+async def async_sync_table():
+    """
+    Writes every pending join and leave to the Occupancy table and refreshes this process's rows in
+    one database hop.
+    """
+
+    changes = dict(PENDING_CHANGES)
+    PENDING_CHANGES.clear()
+
+    try:
+        await database_sync_to_async(write_changes)(changes)
+    except DatabaseError:
+        LOGGER.exception("Presence failed to update the Occupancy table.")
+
+        # Try again next time, unless newer changes replaced them
+        for key, username in changes.items():
+            PENDING_CHANGES.setdefault(key, username)
+
+async def run_sync():
+    """
+    Writes pending joins and leaves to the Occupancy table and refreshes this process's rows every
+    OB_PRESENCE_SYNC_INTERVAL seconds, for as long as this process has occupants or pending
+    changes.
+    """
+
+    while PENDING_CHANGES or ROOM_PRESENCE:
+        await asyncio.sleep(PRESENCE_SYNC_INTERVAL)
+        await async_sync_table()
+
+def reconcile():
+    """
+    Removes the Occupancy rows and anonymous OBUsers left in the database by a server that stopped
+    without disconnecting its OBConsumers.
+    Only rows that have not been refreshed for PRESENCE_TIMEOUT seconds are removed, so the live
+    rows of other processes are kept, along with the anonymous OBUsers that they refer to. The
+    anonymous OBUsers are removed a chunk at a time. The Room.occupants rows written before
+    presence was tracked in memory are no longer read, so they are all removed. Does nothing if the
+    tables do not exist yet, like before the first migration.
+    Called once when the Django app starts (see OB.apps).
+    """
+
+    if Occupancy._meta.db_table not in connection.introspection.table_names():
+        return
+
+    try:
+        expire_rows()
+        Room.occupants.through.objects.all().delete()
+
+        stray_anon_users = OBUser.objects.filter(is_anon=True).exclude(
+            id__in=Occupancy.objects.values("occupant_id")
+        )
+        anon_users = get_chunk(stray_anon_users)
+
+        while anon_users:
+            bulk_delete(anon_users)
+            anon_users = get_chunk(stray_anon_users, anon_users[-1].id)
+    except DatabaseError:
+        LOGGER.exception("Presence could not reconcile the database.")
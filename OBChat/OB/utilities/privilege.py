@@ -0,0 +1,426 @@
+"""
+Useful privilege functions.
+
+The privilege of every user in a room is determined by a PrivilegeTable of the room's owner, Admins,
+and active Bans, which is loaded once and cached in this process, so that privilege checks are
+dictionary lookups instead of database queries.
+
+Saving or deleting an Admin, Ban, or Room invalidates the room's table in this process and, once
+the transaction commits, sends an "invalidate_privileges" event to the room's group so that every
+process serving the room invalidates it too (see OB.utilities.event.send_invalidate_privileges()).
+Bulk queries do not send signals, so commands that create or update Admins or Bans in bulk send the
+event themselves. A process that serves no one in a room does not receive the event, so a room's
+table is also reloaded when the first user of the process joins it (see
+OB.utilities.context.join_room()).
+"""
+
+import threading
+
+from asgiref.sync import async_to_sync, SyncToAsync
+from channels.db import database_sync_to_async
+from channels.exceptions import InvalidChannelLayerError
+from channels.layers import get_channel_layer
+
+from django.db import transaction
+
+from OB.constants import Privilege
+from OB.models import Admin, Ban, OBUser, Room
+from OB.utilities.anonymous import get_anon_user
+
+# The cached table of each room, by room id
+PRIVILEGE_TABLES = {}
+
+# Incremented every time a room's table is invalidated, by room id
+PRIVILEGE_VERSIONS = {}
+
+# The token of the last "invalidate_privileges" event applied to each room's table, by room id
+APPLIED_TOKENS = {}
+
+# The token of the last invalidation queued for each room by each thread's transaction
+QUEUED_TOKENS = threading.local()
+
+class PrivilegeTable:
+    """
+    A versioned snapshot of the owner, Admins, and active Bans of a room.
+    """
+
+    __slots__ = ("room_id", "owner_id", "admins", "banned_ids", "version")
+
+    def __init__(self, room_id, owner_id, admins, banned_ids, version=0):
+        """
+        Arguments:
+            room_id (int): The id of the room.
+            owner_id (int or None): The id of the room's owner.
+            admins (dict{int: bool}): Whether each Admin of the room is limited, by user id.
+            banned_ids (set{int}): The ids of the users with an active Ban from the room.
+            version (int): The version of the room's table when it was loaded.
+        """
+
+        self.room_id = room_id
+        self.owner_id = owner_id
+        self.admins = admins
+        self.banned_ids = banned_ids
+        self.version = version
+
+    def get(self, user):
+        """
+        Determines the highest privilege level of a user for the room.
+
+        Arguments:
+            user (OBUser): The OBUser to find the privilege of.
+
+        Return values:
+            Privilege: The Privilege of the user for the room.
+        """
+
+        if user.id is not None and user.id == self.owner_id:
+            return Privilege.Owner
+
+        # Anonymous users cannot be hired
+        if user.is_anon:
+            return Privilege.User
+
+        is_limited = self.admins.get(user.id)
+
+        if is_limited is not None:
+            return Privilege.Admin if is_limited else Privilege.UnlimitedAdmin
+
+        if user.is_authenticated:
+            return Privilege.AuthUser
+
+        return Privilege.User
+
+    def is_banned(self, user):
+        """
+        Determines if a user has an active Ban from the room.
+
+        Arguments:
+            user (OBUser): The OBUser to look for.
+
+        Return values:
+            boolean: True if the user is banned.
+        """
+
+        return user.id in self.banned_ids
+
+class CommandTarget:
+    """
+    A target of a command and everything commands check about it in the room.
+    """
+
+    __slots__ = ("username", "user", "privilege", "admin", "ban")
+
+    def __init__(self, username, user=None, privilege=Privilege.Invalid, admin=None, ban=None):
+        """
+        Arguments:
+            username (string): The username given as an argument of the command.
+            user (OBUser or None): The user with the username, or None if there is none.
+            privilege (Privilege): The privilege of the user in the room.
+            admin (Admin or None): The user's adminship in the room, if they have one.
+            ban (Ban or None): The user's active Ban from the room, if they have one. Its issuer is
+                already loaded.
+        """
+
+        self.username = username
+        self.user = user
+        self.privilege = privilege
+        self.admin = admin
+        self.ban = ban
+
+def load_privilege_table(room, version=0):
+    """
+    Loads the owner, Admins, and active Bans of a room from the database.
+
+    Arguments:
+        room (Room): The database object of the room.
+        version (int): The version of the new table.
+
+    Return values:
+        PrivilegeTable: The new table.
+    """
+
+    admins = dict(Admin.objects.filter(room_id=room.id).values_list("user_id", "is_limited"))
+    banned_ids = set(
+        Ban.objects.filter(room_id=room.id, is_lifted=False).values_list("user_id", flat=True)
+    )
+
+    return PrivilegeTable(room.id, room.owner_id, admins, banned_ids, version)
+
+def get_privilege_table(room):
+    """
+    Gets the cached table of a room, loading it if it is not cached.
+    A table that was invalidated while it was loading is returned but not cached.
+
+    Arguments:
+        room (Room): The database object of the room.
+
+    Return values:
+        PrivilegeTable: The table of the room.
+    """
+
+    table = PRIVILEGE_TABLES.get(room.id)
+
+    if table:
+        return table
+
+    version = PRIVILEGE_VERSIONS.get(room.id, 0)
+    table = load_privilege_table(room, version)
+
+    if PRIVILEGE_VERSIONS.get(room.id, 0) == version:
+        PRIVILEGE_TABLES[room.id] = table
+
+    return table
+
+async def async_get_privilege_table(room):
+    """
+    Allows an asynchronous function to get the table of a room, without a database hop if it is
+    cached (see get_privilege_table()).
+
+    Arguments:
+        room (Room): The database object of the room.
+
+    Return values:
+        PrivilegeTable: The table of the room.
+    """
+
+    return PRIVILEGE_TABLES.get(room.id) or await database_sync_to_async(get_privilege_table)(room)
+
+def get_privilege_tables(rooms):
+    """
+    Gets the cached tables of several rooms, loading the ones that are not cached with two queries
+    in total.
+
+    Arguments:
+        rooms (list[Room]): The database objects of the rooms.
+
+    Return values:
+        dict{int: PrivilegeTable}: The table of each room, by room id.
+    """
+
+    tables = {room.id: PRIVILEGE_TABLES.get(room.id) for room in rooms}
+    missing_rooms = [room for room in rooms if not tables[room.id]]
+
+    if not missing_rooms:
+        return tables
+
+    versions = {room.id: PRIVILEGE_VERSIONS.get(room.id, 0) for room in missing_rooms}
+    admins = {room.id: {} for room in missing_rooms}
+    banned_ids = {room.id: set() for room in missing_rooms}
+
+    for room_id, user_id, is_limited in Admin.objects.filter(
+        room_id__in=versions
+    ).values_list("room_id", "user_id", "is_limited"):
+        admins[room_id][user_id] = is_limited
+
+    for room_id, user_id in Ban.objects.filter(
+        room_id__in=versions,
+        is_lifted=False
+    ).values_list("room_id", "user_id"):
+        banned_ids[room_id].add(user_id)
+
+    for room in missing_rooms:
+        table = PrivilegeTable(
+            room.id,
+            room.owner_id,
+            admins[room.id],
+            banned_ids[room.id],
+            versions[room.id]
+        )
+
+        if PRIVILEGE_VERSIONS.get(room.id, 0) == versions[room.id]:
+            PRIVILEGE_TABLES[room.id] = table
+
+        tables[room.id] = table
+
+    return tables
+
+async def async_get_privilege_tables(rooms):
+    """
+    Allows an asynchronous function to get the tables of several rooms, without a database hop if
+    they are all cached (see get_privilege_tables()).
+
+    Arguments:
+        rooms (list[Room]): The database objects of the rooms.
+
+    Return values:
+        dict{int: PrivilegeTable}: The table of each room, by room id.
+    """
+
+    tables = {room.id: PRIVILEGE_TABLES.get(room.id) for room in rooms}
+
+    if all(tables.values()):
+        return tables
+
+    return await database_sync_to_async(get_privilege_tables)(rooms)
+
+def resolve_targets(usernames, room, include_anon=False):
+    """
+    Resolves the users, privileges, adminships, and active Bans of the targets of a command with a
+    constant number of queries, however many targets there are.
+
+    Arguments:
+        usernames (list[string]): The usernames given as arguments of the command.
+        room (Room): The database object of the room the command was sent from.
+        include_anon (bool): Whether to look up ephemeral anonymous users for usernames that are not
+            in the database, in this process and then in the Occupancy table (see
+            OB.utilities.anonymous and OB.utilities.presence).
+
+    Return values:
+        list[CommandTarget]: The target of each username, in the same order.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    # Justification: OB.utilities.presence imports OB.utilities.event, which imports this module.
+    from OB.utilities.presence import find_remote_anon_users
+    # pylint: enable=import-outside-toplevel
+
+    users = {user.username: user for user in OBUser.objects.filter(username__in=usernames)}
+    user_ids = [user.id for user in users.values()]
+    admins = {
+        admin.user_id: admin
+        for admin in Admin.objects.filter(room_id=room.id, user_id__in=user_ids)
+    }
+    bans = {
+        ban.user_id: ban
+        for ban in Ban.objects.select_related("issuer").filter(
+            room_id=room.id,
+            user_id__in=user_ids,
+            is_lifted=False
+        )
+    }
+    privileges = get_privilege_table(room)
+
+    if include_anon:
+        # Users of this process first, then the rest in one query
+        for username in usernames:
+            anon_user = None if username in users else get_anon_user(username)
+
+            if anon_user:
+                users[username] = anon_user
+
+        users.update(find_remote_anon_users(
+            [username for username in usernames if username not in users]
+        ))
+
+    targets = []
+
+    for username in usernames:
+        user = users.get(username)
+
+        if not user:
+            targets += [CommandTarget(username)]
+            continue
+
+        targets += [CommandTarget(
+            username,
+            user,
+            privileges.get(user),
+            admins.get(user.id),
+            bans.get(user.id)
+        )]
+
+    return targets
+
+@database_sync_to_async
+def async_resolve_targets(usernames, room, include_anon=False):
+    """
+    Allows an asynchronous function to resolve the targets of a command in one database hop (see
+    resolve_targets()).
+
+    Arguments:
+        usernames (list[string]): The usernames given as arguments of the command.
+        room (Room): The database object of the room the command was sent from.
+        include_anon (bool): Whether to look up ephemeral anonymous users for usernames that are not
+            in the database.
+
+    Return values:
+        list[CommandTarget]: The target of each username, in the same order.
+    """
+
+    return resolve_targets(usernames, room, include_anon)
+
+def invalidate_privilege_table(room_id, token=None):
+    """
+    Removes the table of a room from this process's cache.
+
+    Arguments:
+        room_id (int): The id of the room.
+        token (string or None): The token of the "invalidate_privileges" event being applied. Every
+            OBConsumer of the room receives the event, but the table is only invalidated once for
+            each token.
+    """
+
+    if token is not None:
+        if APPLIED_TOKENS.get(room_id) == token:
+            return
+
+        APPLIED_TOKENS[room_id] = token
+
+    PRIVILEGE_VERSIONS[room_id] = PRIVILEGE_VERSIONS.get(room_id, 0) + 1
+    PRIVILEGE_TABLES.pop(room_id, None)
+
+def broadcast_invalidation(room_id, token):
+    """
+    Invalidates the table of a room in every process serving the room, if this is the last
+    invalidation of the room queued by this thread's transaction.
+    Does not send the event from a thread without an event loop, like a management command's, or
+    without a channel layer, since no OBConsumer of this process can be serving the room then.
+    Called when the transaction commits (see invalidate_on_change()).
+
+    Arguments:
+        room_id (int): The id of the room.
+        token (object): The token of the queued invalidation.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    # Justification: OB.utilities.event imports this module.
+    from OB.utilities.event import send_invalidate_privileges
+    # pylint: enable=import-outside-toplevel
+
+    # Deleting a room's Admins or Bans sends a signal for each one, but one event is enough
+    if getattr(QUEUED_TOKENS, "tokens", {}).get(room_id) != token:
+        return
+
+    del QUEUED_TOKENS.tokens[room_id]
+
+    # Database threads of coroutines know the event loop of their coroutine
+    if getattr(SyncToAsync.threadlocal, "main_event_loop", None) is None:
+        return
+
+    try:
+        if get_channel_layer() is None:
+            return
+    except InvalidChannelLayerError:
+        return
+
+    async_to_sync(send_invalidate_privileges)(room_id)
+
+def invalidate_on_change(sender, instance, **kwargs):
+    """
+    Invalidates the table of the room of a saved or deleted Admin, Ban, or Room in this process
+    right away, and in every process serving the room when the transaction commits, so that a table
+    loaded from before the commit is not cached.
+    Connected to the post_save and post_delete signals in OB.apps.
+
+    Arguments:
+        sender (Class): The model class of the database object.
+        instance (obj): The saved or deleted database object.
+        kwargs: The other arguments of the signal.
+    """
+
+    # pylint: disable=unused-argument
+    # Justification: Signal receivers must accept the sender and any other arguments.
+    room_id = instance.id if sender is Room else instance.room_id
+
+    if room_id is None:
+        return
+
+    invalidate_privilege_table(room_id)
+
+    if not hasattr(QUEUED_TOKENS, "tokens"):
+        QUEUED_TOKENS.tokens = {}
+
+    token = object()
+    QUEUED_TOKENS.tokens[room_id] = token
+    transaction.on_commit(lambda: broadcast_invalidation(room_id, token))
+    # pylint: enable=unused-argument
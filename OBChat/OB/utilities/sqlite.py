@@ -0,0 +1,120 @@
+"""
+Useful SQLite tuning functions.
+
+If OB_SQLITE_PROFILE is "production" in the settings:
+    - Every new SQLite connection is configured with PRODUCTION_PRAGMAS. WAL journaling lets readers
+      read while a write is in progress, and busy_timeout makes a connection wait for the write lock
+      instead of failing with "database is locked".
+    - Message writes, which are most of the writes, are made by one writer thread with its own
+      connection (see writer_sync_to_async()), so concurrent Message writes queue up in the process
+      instead of contending for SQLite's single write lock. Other writes are made from the database
+      threads of database_sync_to_async and wait for the write lock with busy_timeout.
+Persistent connections (CONN_MAX_AGE in the database settings) avoid applying the pragmas for every
+database hop.
+"""
+
+import asyncio
+import contextvars
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.db import database_sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+
+PROFILE = getattr(settings, "OB_SQLITE_PROFILE", None)
+
+PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY"
+}
+
+# The thread that makes the writes of writer_sync_to_async()
+WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="OBSQLiteWriter")
+
+def is_production():
+    """
+    Determines if the production profile is enabled.
+
+    Return values:
+        boolean: True if OB_SQLITE_PROFILE is "production".
+    """
+
+    return PROFILE == "production"
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Configures a new SQLite connection with PRODUCTION_PRAGMAS if the production profile is
+    enabled.
+    Connected to the connection_created signal in OB.apps.
+
+    Arguments:
+        sender (Class): The database wrapper class.
+        connection (DatabaseWrapper): The new connection.
+        kwargs: The other arguments of the signal.
+    """
+
+    # pylint: disable=unused-argument
+    # Justification: Signal receivers must accept the sender and any other arguments.
+    if not is_production() or connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in PRODUCTION_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    # pylint: enable=unused-argument
+
+def run_in_writer(function, *args, **kwargs):
+    """
+    Calls a synchronous function in the writer thread, cleaning up its connection like
+    database_sync_to_async does.
+
+    Arguments:
+        function (function): The function to call.
+        args: The positional arguments of the function.
+        kwargs: The keyword arguments of the function.
+
+    Return values:
+        The return value of the function.
+    """
+
+    close_old_connections()
+
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+def writer_sync_to_async(function):
+    """
+    Makes a synchronous function that writes to the database awaitable, like
+    database_sync_to_async, but calls it in the writer thread if the production profile is enabled.
+    The function runs in a copy of the caller's context, so it sees the caller's context variables
+    like it would with database_sync_to_async.
+
+    Arguments:
+        function (function): The synchronous function.
+
+    Return values:
+        function: The coroutine function.
+    """
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        if not is_production():
+            return await database_sync_to_async(function)(*args, **kwargs)
+
+        context = contextvars.copy_context()
+
+        return await asyncio.get_event_loop().run_in_executor(
+            WRITER,
+            functools.partial(context.run, run_in_writer, function, *args, **kwargs)
+        )
+
+    return wrapper
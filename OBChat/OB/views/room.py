@@ -8,6 +8,8 @@ https://docs.djangoproject.com/en/3.0/topics/http/views/
 
 import json
 
+from asgiref.sync import async_to_sync
+
 from django.db.models import Q
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
@@ -17,7 +19,8 @@ from django.utils.safestring import mark_safe
 from OB.constants import GroupTypes
 from OB.models import Ban, Message, OBUser, Room
 from OB.utilities.database import try_get
-from OB.utilities.format import get_datetime_string
+from OB.utilities.persistence import async_get_history
+from OB.utilities.presence import PRESENCE_HEARTBEAT_INTERVAL
 
 def chat(request):
     """
@@ -138,15 +141,14 @@ def room(request, room_name):
                 message_query = Q(recipients=None)
                 if request.user.is_authenticated:
                     message_query |= Q(recipients=(request.user))
-                messages = Message.objects.filter(message_query)
-
-                for message in messages:
-                    messages_timestrings += [(message, get_datetime_string(message.timestamp))]
+                messages = Message.objects.filter(message_query, room=room_object)
+                messages_timestrings = async_to_sync(async_get_history)(messages)
 
             template = "OB/room.html"
             context = {
                 "room": room_object,
                 "websocket_url_json": websocket_url_json,
+                "heartbeat_interval": PRESENCE_HEARTBEAT_INTERVAL,
                 "messages": messages_timestrings,
                 "ban": ban
             }
@@ -8,6 +8,8 @@ https://docs.djangoproject.com/en/3.0/topics/http/views/
 
 import json
 
+from asgiref.sync import async_to_sync
+
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.utils.safestring import mark_safe
@@ -15,7 +17,9 @@ from django.utils.safestring import mark_safe
 from OB.constants import GroupTypes
 from OB.models import Message, OBUser, Room
 from OB.utilities.database import try_get
-from OB.utilities.format import get_datetime_string, get_group_name
+from OB.utilities.format import get_group_name
+from OB.utilities.persistence import async_get_history
+from OB.utilities.presence import PRESENCE_HEARTBEAT_INTERVAL
 
 def user(request, username):
     """
@@ -125,13 +129,13 @@ def private(request, username):
             # Get the messages
             websocket_url_json = mark_safe(json.dumps(f"ws://{{0}}/OB/private/{username}/"))
             messages = Message.objects.filter(room=room)
-            messages_timestrings = [(message, get_datetime_string(message.timestamp))\
-                                    for message in messages]
+            messages_timestrings = async_to_sync(async_get_history)(messages)
 
             template = "OB/room.html"
             context = {
                 "room_name": room.name,
                 "websocket_url_json": websocket_url_json,
+                "heartbeat_interval": PRESENCE_HEARTBEAT_INTERVAL,
                 "messages": messages_timestrings
             }
 
@@ -1,8 +1,13 @@
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 
+from OB.commands.owner_level.delete import finish_deletions
 from OB.routing import URL_PATTERNS
 
+# Delete the rooms that were left suspended when the server stopped (see
+# OB.commands.owner_level.delete)
+finish_deletions()
+
 APPLICATION = ProtocolTypeRouter({
     # (http->django views is added by default)
     "websocket": AuthMiddlewareStack(
@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'OB.middleware.CurrentUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,6 +82,8 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['OB.routers.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -137,4 +140,104 @@ ASGI_APPLICATION = 'OBChat.routing.APPLICATION'
 
 LOGIN_URL = 'OB-log_in'
 
-AUTH_USER_MODEL = 'OB.OBUser'
\ No newline at end of file
+AUTH_USER_MODEL = 'OB.OBUser'
+
+# OB message persistence
+# See OB.utilities.persistence for more information.
+
+# Broadcast messages immediately and save them in batches in the background
+OB_MESSAGE_WRITE_BEHIND = False
+
+# The most messages that may wait to be saved before new messages wait for room in the queue
+OB_MESSAGE_QUEUE_SIZE = 10000
+
+# The most messages to save in one batch
+OB_MESSAGE_FLUSH_SIZE = 100
+
+# The most seconds to wait for a batch to fill before saving it
+OB_MESSAGE_FLUSH_INTERVAL = 0.05
+
+
+# OB WebSocket encoding
+# See OB.utilities.encoding for more information.
+
+# The JSON encoder for WebSocket frames: "json", "orjson", "ujson", or the dotted path of a function
+# Falls back to "json" if the chosen encoder is not installed
+OB_JSON_ENCODER = "orjson"
+
+# Allow clients to choose the MessagePack binary protocol when they connect
+# Requires the msgpack package
+# Every message is also encoded with MessagePack when enabled, so only enable it if clients use it
+OB_BINARY_PROTOCOL = False
+
+
+# OB outbound queues
+# See OB.utilities.outbound for more information.
+
+# The most frames that may wait to be sent to one client, or 0 to send frames directly
+OB_OUTBOUND_QUEUE_SIZE = 256
+
+# What to do when a client's queue is full: "DropOldest", "Coalesce", or "Disconnect"
+OB_OUTBOUND_OVERFLOW_POLICY = "Disconnect"
+
+# The most frames the "Coalesce" policy may hold for one client before disconnecting it
+OB_OUTBOUND_MAX_COALESCED_FRAMES = 1024
+
+# The most seconds to wait for queued frames to be sent before closing a WebSocket
+OB_OUTBOUND_CLOSE_TIMEOUT = 1.0
+
+# Seconds to collect frames for a client before sending them as one batch frame, or 0 to send each
+# frame as soon as possible (e.g. 0.015 for bursty rooms)
+# Requires OB_OUTBOUND_QUEUE_SIZE to be greater than 0
+OB_FRAME_COALESCING_WINDOW = 0
+
+
+# OB database iteration
+# See OB.utilities.database for more information.
+
+# The number of database objects to load or delete at once from a large QuerySet
+OB_ITERATION_CHUNK_SIZE = 500
+
+
+# OB SQLite tuning
+# See OB.utilities.sqlite for more information.
+
+# "production" to use WAL journaling and the other pragmas in OB.utilities.sqlite on every new
+# SQLite connection and to make message writes through one writer connection, or None for SQLite's
+# defaults
+# Other writes still wait for SQLite's write lock from their own connections
+# Set CONN_MAX_AGE in DATABASES with it so that connections and their pragmas are reused
+OB_SQLITE_PROFILE = None
+
+
+# OB database routing
+# See OB.routers for more information.
+
+# The alias in DATABASES of a read replica for the room list and room history, or None to read
+# everything from "default"
+OB_READ_DATABASE = None
+
+# Seconds after a user writes during which their reads are sent to "default" instead of the replica
+OB_READ_STICKINESS = 5.0
+
+# OB presence
+# See OB.utilities.presence for more information.
+
+# Whether to also write each process's room occupants to the Occupancy table in the background and
+# read every process's occupants from it for /who, /kick, and /elevate
+# Must be enabled when running more than one server process
+OB_PRESENCE_TABLE = False
+
+# Seconds between background writes of joins and leaves to the Occupancy table
+# Must be less than OB_PRESENCE_TIMEOUT, or the rows of running processes expire
+OB_PRESENCE_SYNC_INTERVAL = 5.0
+
+# Seconds between heartbeats from each client's WebSocket
+OB_PRESENCE_HEARTBEAT_INTERVAL = 30.0
+
+# Seconds without a heartbeat after which a WebSocket is removed from its room's occupants and
+# kicked, and after which the Occupancy rows of a stopped process expire
+OB_PRESENCE_TIMEOUT = 90.0
+
+# Least seconds between sweeps for WebSockets without a heartbeat
+OB_PRESENCE_SWEEP_INTERVAL = 10.0
@@ -0,0 +1,3 @@
+"""
+Benchmarks for OBChat. Each module is a script that is run from the OBChat directory.
+"""
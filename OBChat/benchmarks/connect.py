@@ -0,0 +1,139 @@
+"""
+Benchmarks the database work of connecting OBConsumers to a room, as in a reconnect storm.
+
+Compares joining a room in one database hop (see OB.utilities.context.join_room()) with loading the
+context, checking for a ban, and adding the occupant in one hop each, as OBConsumer.connect() used
+to. Each round connects many users at once and reports the p50 and p99 latency of a connect.
+
+The benchmark runs in a temporary test database, but Django's startup still reads the configured
+database, so migrate it first. Run from the OBChat directory:
+    python manage.py migrate
+    python -m benchmarks.connect
+"""
+
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "OBChat.settings")
+django.setup()
+
+# pylint: disable=wrong-import-position
+# Justification: Django must be set up before importing anything that imports models.
+from django.test.utils import setup_databases, teardown_databases
+
+from OB.constants import GroupTypes
+from OB.models import Ban, OBUser, Room
+from OB.utilities.context import async_join_room, async_load_context
+from OB.utilities.database import async_add, async_filter
+# pylint: enable=wrong-import-position
+
+CONCURRENCIES = [1, 10, 100]
+ROUNDS = 20
+ROOM_NAME = "benchmark"
+
+async def join_per_step(user):
+    """
+    Joins the room with one database hop per step.
+
+    Arguments:
+        user (OBUser): The user joining the room.
+    """
+
+    context = await async_load_context(user, group_type=GroupTypes.Room, name=ROOM_NAME)
+
+    if not await async_filter(Ban, user=user, room=context.room, is_lifted=False):
+        await async_add(context.room.occupants, user)
+
+async def join_one_hop(user):
+    """
+    Joins the room with one database hop.
+
+    Arguments:
+        user (OBUser): The user joining the room.
+    """
+
+    await async_join_room(user, GroupTypes.Room, ROOM_NAME)
+
+async def timed(strategy, user):
+    """
+    Measures the latency of one connect.
+
+    Arguments:
+        strategy (function): join_per_step() or join_one_hop().
+        user (OBUser): The user joining the room.
+
+    Return values:
+        float: The latency in milliseconds.
+    """
+
+    start = time.perf_counter()
+    await strategy(user)
+    return (time.perf_counter() - start) * 1000
+
+async def connect_all(strategy, users):
+    """
+    Connects the users all at once.
+
+    Arguments:
+        strategy (function): join_per_step() or join_one_hop().
+        users (list[OBUser]): The users joining the room.
+
+    Return values:
+        list[float]: The latency of each connect in milliseconds.
+    """
+
+    return await asyncio.gather(*[timed(strategy, user) for user in users])
+
+def measure(strategy, users, room):
+    """
+    Connects the users all at once, ROUNDS times.
+
+    Arguments:
+        strategy (function): join_per_step() or join_one_hop().
+        users (list[OBUser]): The users joining the room at once.
+        room (Room): The room, whose occupants are cleared between rounds.
+
+    Return values:
+        tuple(float, float): The p50 and p99 latencies in milliseconds.
+    """
+
+    latencies = []
+
+    for _ in range(ROUNDS):
+        room.occupants.clear()
+        latencies += asyncio.run(connect_all(strategy, users))
+
+    latencies.sort()
+
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def main():
+    """
+    Prints the p50 and p99 connect latency of each strategy for each number of simultaneous
+    connects.
+    """
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+
+    try:
+        owner = OBUser.objects.create(username="benchmark_owner")
+        room = Room.objects.create(name=ROOM_NAME, owner=owner)
+        users = [
+            OBUser.objects.create(username=f"benchmark_user_{i}")
+            for i in range(max(CONCURRENCIES))
+        ]
+
+        print(f"{'strategy':<9} {'connects':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+
+        for name, strategy in [("per step", join_per_step), ("one hop", join_one_hop)]:
+            for concurrency in CONCURRENCIES:
+                p50, p99 = measure(strategy, users[:concurrency], room)
+                print(f"{name:<9} {concurrency:>8} {p50:>9.2f} {p99:>9.2f}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmarks the CPU cost of broadcasting one message to a room of consumers.
+
+Compares encoding the message once into an envelope (see OB.utilities.encoding.encode_message())
+with encoding it once per consumer, for each installed JSON encoder.
+
+Run from the OBChat directory:
+    python -m benchmarks.fan_out
+"""
+
+import os
+import time
+
+from datetime import datetime
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "OBChat.settings")
+
+# pylint: disable=wrong-import-position
+# Justification: The settings module must be set before importing anything that reads settings.
+from OB.utilities.encoding import get_json_encoder
+from OB.utilities.format import get_datetime_string
+# pylint: enable=wrong-import-position
+
+ROOM_SIZES = [1, 10, 100, 1000]
+ENCODERS = ["json", "orjson", "ujson"]
+MESSAGES = 200
+
+def make_message():
+    """
+    Makes the data of a typical chat message.
+
+    Return values:
+        dict: The message data that is encoded for the client.
+    """
+
+    return {
+        "text": "The quick brown fox jumps over the lazy dog. " * 2,
+        "sender_name": "OB-Sys",
+        "has_recipients": False,
+        "has_exclusions": False,
+        "timestamp": get_datetime_string(datetime.now())
+    }
+
+def send(frame):
+    """
+    Stands in for writing a frame to a consumer's WebSocket.
+
+    Arguments:
+        frame (string): The frame to write.
+    """
+
+    return len(frame)
+
+def encode_per_consumer(encode, message, room_size):
+    """
+    Sends the message data to every consumer, which each encode it.
+
+    Arguments:
+        encode (function): The JSON encoder.
+        message (dict): The message data.
+        room_size (int): The number of consumers in the room.
+    """
+
+    for _ in range(room_size):
+        send(encode(message))
+
+def encode_once(encode, message, room_size):
+    """
+    Encodes the message data once and sends the envelope to every consumer as-is.
+
+    Arguments:
+        encode (function): The JSON encoder.
+        message (dict): The message data.
+        room_size (int): The number of consumers in the room.
+    """
+
+    envelope = encode(message)
+
+    for _ in range(room_size):
+        send(envelope)
+
+def measure(strategy, encode, room_size):
+    """
+    Measures the CPU time of broadcasting one message.
+
+    Arguments:
+        strategy (function): encode_per_consumer() or encode_once().
+        encode (function): The JSON encoder.
+        room_size (int): The number of consumers in the room.
+
+    Return values:
+        float: The average CPU time per message in microseconds.
+    """
+
+    message = make_message()
+    start = time.process_time()
+
+    for _ in range(MESSAGES):
+        strategy(encode, message, room_size)
+
+    return (time.process_time() - start) / MESSAGES * 1e6
+
+def main():
+    """
+    Prints the CPU time per message for each encoder, strategy, and room size.
+    """
+
+    print(f"{'encoder':<8} {'room size':>10} {'per consumer (us)':>18} {'encode once (us)':>17}")
+
+    for name in ENCODERS:
+        encode = get_json_encoder(name)
+
+        # get_json_encoder() falls back to json if the encoder is not installed
+        if name != "json" and encode is get_json_encoder("json"):
+            print(f"{name:<8} not installed")
+            continue
+
+        for room_size in ROOM_SIZES:
+            per_consumer = measure(encode_per_consumer, encode, room_size)
+            once = measure(encode_once, encode, room_size)
+            print(f"{name:<8} {room_size:>10} {per_consumer:>18.1f} {once:>17.1f}")
+
+if __name__ == "__main__":
+    main()
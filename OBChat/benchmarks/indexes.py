@@ -0,0 +1,188 @@
+"""
+Benchmarks the hot Ban, Admin, Room, and Message lookups with and without their composite indexes.
+
+Seeds a temporary test database at the migration before the composite indexes, prints the query
+plan and average time of each lookup, then applies the index migration and prints them again.
+
+The benchmark runs in a temporary test database, but Django's startup still reads the configured
+database, so migrate it first. Run from the OBChat directory:
+    python manage.py migrate
+    python -m benchmarks.indexes [message count]
+"""
+
+import os
+import random
+import sys
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "OBChat.settings")
+django.setup()
+
+# pylint: disable=wrong-import-position
+# Justification: Django must be set up before importing anything that imports models.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import setup_databases, teardown_databases
+from django.utils.timezone import now
+
+from OB.constants import GroupTypes
+from OB.models import Admin, Ban, Message, OBUser, Room
+# pylint: enable=wrong-import-position
+
+BEFORE_INDEXES = [("OB", "0027_auto_20201017_1200")]
+AFTER_INDEXES = [("OB", "0028_auto_20201018_1200")]
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+USERS = max(MESSAGES // 100, 10)
+ROOMS = max(MESSAGES // 1000, 10)
+BANS = MESSAGES // 10
+ADMINS = MESSAGES // 100
+BATCH_SIZE = 10000
+REPEATS = 200
+
+def migrate(targets):
+    """
+    Migrates the test database forwards or backwards to the targets.
+
+    Arguments:
+        targets (list[tuple(string, string)]): The app labels and migration names to migrate to.
+    """
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(targets)
+
+def bulk_insert(model, objects):
+    """
+    Inserts objects in batches, without the ids being needed afterwards.
+
+    Arguments:
+        model (Class): A database model class (see OB.models.py).
+        objects (iterable[obj]): The objects to insert.
+    """
+
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+def seed():
+    """
+    Inserts users, rooms, admins, bans, and messages with random relations.
+
+    Return values:
+        tuple(list[int], list[int]): The ids of the users and of the rooms.
+    """
+
+    bulk_insert(OBUser, (OBUser(username=f"user_{i}") for i in range(USERS)))
+    user_ids = list(OBUser.objects.values_list("id", flat=True))
+
+    bulk_insert(Room, (
+        Room(name=f"room_{i}", owner_id=random.choice(user_ids)) for i in range(ROOMS)
+    ))
+    room_ids = list(Room.objects.values_list("id", flat=True))
+
+    # Admins are unique per user and room
+    adminships = {(random.choice(user_ids), random.choice(room_ids)) for _ in range(ADMINS)}
+    bulk_insert(Admin, (
+        Admin(user_id=user_id, room_id=room_id, issuer_id=user_id)
+        for user_id, room_id in adminships
+    ))
+
+    bulk_insert(Ban, (
+        Ban(
+            user_id=random.choice(user_ids),
+            room_id=random.choice(room_ids),
+            issuer_id=random.choice(user_ids),
+            is_lifted=random.random() < 0.5
+        )
+        for _ in range(BANS)
+    ))
+
+    timestamp = now()
+    bulk_insert(Message, (
+        Message(
+            message="The quick brown fox jumps over the lazy dog.",
+            sender_id=random.choice(user_ids),
+            room_id=random.choice(room_ids),
+            timestamp=timestamp
+        )
+        for _ in range(MESSAGES)
+    ))
+
+    return user_ids, room_ids
+
+def get_lookups(user_ids, room_ids):
+    """
+    Makes each hot lookup with random arguments.
+
+    Arguments:
+        user_ids (list[int]): The ids of the seeded users.
+        room_ids (list[int]): The ids of the seeded rooms.
+
+    Return values:
+        dict{string: function}: Functions that make a QuerySet for each lookup, by name.
+    """
+
+    return {
+        "active ban": lambda: Ban.objects.filter(
+            user_id=random.choice(user_ids),
+            room_id=random.choice(room_ids),
+            is_lifted=False
+        ),
+        "adminship": lambda: Admin.objects.filter(
+            user_id=random.choice(user_ids),
+            room_id=random.choice(room_ids)
+        ),
+        "room by name": lambda: Room.objects.filter(
+            group_type=GroupTypes.Room,
+            name=f"room_{random.randrange(ROOMS)}"
+        ),
+        "room history": lambda: Message.objects.filter(
+            room_id=random.choice(room_ids)
+        ).order_by("-timestamp")[:50]
+    }
+
+def report(lookups):
+    """
+    Prints the query plan and the average time of each lookup.
+
+    Arguments:
+        lookups (dict{string: function}): Functions that make a QuerySet for each lookup, by name.
+    """
+
+    for name, lookup in lookups.items():
+        start = time.perf_counter()
+
+        for _ in range(REPEATS):
+            list(lookup())
+
+        milliseconds = (time.perf_counter() - start) / REPEATS * 1000
+
+        print(f"{name} ({milliseconds:.3f} ms):")
+        print("    " + lookup().explain().replace("\n", "\n    "))
+
+def main():
+    """
+    Seeds the database and prints the query plans and times before and after the indexes.
+    """
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+
+    try:
+        migrate(BEFORE_INDEXES)
+
+        print(f"Seeding {MESSAGES} messages, {BANS} bans, {ADMINS} admins, {ROOMS} rooms, and "
+              f"{USERS} users...")
+        lookups = get_lookups(*seed())
+
+        print("\nBefore the composite indexes\n")
+        report(lookups)
+
+        migrate(AFTER_INDEXES)
+
+        print("\nAfter the composite indexes\n")
+        report(lookups)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+if __name__ == "__main__":
+    main()
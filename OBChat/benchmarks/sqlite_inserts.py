@@ -0,0 +1,143 @@
+"""
+Benchmarks concurrent message inserts on SQLite with and without the production profile (see
+OB.utilities.sqlite).
+
+Many simulated consumers save messages at once (see OB.utilities.persistence.async_save_message())
+while others read the room history, first with SQLite's defaults and then with the production
+profile and persistent connections. Prints the insert throughput, the number of inserts that failed
+because the database was locked, and the read latency.
+
+The benchmark runs in a temporary test database file, but Django's startup still reads the
+configured database, so migrate it first. Run from the OBChat directory:
+    python manage.py migrate
+    python -m benchmarks.sqlite_inserts
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "OBChat.settings")
+django.setup()
+
+# pylint: disable=wrong-import-position
+# Justification: Django must be set up before importing anything that imports models.
+from channels.db import database_sync_to_async
+
+from django.db import OperationalError, connection, connections
+from django.test.utils import setup_databases, teardown_databases
+
+from OB.models import Message, OBUser, Room
+from OB.utilities import sqlite
+from OB.utilities.persistence import async_save_message
+# pylint: enable=wrong-import-position
+
+WRITERS = 50
+READERS = 10
+MESSAGES_PER_WRITER = 40
+READS_PER_READER = 40
+
+def read_history(room):
+    """
+    Reads the latest messages of a room, like the room view.
+
+    Arguments:
+        room (Room): The room to read.
+    """
+
+    list(Message.objects.filter(room=room).order_by("-timestamp")[:50])
+
+async def write(room, sender, failures):
+    """
+    Saves messages one after another, like a consumer receiving them.
+
+    Arguments:
+        room (Room): The room of the messages.
+        sender (OBUser): The sender of the messages.
+        failures (list[int]): A counter of the inserts that failed because the database was locked.
+    """
+
+    for _ in range(MESSAGES_PER_WRITER):
+        try:
+            await async_save_message(message="The quick brown fox.", sender=sender, room=room)
+        except OperationalError:
+            failures[0] += 1
+
+async def read(room, latencies):
+    """
+    Reads the room history repeatedly.
+
+    Arguments:
+        room (Room): The room to read.
+        latencies (list[float]): The latency of each read in milliseconds.
+    """
+
+    for _ in range(READS_PER_READER):
+        start = time.perf_counter()
+        await database_sync_to_async(read_history)(room)
+        latencies += [(time.perf_counter() - start) * 1000]
+
+async def run(room, sender):
+    """
+    Runs the writers and readers at once.
+
+    Arguments:
+        room (Room): The room of the messages.
+        sender (OBUser): The sender of the messages.
+
+    Return values:
+        tuple(float, int, list[float]): The inserts per second, the failed inserts, and the read
+            latencies.
+    """
+
+    failures = [0]
+    latencies = []
+    start = time.perf_counter()
+
+    await asyncio.gather(
+        *[write(room, sender, failures) for _ in range(WRITERS)],
+        *[read(room, latencies) for _ in range(READERS)]
+    )
+
+    elapsed = time.perf_counter() - start
+    inserts = WRITERS * MESSAGES_PER_WRITER - failures[0]
+
+    return inserts / elapsed, failures[0], sorted(latencies)
+
+def main():
+    """
+    Prints the results without and with the production profile.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        # WAL journaling needs a database file
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            sender = OBUser.objects.create(username="benchmark_user")
+            room = Room.objects.create(name="benchmark", owner=sender)
+
+            print(f"{'profile':<11} {'inserts/s':>10} {'locked':>7} {'read p50 (ms)':>14} "
+                  f"{'read p99 (ms)':>14}")
+
+            # The default profile runs first because WAL journaling stays on in the file
+            for profile, conn_max_age in [(None, 0), ("production", None)]:
+                sqlite.PROFILE = profile
+                connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+                connections.close_all()
+
+                throughput, failures, latencies = asyncio.run(run(room, sender))
+
+                print(f"{profile or 'default':<11} {throughput:>10.0f} {failures:>7} "
+                      f"{latencies[len(latencies) // 2]:>14.2f} "
+                      f"{latencies[int(len(latencies) * 0.99)]:>14.2f}")
+        finally:
+            sqlite.PROFILE = None
+            teardown_databases(old_config, verbosity=0)
+
+if __name__ == "__main__":
+    main()